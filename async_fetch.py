@@ -0,0 +1,320 @@
+"""
+Asyncio fetch engine for the platform fetchers
+Downloads provider pages on one event loop instead of a thread per provider
+"""
+
+import asyncio
+import concurrent.futures
+import os
+import queue
+import threading
+import time
+from functools import wraps
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+import deadline
+import metrics
+import tracing
+from circuit_breaker import ProviderUnavailable, circuit_breakers, is_failure_status
+from common import PROVIDER_ENDPOINTS, PageCache, host_key, provider_for_url, provider_url
+from rate_limiter import host_limiter, parse_retry_after
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+# Simultaneous connections the event loop keeps open to any one provider host
+ASYNC_LIMIT_PER_HOST = int(os.getenv('ASYNC_LIMIT_PER_HOST', '8'))
+
+
+# ============================================================================
+# ASYNC REQUEST UTILITIES
+# ============================================================================
+
+def build_response(url, status_code, content, headers):
+    """Wrap a downloaded body in a requests.Response so the sync extractors can read it"""
+    response = requests.models.Response()
+    response.url = url
+    response.status_code = status_code
+    response.headers = CaseInsensitiveDict(headers)
+    response.encoding = get_encoding_from_headers(response.headers)
+    response._content = content
+    response._content_consumed = True
+    return response
+
+
+async def make_request_async(session, url, headers=None, timeout=10, add_delay=True):
+    """
+    Async counterpart of common.make_request
+
+    Args:
+        session: aiohttp.ClientSession to fetch with
+        url: The URL to request
+        headers: HTTP headers dict
+        timeout: Request timeout in seconds
+        add_delay: Whether to wait for the host's rate limiter before requesting
+
+    Returns:
+        tuple: (response_object, error_dict_or_None), same shape as make_request
+    """
+    with tracing.span('http.get', kind='CLIENT', provider=provider_for_url(url)) as http_span:
+        http_span.set_attribute('http.url', url)
+        response, error = await _get_async(session, url, headers, timeout, add_delay)
+        if error:
+            http_span.set_status('ERROR', error['status'])
+        else:
+            http_span.set_attribute('http.status_code', response.status_code)
+            http_span.set_attribute('http.response_bytes', len(response.content))
+        return response, error
+
+
+async def _get_async(session, url, headers, timeout, add_delay):
+    """The rate-limited aiohttp GET behind make_request_async"""
+    host = host_key(url)
+    provider = provider_for_url(url)
+    try:
+        # Fail fast while the breaker is open; a half-open probe slot is taken only once we may send
+        circuit_breakers.check(host, probe=False)
+        if add_delay:
+            # Reserve the token here and sleep on the loop, so waiting never holds a thread;
+            # a token that only frees up after the lookup's deadline is not taken at all
+            wait = host_limiter.reserve(host, max_wait=deadline.remaining())
+            if wait is None:
+                metrics.count_response(provider, 'timeout')
+                return None, {'error': 'Timeout', 'status': 'Request timeout', 'success': False}
+            metrics.observe_rate_limit_wait(provider, wait)
+            tracing.set_attribute('rate_limit.wait_ms', round(wait * 1000, 3))
+            if wait > 0:
+                try:
+                    await asyncio.sleep(wait)
+                except asyncio.CancelledError:
+                    host_limiter.refund(host)
+                    raise
+        # Checked before a half-open probe slot is taken, so a lookup out of budget never strands one
+        left = deadline.remaining()
+        if left is not None and left <= 0:
+            metrics.count_response(provider, 'timeout')
+            return None, {'error': 'Timeout', 'status': 'Request timeout', 'success': False}
+        circuit_breakers.check(host)
+    except ProviderUnavailable:
+        metrics.count_response(provider, 'circuit_open')
+        return None, {'error': 'Unavailable', 'status': 'Provider unavailable', 'success': False}
+
+    # Inside a budgeted lookup the request timeout never outlasts the lookup's deadline
+    capped = left is not None and left < timeout
+    if left is not None:
+        timeout = min(timeout, left)
+
+    failed = None
+    try:
+        start = time.perf_counter()
+        async with session.get(url, headers=headers, timeout=aiohttp.ClientTimeout(total=timeout)) as resp:
+            # Headers are in; on this engine ttfb includes any new connection
+            headers_at = time.perf_counter()
+            metrics.observe_phase(provider, 'ttfb', headers_at - start)
+            content = await resp.read()
+            metrics.observe_phase(provider, 'download', time.perf_counter() - headers_at)
+            metrics.count_response(provider, resp.status)
+            host_limiter.observe(host, resp.status, parse_retry_after(resp.headers.get('Retry-After')))
+            failed = is_failure_status(resp.status)
+            return build_response(str(resp.url), resp.status, content, resp.headers), None
+    except asyncio.TimeoutError:
+        # Running out of our own budget says nothing about the provider
+        failed = None if capped else True
+        metrics.count_response(provider, 'timeout')
+        return None, {'error': 'Timeout', 'status': 'Request timeout', 'success': False}
+    except aiohttp.ClientConnectionError:
+        failed = True
+        metrics.count_response(provider, 'connection_error')
+        return None, {'error': 'Connection Error', 'status': 'Connection failed', 'success': False}
+    except Exception as e:
+        metrics.count_response(provider, 'error')
+        return None, {'error': 'Error', 'status': str(e)[:50], 'success': False}
+    finally:
+        circuit_breakers.record(host, failed)
+
+
+async def prefetch_page(session, platform, ticker, page_cache):
+    """Download the page a platform function reads and prime page_cache with it"""
+    url = provider_url(platform, ticker)
+    endpoint = PROVIDER_ENDPOINTS[platform]
+    response, error = await make_request_async(session, url, headers=endpoint['headers'],
+                                               timeout=endpoint['timeout'])
+    page_cache.prime(url, response, error)
+
+
+def async_platform_fetcher(platform, func):
+    """
+    Build the async version of a sync platform function
+
+    The returned coroutine function awaits the page download on the event loop,
+    then runs the unchanged sync extractor against the primed PageCache in a
+    worker thread, so no thread is held while waiting on the network.
+
+    Args:
+        platform: Key into PROVIDER_ENDPOINTS (e.g. 'zacks')
+        func: Sync platform function taking (ticker, page_cache)
+
+    Returns:
+        async function (ticker, session, page_cache=None) -> result dict
+    """
+    @wraps(func)
+    async def fetcher(ticker, session, page_cache=None):
+        if page_cache is None:
+            page_cache = PageCache()
+        if not page_cache.has(provider_url(platform, ticker)):
+            await prefetch_page(session, platform, ticker, page_cache)
+        return await asyncio.to_thread(func, ticker, page_cache)
+
+    fetcher.__name__ = f'{func.__name__}_async'
+    fetcher.__qualname__ = fetcher.__name__
+    return fetcher
+
+
+async def iter_platforms_async(session, ticker, async_fetchers):
+    """
+    Run several async platform fetchers for one ticker
+
+    Pages shared by more than one platform (price and Zacks) are downloaded once.
+    Platforms still running when the generator is cancelled or closed are cancelled too.
+
+    Args:
+        session: aiohttp.ClientSession to fetch with
+        ticker: Stock ticker symbol
+        async_fetchers: Dict of {platform: async fetcher}
+
+    Yields:
+        (platform, result_dict) in completion order
+    """
+    page_cache = PageCache()
+    downloads = {}
+
+    async def run(platform, fetcher):
+        url = provider_url(platform, ticker)
+        if url not in downloads:
+            downloads[url] = asyncio.ensure_future(prefetch_page(session, platform, ticker, page_cache))
+        await downloads[url]
+        return platform, await fetcher(ticker, session, page_cache)
+
+    tasks = [asyncio.ensure_future(run(platform, fetcher)) for platform, fetcher in async_fetchers.items()]
+    try:
+        for task in asyncio.as_completed(tasks):
+            yield await task
+    finally:
+        # Cancelled or closed early (e.g. iter_lookup timed out): stop the downloads nobody will read
+        for pending in tasks + list(downloads.values()):
+            pending.cancel()
+
+
+# ============================================================================
+# EVENT LOOP ENGINE
+# ============================================================================
+
+class AsyncFetchEngine:
+    """
+    Process-wide event loop that serves async lookups for the Flask workers
+
+    The loop runs in one background daemon thread, started lazily so that each
+    gunicorn worker gets its own loop after fork. Request threads hand it a
+    coroutine and block on the result; provider downloads from every concurrent
+    lookup are multiplexed on the loop's single aiohttp session.
+    """
+
+    def __init__(self, limit_per_host=ASYNC_LIMIT_PER_HOST):
+        self.limit_per_host = limit_per_host
+        self._lock = threading.Lock()
+        self._loop = None
+        self._session = None
+
+    def _ensure_started(self):
+        if aiohttp is None:
+            raise RuntimeError('aiohttp is required for the async fetch engine')
+
+        with self._lock:
+            if self._loop is not None:
+                return self._loop
+
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name='async-fetch-engine', daemon=True)
+            thread.start()
+
+            async def open_session():
+                connector = aiohttp.TCPConnector(limit=0, limit_per_host=self.limit_per_host)
+                return aiohttp.ClientSession(connector=connector)
+
+            self._session = asyncio.run_coroutine_threadsafe(open_session(), loop).result()
+            self._loop = loop
+            return loop
+
+    def run(self, coroutine_function, *args, timeout=None):
+        """Run coroutine_function(session, *args) on the engine loop and wait for its result"""
+        loop = self._ensure_started()
+        future = asyncio.run_coroutine_threadsafe(coroutine_function(self._session, *args), loop)
+        return future.result(timeout)
+
+    def iter_lookup(self, ticker, async_fetchers, timeout=None):
+        """
+        Fetch several platforms for one ticker on the engine loop
+
+        Args:
+            ticker: Stock ticker symbol
+            async_fetchers: Dict of {platform: async fetcher}
+            timeout: Seconds to wait for all platforms
+
+        Yields:
+            (platform, result_dict) in the calling thread as each platform completes
+
+        Raises:
+            concurrent.futures.TimeoutError: if timeout passes before every platform is done
+        """
+        loop = self._ensure_started()
+        completed = queue.Queue()
+        # The coroutine runs in the loop thread's context; carry the request's trace over
+        parent_span = tracing.current_span()
+        deadline_at = None if timeout is None else time.monotonic() + timeout
+
+        async def produce():
+            tracing.attach(parent_span)
+            # Lets the rate limiter wait and each download see what is left of the budget
+            deadline.enter(deadline_at)
+            try:
+                async for item in iter_platforms_async(self._session, ticker, async_fetchers):
+                    completed.put(item)
+            except Exception as e:
+                completed.put(e)
+
+        future = asyncio.run_coroutine_threadsafe(produce(), loop)
+        try:
+            for _ in range(len(async_fetchers)):
+                remaining = None if deadline_at is None else max(0, deadline_at - time.monotonic())
+                try:
+                    item = completed.get(timeout=remaining)
+                except queue.Empty:
+                    raise concurrent.futures.TimeoutError()
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            future.cancel()
+
+    def lookup(self, ticker, async_fetchers, timeout=None):
+        """Fetch several platforms for one ticker and return {platform: result_dict}"""
+        return dict(self.iter_lookup(ticker, async_fetchers, timeout=timeout))
+
+    def close(self):
+        """Close the aiohttp session and stop the loop"""
+        with self._lock:
+            loop, session = self._loop, self._session
+            self._loop = self._session = None
+        if loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(session.close(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+
+
+async_engine = AsyncFetchEngine()
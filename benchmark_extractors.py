@@ -0,0 +1,217 @@
+"""
+Offline benchmark for the platform extractors, run against the fixture corpus
+Times each provider's parse, page-text, selector-cascade and regex phases and
+the whole extractor, and checks every result against the recorded one
+(for synthetic placeholder fixtures that only detects changed output: their
+expected results were produced by these same extractors)
+
+Usage:
+    python benchmark_extractors.py [--app stock_rating_app_production] [--platforms ...]
+                                   [--repeat N] [--json out.json] [--compare baseline.json]
+
+Nothing touches the network: pages are replayed from fixtures/ (record them
+with record_fixtures.py). Save a run with --json and pass it to --compare on a
+later commit to see per-provider deltas; the exit status is 1 when a result
+changed or a provider got slower than --threshold.
+"""
+
+import argparse
+import bs4
+import importlib
+import json
+import platform as python_platform
+import statistics
+import subprocess
+import sys
+import time
+import timeit
+from functools import wraps
+
+from common import HTML_PARSER, ZACKS_QUOTE_FILTER, PageText, parse_html
+from fixture_corpus import FIXTURES_DIR, fixture_page_cache, load_manifest, read_page, synthetic_count
+
+try:
+    import lxml.etree
+except ImportError:
+    lxml = None
+
+
+# parse_only filter each platform parses its page with (stockopedia scans the raw text)
+PARSE_FILTERS = {'price': ZACKS_QUOTE_FILTER, 'zacks': ZACKS_QUOTE_FILTER, 'tipranks': None,
+                 'barchart': None, 'stockanalysis': None}
+
+# App-level helpers whose time is attributed to a phase during the breakdown pass
+PHASE_HELPERS = {
+    'selectors': ['find_element_by_selectors', 'extract_text_by_selectors'],
+    'regex': ['find_all_regex_matches', 'find_keywords_in_text', 'search_text_with_context',
+              'find_json_value', 'extract_stock_analysis_data', 'stream_search'],
+}
+
+PHASES = ['parse', 'text', 'selectors', 'regex', 'extract']
+
+
+def best_ms(func, repeat):
+    """Best of repeat single runs, in milliseconds"""
+    return min(timeit.repeat(func, number=1, repeat=repeat)) * 1000
+
+
+def phase_breakdown(app, run):
+    """
+    Run once with the app's helper functions wrapped in timers
+
+    Returns:
+        dict: {phase: milliseconds spent inside that phase's helpers}
+    """
+    spent = dict.fromkeys(PHASE_HELPERS, 0.0)
+    depth = [0]
+    originals = {}
+
+    def timed(phase, func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            # Only the outermost helper counts, so nested helper calls are not double-counted
+            depth[0] += 1
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                depth[0] -= 1
+                if depth[0] == 0:
+                    spent[phase] += (time.perf_counter() - start) * 1000
+        return wrapper
+
+    for phase, names in PHASE_HELPERS.items():
+        for name in names:
+            if hasattr(app, name):
+                originals[name] = getattr(app, name)
+                setattr(app, name, timed(phase, originals[name]))
+    try:
+        run()
+    finally:
+        for name, func in originals.items():
+            setattr(app, name, func)
+    return spent
+
+
+def benchmark_fixture(app, entry, content, repeat):
+    """Time one fixture; returns ({phase: ms}, result)"""
+    fetcher = app.SYNC_FETCHERS[entry['platform']]
+    timings = dict.fromkeys(PHASES, 0.0)
+
+    if entry['status'] == 200 and entry['platform'] in PARSE_FILTERS:
+        parse_only = PARSE_FILTERS[entry['platform']]
+        timings['parse'] = best_ms(lambda: parse_html(content, parse_only), repeat)
+        if parse_only is None:
+            soup = parse_html(content)
+            # A fresh PageText each run: the tree walk plus the lowercase copy the fallbacks share
+            timings['text'] = best_ms(lambda: PageText(soup).lower, repeat)
+
+    result = fetcher(entry['ticker'], fixture_page_cache(entry, content))
+    timings['extract'] = best_ms(lambda: fetcher(entry['ticker'], fixture_page_cache(entry, content)), repeat)
+    timings.update(phase_breakdown(app, lambda: fetcher(entry['ticker'], fixture_page_cache(entry, content))))
+    return timings, result
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    """What a run's numbers depend on, so runs from different commits can be compared fairly"""
+    return {
+        'revision': git_revision(),
+        'python': python_platform.python_version(),
+        'beautifulsoup4': bs4.__version__,
+        'lxml': '.'.join(map(str, lxml.etree.LXML_VERSION)) if lxml else None,
+        'html_parser': HTML_PARSER,
+        'machine': python_platform.machine(),
+    }
+
+
+def print_table(summary, baseline=None):
+    header = f"{'provider':<14} {'pages':>5} " + ' '.join(f'{phase + " ms":>12}' for phase in PHASES)
+    if baseline:
+        header += f" {'vs base':>9}"
+    print(header)
+    print('-' * len(header))
+    for provider, row in summary.items():
+        line = f"{provider:<14} {row['pages']:>5} " + ' '.join(f"{row[phase]:>12.3f}" for phase in PHASES)
+        base = (baseline or {}).get(provider)
+        if base:
+            line += f" {(row['extract'] - base['extract']) / base['extract'] * 100:>+8.1f}%"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark extractors against the offline fixture corpus')
+    parser.add_argument('--app', default='stock_rating_app', choices=['stock_rating_app', 'stock_rating_app_production'])
+    parser.add_argument('--platforms', nargs='+', help='only these providers')
+    parser.add_argument('--repeat', type=int, default=5, help='timing repetitions per fixture (best is kept)')
+    parser.add_argument('--json', help='write per-provider results to this file')
+    parser.add_argument('--compare', help='results file from an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='relative extract-time increase over --compare that counts as a regression')
+    parser.add_argument('--fixtures-dir', default=FIXTURES_DIR)
+    args = parser.parse_args()
+
+    manifest = load_manifest(args.fixtures_dir)
+    entries = [entry for entry in manifest['fixtures'] if not args.platforms or entry['platform'] in args.platforms]
+    if not entries:
+        raise SystemExit(f'No fixtures in {args.fixtures_dir}; run record_fixtures.py first')
+    synthetic = synthetic_count({'fixtures': entries})
+    if synthetic:
+        print(f"⚠️  {synthetic} of {len(entries)} fixtures are synthetic placeholders: matching their expected "
+              f"results is not regression coverage (see {args.fixtures_dir}/manifest.json)\n")
+
+    app = importlib.import_module(args.app)
+    per_provider = {}
+    mismatches = []
+    for entry in entries:
+        content = read_page(entry, args.fixtures_dir)
+        timings, result = benchmark_fixture(app, entry, content, args.repeat)
+        expected = entry['expected'].get(args.app)
+        if expected is not None and result != expected:
+            mismatches.append((entry, expected, result))
+        per_provider.setdefault(entry['platform'], []).append(timings)
+
+    # Totals over the corpus: one number per provider and phase, comparable between runs on the same corpus
+    summary = {}
+    for provider, runs in sorted(per_provider.items()):
+        summary[provider] = {'pages': len(runs), 'extract_median': statistics.median(r['extract'] for r in runs)}
+        summary[provider].update({phase: sum(r[phase] for r in runs) for phase in PHASES})
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline_run = json.load(f)
+        baseline = baseline_run['providers']
+        print(f"Comparing with {args.compare} (revision {baseline_run['environment'].get('revision')})")
+
+    print_table(summary, baseline)
+    print('(ms are totals over the provider\'s fixtures; selectors/regex are the extract time spent in those helpers)')
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'environment': environment(), 'app': args.app, 'repeat': args.repeat,
+                       'providers': summary}, f, indent=1, sort_keys=True)
+            f.write('\n')
+
+    failed = False
+    for entry, expected, result in mismatches:
+        failed = True
+        print(f"✗ {entry['platform']} {entry['ticker']} ({entry['case']}): expected {expected}, got {result}")
+    if baseline:
+        for provider, row in summary.items():
+            base = baseline.get(provider)
+            if base and row['extract'] > base['extract'] * (1 + args.threshold):
+                failed = True
+                print(f"✗ {provider} extract time {row['extract']:.3f} ms vs {base['extract']:.3f} ms baseline")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""
+Microbenchmark for rating keyword matching
+Compares the original per-call keyword loops with the precompiled KeywordMatcher
+
+Usage:
+    python benchmark_keywords.py [page.html[.gz] ...] [--repeat N]
+
+Without page arguments it uses the saved pages under fixtures/ when present
+(synthetic placeholders until live pages are recorded), otherwise synthetic pages.
+"""
+
+import argparse
+import glob
+import gzip
+import os
+import random
+import re
+import timeit
+
+from common import (
+    BARCHART_RATING_KEYWORDS, RATING_KEYWORDS, STOCKANALYSIS_RATING_KEYWORDS,
+    find_keywords_in_text, search_text_with_context, parse_html
+)
+
+# Context templates get_barchart_rating falls back to
+CONTEXT_PATTERNS = [
+    r'(opinion|signal|rating|recommendation|consensus|analyst).*?{keyword}',
+    r'{keyword}.*?(opinion|signal|rating|recommendation)',
+    r'barchart.*?{keyword}',
+    r'{keyword}.*?barchart'
+]
+
+KEYWORD_SETS = {
+    'rating': RATING_KEYWORDS,
+    'barchart': BARCHART_RATING_KEYWORDS,
+    'stockanalysis': STOCKANALYSIS_RATING_KEYWORDS
+}
+
+
+def legacy_find_keywords_in_text(text, keyword_dict):
+    """find_keywords_in_text as it was before KeywordMatcher"""
+    if not text:
+        return None
+    text_lower = text.lower()
+    for keyword, mapped_value in keyword_dict.items():
+        if keyword in text_lower:
+            return mapped_value
+    return None
+
+
+def legacy_search_text_with_context(page_text, keywords_dict, context_patterns):
+    """search_text_with_context as it was before KeywordMatcher"""
+    if not page_text or not keywords_dict:
+        return None
+    page_text_lower = page_text.lower()
+    for keyword, mapped_value in keywords_dict.items():
+        if keyword not in page_text_lower:
+            continue
+        for pattern_template in context_patterns:
+            pattern = pattern_template.format(keyword=re.escape(keyword))
+            if re.search(pattern, page_text_lower):
+                return mapped_value
+    return None
+
+
+def synthetic_pages():
+    """Pages shaped like provider text: many short lines, rating words with and without context"""
+    random.seed(7)
+    filler = ('the company reported revenue growth for the quarter market price target earnings share '
+              'dividend investors momentum technical chart volume').split()
+    pages = {}
+    for name, extra in [('no-context', 'buy sell hold neutral positive negative'),
+                        ('rated', 'buy sell hold rating opinion analyst barchart'),
+                        ('no-keywords', '')]:
+        words = filler + extra.split()
+        lines = [' '.join(random.choice(words) for _ in range(random.randint(3, 40))) for _ in range(3000)]
+        pages[f'synthetic/{name}'] = '\n'.join(lines)
+    return pages
+
+
+def load_pages(paths):
+    pages = {}
+    for path in paths:
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rb') as f:
+            pages[os.path.relpath(path)] = parse_html(f.read()).get_text()
+    return pages
+
+
+def best_time(func, repeat):
+    """Best per-call time in milliseconds"""
+    return min(timeit.repeat(func, number=1, repeat=repeat)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark keyword matching on saved pages')
+    parser.add_argument('pages', nargs='*', help='saved HTML pages (.html or .html.gz)')
+    parser.add_argument('--repeat', type=int, default=5, help='timing repetitions per case (best is reported)')
+    args = parser.parse_args()
+
+    paths = args.pages or sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                        'fixtures', '*', '*.html*')))
+    pages = load_pages(paths) if paths else synthetic_pages()
+
+    print(f"{'page':<48} {'keywords':<14} {'case':<8} {'legacy ms':>10} {'matcher ms':>11} {'speedup':>8}")
+    print('-' * 104)
+    totals = {'legacy': 0.0, 'matcher': 0.0}
+    for name, text in pages.items():
+        for set_name, keywords in KEYWORD_SETS.items():
+            cases = [
+                ('find', lambda: legacy_find_keywords_in_text(text, keywords),
+                 lambda: find_keywords_in_text(text, keywords)),
+                ('context', lambda: legacy_search_text_with_context(text, keywords, CONTEXT_PATTERNS),
+                 lambda: search_text_with_context(text, keywords, CONTEXT_PATTERNS)),
+            ]
+            for case, legacy, matcher in cases:
+                if legacy() != matcher():
+                    raise SystemExit(f"Result mismatch on {name} / {set_name} / {case}: {legacy()!r} != {matcher()!r}")
+                legacy_ms = best_time(legacy, args.repeat)
+                matcher_ms = best_time(matcher, args.repeat)
+                totals['legacy'] += legacy_ms
+                totals['matcher'] += matcher_ms
+                speedup = legacy_ms / matcher_ms if matcher_ms else float('inf')
+                print(f"{name[-48:]:<48} {set_name:<14} {case:<8} {legacy_ms:>10.3f} {matcher_ms:>11.3f} {speedup:>7.1f}x")
+
+    print('-' * 104)
+    print(f"{'TOTAL':<72} {totals['legacy']:>10.3f} {totals['matcher']:>11.3f} "
+          f"{totals['legacy'] / totals['matcher']:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+"""
+Per-provider circuit breakers for provider requests
+After a run of consecutive blocks or timeouts from one host its breaker opens
+and requests to that host fail at once for a cooldown; then a few half-open
+probes decide whether to close it again or wait another cooldown
+"""
+
+import os
+import threading
+import time
+
+import requests
+
+from rate_limiter import THROTTLE_STATUS_CODES
+
+
+CIRCUIT_BREAKER_ENABLED = os.getenv('CIRCUIT_BREAKER_ENABLED', 'True') == 'True'
+# Consecutive failed requests to a host that open its breaker
+CIRCUIT_BREAKER_THRESHOLD = int(os.getenv('CIRCUIT_BREAKER_THRESHOLD', '5'))
+# Seconds an open breaker fails requests before letting probes through
+CIRCUIT_BREAKER_COOLDOWN = float(os.getenv('CIRCUIT_BREAKER_COOLDOWN', '60'))
+# Requests allowed through at once while half-open
+CIRCUIT_BREAKER_PROBES = int(os.getenv('CIRCUIT_BREAKER_PROBES', '1'))
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class ProviderUnavailable(requests.exceptions.RequestException):
+    """Raised instead of sending a request while the host's breaker is open"""
+
+    def __init__(self, host, retry_in):
+        super().__init__(f'Provider unavailable ({host} circuit open, retry in {retry_in:.0f}s)')
+        self.host = host
+        self.retry_in = retry_in
+
+
+def is_failure_status(status_code):
+    """Responses that count against a provider: blocking/throttling answers and server errors"""
+    return status_code in THROTTLE_STATUS_CODES or status_code >= 500
+
+
+class CircuitBreaker:
+    """
+    Closed / open / half-open breaker for one host
+
+    Closed: requests pass and consecutive failures are counted; threshold of
+    them opens the breaker. Open: requests fail fast until the cooldown ends.
+    Half-open: up to `probes` requests pass; a success closes the breaker and
+    a failure opens it for another cooldown.
+    """
+
+    def __init__(self, threshold=CIRCUIT_BREAKER_THRESHOLD, cooldown=CIRCUIT_BREAKER_COOLDOWN,
+                 probes=CIRCUIT_BREAKER_PROBES):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.probes = probes
+        self.state = CLOSED
+        self.failures = 0
+        self.open_until = 0.0
+        self.probes_in_flight = 0
+        self.opened = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def allow(self, probe=True):
+        """
+        Args:
+            probe: Take a half-open probe slot; False only rejects while the
+                   cooldown runs, for a caller about to wait before sending
+
+        Returns:
+            float: 0 if a request may be sent now, else seconds until the breaker half-opens
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return 0.0
+            now = time.monotonic()
+            if not probe and (self.state == HALF_OPEN or now >= self.open_until):
+                return 0.0
+            if self.state == OPEN and now >= self.open_until:
+                self.state = HALF_OPEN
+                self.probes_in_flight = 0
+            if self.state == HALF_OPEN and self.probes_in_flight < self.probes:
+                self.probes_in_flight += 1
+                return 0.0
+            self.rejected += 1
+            # A half-open breaker waiting on its probes reports a nominal second
+            return max(1.0, self.open_until - now)
+
+    def record(self, failed):
+        """
+        Feed back the outcome of a request that allow() let through
+
+        Args:
+            failed: True for a block, timeout or connection failure, False for a
+                    usable answer, None when the outcome says nothing about the
+                    provider (e.g. the caller's own deadline ran out)
+        """
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self.probes_in_flight = max(0, self.probes_in_flight - 1)
+                if failed:
+                    self._open()
+                elif failed is False:
+                    self.state = CLOSED
+                    self.failures = 0
+            elif failed:
+                self.failures += 1
+                if self.state == CLOSED and self.failures >= self.threshold:
+                    self._open()
+            elif failed is False:
+                self.failures = 0
+
+    def _open(self):
+        self.state = OPEN
+        self.open_until = time.monotonic() + self.cooldown
+        self.opened += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'state': self.state,
+                'consecutive_failures': self.failures,
+                'retry_in': round(max(0.0, self.open_until - time.monotonic()), 2) if self.state == OPEN else 0.0,
+                'opened': self.opened,
+                'rejected': self.rejected
+            }
+
+
+class HostCircuitBreakers:
+    """Circuit breakers keyed by host, created on first use"""
+
+    def __init__(self, enabled=True, threshold=CIRCUIT_BREAKER_THRESHOLD, cooldown=CIRCUIT_BREAKER_COOLDOWN,
+                 probes=CIRCUIT_BREAKER_PROBES):
+        self.enabled = enabled
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.probes = probes
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def breaker(self, host):
+        with self._lock:
+            breaker = self._breakers.get(host)
+            if breaker is None:
+                breaker = self._breakers[host] = CircuitBreaker(self.threshold, self.cooldown, self.probes)
+            return breaker
+
+    def check(self, host, probe=True):
+        """
+        Let a request to host through, or fail it fast
+
+        Args:
+            host: Host key of the request
+            probe: See CircuitBreaker.allow; pass False for the early check made
+                   before waiting on the rate limiter
+
+        Raises:
+            ProviderUnavailable: while host's breaker is open (or its half-open probes are busy)
+        """
+        if not self.enabled:
+            return
+        retry_in = self.breaker(host).allow(probe)
+        if retry_in:
+            raise ProviderUnavailable(host, retry_in)
+
+    def record(self, host, failed):
+        """Feed back the outcome of a request check() let through (see CircuitBreaker.record)"""
+        if self.enabled:
+            self.breaker(host).record(failed)
+
+    def reset(self, host=None):
+        """Close host's breaker (every breaker without a host)"""
+        with self._lock:
+            if host is None:
+                self._breakers.clear()
+            else:
+                self._breakers.pop(host, None)
+
+    def stats(self):
+        with self._lock:
+            breakers = dict(self._breakers)
+        return {host: breaker.stats() for host, breaker in sorted(breakers.items())}
+
+
+circuit_breakers = HostCircuitBreakers(enabled=CIRCUIT_BREAKER_ENABLED)
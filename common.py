@@ -3,13 +3,35 @@ Common utilities for stock rating fetchers
 Reduces code duplication across multiple modules
 """
 
+import os
+import codecs
+import csv
+import glob
+import json
 import requests
-import time
-import random
 import re
+import threading
+import time
+from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
 from bs4 import BeautifulSoup
+from bs4.builder import builder_registry
 from functools import wraps
 
+import deadline
+import metrics
+import tracing
+from circuit_breaker import ProviderUnavailable, circuit_breakers, is_failure_status
+from rate_limiter import host_limiter, parse_retry_after
+
+try:
+    # beautifulsoup4 >= 4.13; without it pages are always parsed whole
+    from bs4.filter import ElementFilter
+except ImportError:
+    ElementFilter = None
+
 
 # ============================================================================
 # CONSTANTS
@@ -38,6 +60,46 @@ HEADERS_COMPREHENSIVE = {
     'sec-ch-ua-platform': '"macOS"'
 }
 
+# Site each provider is scraped from, and the base URL requests go to. A *_BASE_URL
+# override (e.g. mock_provider_server.py) is still treated as that provider's host
+# by the rate limiter, connection pools and worker pool
+PROVIDER_SITES = {
+    'zacks': 'https://www.zacks.com',
+    'tipranks': 'https://www.tipranks.com',
+    'barchart': 'https://www.barchart.com',
+    'stockopedia': 'https://www.stockopedia.com',
+    'stockanalysis': 'https://stockanalysis.com',
+}
+PROVIDER_BASE_URLS = {
+    provider: os.getenv(f'{provider.upper()}_BASE_URL', site).rstrip('/')
+    for provider, site in PROVIDER_SITES.items()
+}
+
+# Page scraped by each platform function, with the headers and timeout it fetches with
+PROVIDER_ENDPOINTS = {
+    'price': {'url': PROVIDER_BASE_URLS['zacks'] + '/stock/quote/{ticker}',
+              'headers': HEADERS_STANDARD, 'timeout': 10},
+    'zacks': {'url': PROVIDER_BASE_URLS['zacks'] + '/stock/quote/{ticker}',
+              'headers': HEADERS_STANDARD, 'timeout': 10},
+    'tipranks': {'url': PROVIDER_BASE_URLS['tipranks'] + '/stocks/{ticker_lower}',
+                 'headers': HEADERS_COMPREHENSIVE, 'timeout': 15},
+    'barchart': {'url': PROVIDER_BASE_URLS['barchart'] + '/stocks/quotes/{ticker_lower}/overview',
+                 'headers': HEADERS_COMPREHENSIVE, 'timeout': 15},
+    'stockopedia': {'url': PROVIDER_BASE_URLS['stockopedia'] + '/share-prices/{ticker_lower}-NSQ:{ticker}/',
+                    'headers': HEADERS_STANDARD, 'timeout': 10},
+    'stockanalysis': {'url': PROVIDER_BASE_URLS['stockanalysis'] + '/stocks/{ticker_lower}/forecast/',
+                      'headers': HEADERS_COMPREHENSIVE, 'timeout': 15},
+}
+
+# Body chunk size for streaming extractors, and how much of the previous chunk is
+# rescanned so matches split across a chunk boundary are still found
+STREAM_CHUNK_SIZE = int(os.getenv('STREAM_CHUNK_SIZE', '16384'))
+STREAM_OVERLAP = 512
+
+# Keep-alive connection pool sizing for the per-host sessions
+HTTP_POOL_CONNECTIONS = int(os.getenv('HTTP_POOL_CONNECTIONS', '2'))
+HTTP_POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', '16'))
+
 # Common rating keywords mapping
 RATING_KEYWORDS = {
     'outperform': 'Outperform',
@@ -83,6 +145,21 @@ STOCKANALYSIS_RATING_KEYWORDS = {
 }
 
 
+# Barchart "NN% Buy" opinion strength, most specific pattern first
+BARCHART_PERCENTAGE_PATTERNS = [
+    re.compile(r'(?:technical\s+opinion\s+rating\s+is\s+a?\s*)?(\d+)%\s*(buy|sell|hold|strong\s+buy|strong\s+sell)'),
+    re.compile(r'(\d+)\s*%\s*(buy|sell|hold)'),
+    re.compile(r'technical.*?(\d+)\s*%.*?(buy|sell|hold)'),
+    re.compile(r'opinion.*?(\d+)\s*%.*?(buy|sell|hold)')
+]
+
+# JSON fields the Stockopedia extractor reads from the page's embedded state
+STOCKOPEDIA_PATTERNS = {
+    'stockrank': r'"stockRank":(\d+)',
+    'style': r'"style":"([^"]+)"'
+}
+
+
 # ============================================================================
 # STRING UTILITIES
 # ============================================================================
@@ -92,50 +169,311 @@ def normalize_ticker(ticker):
     return ticker.upper().strip()
 
 
+def provider_url(platform, ticker):
+    """Build the page URL a platform function scrapes for ticker"""
+    ticker = normalize_ticker(ticker)
+    return PROVIDER_ENDPOINTS[platform]['url'].format(ticker=ticker, ticker_lower=ticker.lower())
+
+
 def is_foreign_ticker(ticker):
     """Check if ticker appears to be a foreign/OTC listing"""
     foreign_suffixes = ['F', 'Y', 'FF', 'ZY', 'GY', 'SY', 'UY', 'IY', 'LY']
     return any(ticker.endswith(suffix) for suffix in foreign_suffixes)
 
 
+def default_watchlists():
+    """Screener exports shipped with the repo (updater outputs excluded)"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    return sorted(path for path in glob.glob(os.path.join(here, 'Top_*.csv')) if '_complete' not in path)
+
+
+def read_watchlist(csv_file):
+    """
+    Read tickers and company names from a screener export (';' or ',' delimited)
+    
+    Args:
+        csv_file: CSV path with a Symbol/Ticker column and optionally a Company/Name column
+    
+    Returns:
+        list: [(ticker, company_name), ...] in file order
+    """
+    with open(csv_file, encoding='utf-8-sig', newline='') as f:
+        first_line = f.readline()
+        f.seek(0)
+        reader = csv.DictReader(f, delimiter=';' if ';' in first_line else ',')
+        columns = reader.fieldnames or []
+        ticker_column = next((c for c in columns if 'symbol' in c.lower() or 'ticker' in c.lower()), None)
+        name_column = next((c for c in columns if 'company' in c.lower() or 'name' in c.lower()), None)
+        if ticker_column is None:
+            raise ValueError(f'No Symbol/Ticker column in {csv_file}')
+        return [(normalize_ticker(row[ticker_column]), (row.get(name_column) or '').strip() if name_column else '')
+                for row in reader if (row.get(ticker_column) or '').strip()]
+
+
 # ============================================================================
 # HTTP REQUEST UTILITIES
 # ============================================================================
 
-def add_human_delay(min_delay=0.5, max_delay=1.5):
-    """Add random delay to appear more human-like"""
-    time.sleep(random.uniform(min_delay, max_delay))
+def _site_host(url):
+    host = (urlparse(url).hostname or '').lower()
+    return host[4:] if host.startswith('www.') else host
+
+
+# Overridden base URLs (host:port) mapped to the provider host they stand in for
+_HOST_ALIASES = {
+    urlparse(base).netloc.lower(): _site_host(PROVIDER_SITES[provider])
+    for provider, base in PROVIDER_BASE_URLS.items() if base != PROVIDER_SITES[provider]
+}
+
+
+def host_key(url):
+    """Return the host a URL belongs to, without port or leading 'www.' (provider host for overridden base URLs)"""
+    alias = _HOST_ALIASES.get(urlparse(url).netloc.lower())
+    return alias if alias is not None else _site_host(url)
+
+
+_SITE_PROVIDERS = {_site_host(site): provider for provider, site in PROVIDER_SITES.items()}
+
+
+def provider_for_url(url):
+    """Provider name ('zacks', 'tipranks', ...) a URL belongs to, or its host for other sites"""
+    host = host_key(url)
+    return _SITE_PROVIDERS.get(host, host)
+
+
+class _TimedHTTPConnection(HTTPConnection):
+    """urllib3 connection that records how long opening the socket took (DNS + TCP)"""
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            metrics.observe_connect(provider_for_url(f'//{self.host}:{self.port}'), time.perf_counter() - start)
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    """urllib3 connection that records how long opening the socket took (DNS + TCP + TLS)"""
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            metrics.observe_connect(provider_for_url(f'//{self.host}:{self.port}'), time.perf_counter() - start)
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter whose new connections report their connect time to metrics"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {'http': _TimedHTTPConnectionPool,
+                                                   'https': _TimedHTTPSConnectionPool}
+
+
+class SessionRegistry:
+    """
+    One persistent keep-alive requests.Session per provider host
+    
+    Reusing a session keeps TCP+TLS connections to zacks.com, tipranks.com,
+    barchart.com, etc. open between lookups instead of paying a new handshake
+    on every fetch. Sessions are created lazily under a lock and can be used
+    concurrently from the ThreadPoolExecutor workers: each connection is
+    checked out of urllib3's pool by one thread at a time.
+    """
+
+    def __init__(self, pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE,
+                 host_pool_sizes=None):
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.host_pool_sizes = dict(host_pool_sizes or {})
+
+    def configure(self, pool_connections=None, pool_maxsize=None, host_pool_sizes=None):
+        """Change pool sizes; existing sessions are closed and rebuilt on next use"""
+        with self._lock:
+            if pool_connections is not None:
+                self.pool_connections = pool_connections
+            if pool_maxsize is not None:
+                self.pool_maxsize = pool_maxsize
+            if host_pool_sizes is not None:
+                self.host_pool_sizes = dict(host_pool_sizes)
+            sessions, self._sessions = self._sessions, {}
+        for session in sessions.values():
+            session.close()
+
+    def get(self, url):
+        """Return the shared session for the host of url"""
+        host = host_key(url)
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                session = self._sessions[host] = self._build_session(host)
+        return session
+
+    def close(self):
+        """Close every pooled connection"""
+        self.configure()
+
+    def _build_session(self, host):
+        session = requests.Session()
+        adapter = TimedHTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.host_pool_sizes.get(host, self.pool_maxsize)
+        )
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+
+_session_registry = SessionRegistry()
+
+
+def get_session(url):
+    """Return the pooled keep-alive session used for requests to url's host"""
+    return _session_registry.get(url)
+
+
+def configure_sessions(pool_connections=None, pool_maxsize=None, host_pool_sizes=None):
+    """
+    Configure connection pool sizes for the per-host sessions
+    
+    Args:
+        pool_connections: Number of per-host connection pools each session caches
+        pool_maxsize: Keep-alive connections kept per host
+        host_pool_sizes: Dict of {host: pool_maxsize} overrides, e.g. {'tipranks.com': 4}
+    """
+    _session_registry.configure(pool_connections, pool_maxsize, host_pool_sizes)
 
 
-def make_request(url, headers=None, timeout=10, add_delay=True):
+def make_request(url, headers=None, timeout=10, add_delay=True, page_cache=None):
     """
-    Make HTTP request with standardized error handling and optional human delay
+    Make HTTP request with standardized error handling and per-host rate limiting
     
     Args:
         url: The URL to request
         headers: HTTP headers dict (defaults to HEADERS_STANDARD)
         timeout: Request timeout in seconds
-        add_delay: Whether to add random delay before request
+        add_delay: Whether to wait for the host's rate limiter before requesting
+        page_cache: Optional PageCache shared by the extractors of one lookup
     
     Returns:
         tuple: (response_object, error_dict_or_None)
         - If successful: (response, None)
         - If failed: (None, error_dict)
     """
+    if page_cache is not None:
+        return page_cache.fetch(url, headers=headers, timeout=timeout, add_delay=add_delay)
+    
+    return _send_request(url, headers=headers, timeout=timeout, add_delay=add_delay)
+
+
+def rate_limited_get(url, headers=None, timeout=10, throttle=True, stream=False):
+    """
+    GET url on its host's pooled session, paced by the host's adaptive rate limiter
+    
+    Waits only when the host's token bucket is empty or paused, and feeds the
+    response status back so 429/403/471 answers slow later requests down.
+    While the host's circuit breaker is open nothing is sent and
+    ProviderUnavailable is raised; inside a budgeted lookup whose deadline
+    would pass before the limiter lets it send, requests.exceptions.Timeout is
+    raised straight away. Network exceptions propagate to the caller.
+    
+    Args:
+        url: The URL to request
+        headers: HTTP headers dict (defaults to HEADERS_STANDARD)
+        timeout: Request timeout in seconds
+        throttle: Whether to wait for the rate limiter before sending
+        stream: Return after the headers arrive and leave the body unread
+    
+    Returns:
+        requests.Response
+    """
     if headers is None:
         headers = HEADERS_STANDARD
     
-    if add_delay:
-        add_human_delay()
-    
+    host = host_key(url)
+    provider = provider_for_url(url)
+    with tracing.span('http.get', kind='CLIENT', provider=provider) as http_span:
+        http_span.set_attribute('http.url', url)
+        # Fails fast with ProviderUnavailable while the host's breaker is open; a
+        # half-open probe slot is only taken once the rate limiter lets us send
+        circuit_breakers.check(host, probe=False)
+        if throttle:
+            # A token that only frees up after the lookup's deadline is left for someone who can use it
+            wait = host_limiter.acquire(host, max_wait=deadline.remaining())
+            if wait is None:
+                raise requests.exceptions.Timeout('Rate limit wait would outlast the lookup deadline')
+            metrics.observe_rate_limit_wait(provider, wait)
+            http_span.set_attribute('rate_limit.wait_ms', round(wait * 1000, 3))
+        circuit_breakers.check(host)
+        failed = None
+        try:
+            # Inside a budgeted lookup the socket timeout never outlasts the lookup's deadline
+            left = deadline.remaining()
+            capped = left is not None and left < timeout
+            if left is not None:
+                if left <= 0:
+                    raise requests.exceptions.Timeout('Lookup deadline passed before the request was sent')
+                timeout = min(timeout, left)
+            
+            metrics.start_connect_tracking()
+            start = time.perf_counter()
+            try:
+                response = get_session(url).get(url, headers=headers, timeout=timeout, stream=stream)
+            except requests.exceptions.Timeout:
+                # Running out of our own budget says nothing about the provider
+                failed = None if capped else True
+                raise
+            except requests.exceptions.ConnectionError:
+                failed = True
+                raise
+            total = time.perf_counter() - start
+            # response.elapsed runs until the headers are parsed, including any new connection
+            headers_at = response.elapsed.total_seconds()
+            connect = metrics.connect_time()
+            metrics.observe_phase(provider, 'ttfb', max(0.0, headers_at - connect))
+            if not stream:
+                metrics.observe_phase(provider, 'download', max(0.0, total - headers_at))
+            metrics.count_response(provider, response.status_code)
+            http_span.set_attribute('http.status_code', response.status_code)
+            http_span.set_attribute('http.connect_ms', round(connect * 1000, 3))
+            http_span.set_attribute('http.ttfb_ms', round(headers_at * 1000, 3))
+            if not stream:
+                http_span.set_attribute('http.response_bytes', len(response.content))
+            host_limiter.observe(host, response.status_code, parse_retry_after(response.headers.get('Retry-After')))
+            failed = is_failure_status(response.status_code)
+            return response
+        finally:
+            circuit_breakers.record(host, failed)
+
+
+def _send_request(url, headers=None, timeout=10, add_delay=True, stream=False):
+    """Perform the actual HTTP GET behind make_request"""
     try:
-        response = requests.get(url, headers=headers, timeout=timeout)
+        response = rate_limited_get(url, headers=headers, timeout=timeout, throttle=add_delay, stream=stream)
         return response, None
+    except ProviderUnavailable:
+        metrics.count_response(provider_for_url(url), 'circuit_open')
+        return None, {'error': 'Unavailable', 'status': 'Provider unavailable', 'success': False}
     except requests.exceptions.Timeout:
+        metrics.count_response(provider_for_url(url), 'timeout')
         return None, {'error': 'Timeout', 'status': 'Request timeout', 'success': False}
     except requests.exceptions.ConnectionError:
+        metrics.count_response(provider_for_url(url), 'connection_error')
         return None, {'error': 'Connection Error', 'status': 'Connection failed', 'success': False}
     except Exception as e:
+        metrics.count_response(provider_for_url(url), 'error')
         return None, {'error': 'Error', 'status': str(e)[:50], 'success': False}
 
 
@@ -165,15 +503,324 @@ def handle_http_status(status_code, custom_checks=None):
         return {'error': 'N/A', 'status': f'HTTP {status_code}', 'success': False}
 
 
+# ============================================================================
+# SHARED PAGE FETCHING
+# ============================================================================
+
+class _PageEntry:
+    """Download and parse state for one URL inside a PageCache"""
+
+    def __init__(self):
+        self.ready = threading.Event()
+        self.parse_lock = threading.Lock()
+        self.response = None
+        self.error = None
+        self.soups = {}
+
+
+class PageCache:
+    """
+    Per-lookup page cache shared by every extractor that reads the same URL
+    
+    Concurrent fetches of one URL are combined into a single download, and the
+    downloaded page is parsed into BeautifulSoup at most once. Create one per
+    /get_ratings request and pass it to the platform functions; entries are
+    keyed by URL only, so callers sharing a URL should also share headers.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._by_response = {}
+
+    def fetch(self, url, headers=None, timeout=10, add_delay=True):
+        """Return (response, error) for url, downloading it only once"""
+        with self._lock:
+            entry = self._entries.get(url)
+            is_owner = entry is None
+            if is_owner:
+                entry = self._entries[url] = _PageEntry()
+        
+        if is_owner:
+            try:
+                entry.response, entry.error = _send_request(url, headers=headers, timeout=timeout,
+                                                            add_delay=add_delay)
+                if entry.response is not None:
+                    with self._lock:
+                        self._by_response[id(entry.response)] = entry
+            finally:
+                entry.ready.set()
+        else:
+            start = time.perf_counter()
+            if not entry.ready.is_set():
+                with tracing.span('page.wait', provider=provider_for_url(url)):
+                    entry.ready.wait()
+            # Time spent on another thread's download is not this extractor's own work
+            metrics.account(time.perf_counter() - start)
+        
+        return entry.response, entry.error
+
+    def has(self, url):
+        """Check whether url has already been fetched or primed"""
+        with self._lock:
+            return url in self._entries
+
+    def prime(self, url, response, error=None):
+        """Store a page downloaded elsewhere (e.g. by the async engine) so extractors skip the fetch"""
+        entry = _PageEntry()
+        entry.response, entry.error = response, error
+        entry.ready.set()
+        with self._lock:
+            self._entries[url] = entry
+            if response is not None:
+                self._by_response[id(response)] = entry
+
+    def get_soup(self, response, parse_only=None):
+        """
+        Return the shared BeautifulSoup tree for a response fetched through this cache
+        
+        Trees are kept per parse_only filter, so extractors that share a filter
+        (price and Zacks rating both use ZACKS_QUOTE_FILTER) share one parse.
+        """
+        with self._lock:
+            entry = self._by_response.get(id(response))
+        if entry is None:
+            return parse_response(response, parse_only)
+        
+        start = time.perf_counter()
+        with entry.parse_lock:
+            waited = time.perf_counter() - start
+            if parse_only not in entry.soups:
+                entry.soups[parse_only] = parse_response(response, parse_only)
+            else:
+                metrics.account(waited)
+        return entry.soups[parse_only]
+
+
+# ============================================================================
+# STREAMING EXTRACTION
+# ============================================================================
+
+def stream_search(url, patterns, watch=(), headers=None, timeout=10, add_delay=True, page_cache=None):
+    """
+    Search a page for regex patterns while it downloads, stopping once all have matched
+    
+    The body is read in STREAM_CHUNK_SIZE chunks and each chunk is scanned
+    together with the tail of the previous one, so only the bytes up to the
+    last needed match are transferred; the connection is then closed. Each
+    pattern reports its first match in the page, as re.search on the full
+    text would. A page already held by page_cache is searched in memory.
+    
+    Args:
+        url: The URL to request
+        patterns: Dict of {name: regex with one group}
+        watch: Strings to note whether the page contains (e.g. the ticker)
+        headers: HTTP headers dict
+        timeout: Request timeout in seconds
+        add_delay: Whether to wait for the host's rate limiter before requesting
+        page_cache: Optional PageCache that may already hold the page
+    
+    Returns:
+        tuple: (response_or_None, error_dict_or_None, {name: group(1) or None}, set of watch strings seen)
+    """
+    matches = dict.fromkeys(patterns)
+    seen = set()
+    
+    if page_cache is not None and page_cache.has(url):
+        response, error = page_cache.fetch(url, headers=headers, timeout=timeout, add_delay=add_delay)
+        if error:
+            return None, error, matches, seen
+        tracing.set_attribute('stream.source', 'page_cache')
+        text = response.text
+        matches = {name: find_json_value(text, pattern) for name, pattern in patterns.items()}
+        return response, None, matches, {w for w in watch if w in text}
+    
+    response, error = _send_request(url, headers=headers, timeout=timeout, add_delay=add_delay, stream=True)
+    if error:
+        return None, error, matches, seen
+    
+    tracing.set_attribute('stream.source', 'network')
+    download_started = time.perf_counter()
+    try:
+        if response.status_code != 200:
+            return response, None, matches, seen
+        
+        compiled = {name: re.compile(pattern) for name, pattern in patterns.items()}
+        try:
+            decoder = codecs.getincrementaldecoder(response.encoding or 'utf-8')(errors='replace')
+        except LookupError:
+            decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        tail = ''
+        for chunk in response.iter_content(STREAM_CHUNK_SIZE):
+            window = tail + decoder.decode(chunk)
+            for name, regex in compiled.items():
+                if matches[name] is None:
+                    match = regex.search(window)
+                    if match:
+                        matches[name] = match.group(1)
+            seen.update(w for w in watch if w not in seen and w in window)
+            if all(value is not None for value in matches.values()):
+                tracing.set_attribute('stream.stopped_early', True)
+                break
+            tail = window[-STREAM_OVERLAP:]
+        return response, None, matches, seen
+    except requests.exceptions.Timeout:
+        return None, {'error': 'Timeout', 'status': 'Request timeout', 'success': False}, matches, seen
+    except requests.exceptions.ConnectionError:
+        return None, {'error': 'Connection Error', 'status': 'Connection failed', 'success': False}, matches, seen
+    finally:
+        # Drops the connection if the body was not read to the end
+        response.close()
+        metrics.observe_phase(provider_for_url(url), 'download', time.perf_counter() - download_started)
+
+
 # ============================================================================
 # PAGE PARSING UTILITIES
 # ============================================================================
 
-def get_page_soup(response):
-    """Parse response content to BeautifulSoup object"""
+
+def resolve_html_parser(name):
+    """Return name if BeautifulSoup has a tree builder for it, else the built-in 'html.parser'"""
+    return name if builder_registry.lookup(name) is not None else 'html.parser'
+
+
+# BeautifulSoup tree builder: 'lxml' (C, several times faster) unless HTML_PARSER says otherwise
+HTML_PARSER = resolve_html_parser(os.getenv('HTML_PARSER', 'lxml'))
+
+
+def parse_html(content, parse_only=None):
+    """Parse a page with the configured HTML_PARSER, optionally keeping only some subtrees"""
+    if parse_only is not None and ElementFilter is None:
+        parse_only = None
+    return BeautifulSoup(content, HTML_PARSER, parse_only=parse_only)
+
+
+def parse_response(response, parse_only=None):
+    """parse_html on a response body, recording the parse time under the response's provider"""
+    provider = provider_for_url(response.url or '')
+    with tracing.span('parse', provider=provider, parser=HTML_PARSER) as parse_span:
+        parse_span.set_attribute('parse.filtered', parse_only is not None)
+        parse_span.set_attribute('parse.bytes', len(response.content))
+        start = time.perf_counter()
+        soup = parse_html(response.content, parse_only)
+        metrics.observe_phase(provider, 'parse', time.perf_counter() - start)
+    return soup
+
+
+if ElementFilter is not None:
+    class SubtreeFilter(ElementFilter):
+        """
+        parse_only filter that keeps whole subtrees rooted at chosen tags
+        
+        A tag is kept, with everything inside it, when its name is in names or
+        it carries one of classes. Everything else is dropped while parsing, so
+        no Tag objects are built for the rest of the page.
+        """
+        
+        def __init__(self, names=(), classes=()):
+            super().__init__()
+            self.names = frozenset(names)
+            self.classes = frozenset(classes)
+        
+        @property
+        def includes_everything(self):
+            return False
+        
+        def allow_tag_creation(self, nsprefix, name, attrs):
+            if name in self.names:
+                return True
+            tag_classes = (attrs or {}).get('class') or ''
+            if isinstance(tag_classes, str):
+                tag_classes = tag_classes.split()
+            return not self.classes.isdisjoint(tag_classes)
+        
+        def allow_string_creation(self, string):
+            # Only strings outside every kept subtree are checked here
+            return False
+        
+        def match(self, element, _known_rules=False):
+            return True
+else:
+    def SubtreeFilter(names=(), classes=()):
+        """Older BeautifulSoup: no parse-time filtering, callers get the full tree"""
+        return None
+
+
+# Everything the price and Zacks rank extractors read from the Zacks quote page
+ZACKS_QUOTE_FILTER = SubtreeFilter(names=['h1'], classes=['rank_view', 'last_price', 'change'])
+
+def get_page_soup(response, page_cache=None, parse_only=None):
+    """
+    Parse response content to BeautifulSoup object (once per page when a PageCache is given)
+    
+    Args:
+        response: requests.Response to parse
+        page_cache: Optional PageCache the response was fetched through
+        parse_only: Optional SubtreeFilter; only the matching subtrees are built
+    
+    Returns:
+        BeautifulSoup or None
+    """
     if not response:
         return None
-    return BeautifulSoup(response.content, 'html.parser')
+    if page_cache is not None:
+        return page_cache.get_soup(response, parse_only)
+    return parse_response(response, parse_only)
+
+
+class PageText:
+    """
+    Text views of one parsed page, each computed on first use
+    
+    raw is soup.get_text(), lower its lowercased copy and normalized the raw
+    text with whitespace runs collapsed to single spaces. Extractor fallbacks
+    share one PageText per soup (see get_page_text), so the tree is walked and
+    the text copied at most once per view however many fallbacks read it.
+    """
+    
+    def __init__(self, soup):
+        self._soup = soup
+        self._raw = None
+        self._lower = None
+        self._normalized = None
+    
+    @property
+    def raw(self):
+        if self._raw is None:
+            self._raw = self._soup.get_text() if self._soup else ''
+        return self._raw
+    
+    @property
+    def lower(self):
+        if self._lower is None:
+            self._lower = self.raw.lower()
+        return self._lower
+    
+    @property
+    def normalized(self):
+        if self._normalized is None:
+            self._normalized = ' '.join(self.raw.split())
+        return self._normalized
+    
+    def __bool__(self):
+        return bool(self.raw)
+
+
+def get_page_text(soup):
+    """
+    Return the shared PageText for a soup, creating it on first use
+    
+    The view is stored on the soup itself, so it lives exactly as long as the
+    parsed page and is shared through PageCache with every extractor reading it.
+    Two threads racing here may each build a view; both are equivalent.
+    """
+    if soup is None:
+        return PageText(None)
+    # vars() lookup: attribute access on a soup would search the tree for a tag of that name
+    page_text = vars(soup).get('_page_text')
+    if page_text is None:
+        page_text = soup._page_text = PageText(soup)
+    return page_text
 
 
 def validate_stock_page(soup, ticker):
@@ -295,12 +942,121 @@ def extract_number_from_text(text, pattern=None):
     return None
 
 
+class KeywordMatcher:
+    """
+    Precompiled matcher for one {keyword: mapped_value} dict
+    
+    Keywords keep their dict order as priority: the first keyword in the dict
+    that occurs anywhere in the text wins, as with a plain loop. Context
+    templates are formatted and compiled once per keyword, and a template of
+    the form 'A.*?B' whose non-keyword side is a plain word alternation is
+    skipped outright when none of those words occur in the text, since it
+    cannot match.
+    """
+    
+    def __init__(self, keyword_dict):
+        self.keywords = list(keyword_dict.items())
+        self._lock = threading.Lock()
+        self._context = {}
+    
+    def find(self, text):
+        """Return the mapped value of the highest-priority keyword in text, or None"""
+        if not text:
+            return None
+        text_lower = _lowered(text)
+        # One C-level substring scan per keyword beats a single alternation regex pass in CPython
+        for keyword, mapped_value in self.keywords:
+            if keyword in text_lower:
+                return mapped_value
+        return None
+    
+    def find_in_context(self, text, context_patterns):
+        """
+        Return the mapped value of the highest-priority keyword found in one of the contexts
+        
+        Args:
+            text: Text to search
+            context_patterns: Regex templates with a {keyword} placeholder
+        
+        Returns:
+            mapped_value or None
+        """
+        if not text:
+            return None
+        text_lower = _lowered(text)
+        compiled = self._compile_context(tuple(context_patterns))
+        usable = None
+        
+        for keyword, mapped_value in self.keywords:
+            if keyword not in text_lower:
+                continue
+            if usable is None:
+                # Templates whose required context words are all missing cannot match this text
+                usable = [i for i, words in enumerate(compiled['required'])
+                          if words is None or any(word in text_lower for word in words)]
+                if not usable:
+                    return None
+            patterns = compiled['patterns'][keyword]
+            for i in usable:
+                if patterns[i].search(text_lower):
+                    return mapped_value
+        return None
+    
+    def _compile_context(self, context_patterns):
+        with self._lock:
+            compiled = self._context.get(context_patterns)
+            if compiled is None:
+                compiled = self._context[context_patterns] = {
+                    'patterns': {
+                        keyword: [re.compile(template.format(keyword=re.escape(keyword)))
+                                  for template in context_patterns]
+                        for keyword, _ in self.keywords
+                    },
+                    'required': [_required_context_words(template) for template in context_patterns]
+                }
+            return compiled
+
+
+def _lowered(text):
+    """Lowercased text, reusing the memoized copy when given a PageText"""
+    return text.lower if isinstance(text, PageText) else text.lower()
+
+
+_WORD_ALTERNATION = re.compile(r'^\(?([a-z]+(?:\|[a-z]+)*)\)?$')
+
+
+def _required_context_words(template):
+    """Words a template needs besides its keyword (one of them must occur), or None if unknown"""
+    parts = template.split('.*?')
+    if len(parts) != 2:
+        return None
+    sides = [part for part in parts if '{keyword}' not in part]
+    if len(sides) != 1:
+        return None
+    match = _WORD_ALTERNATION.match(sides[0])
+    return match.group(1).split('|') if match else None
+
+
+_keyword_matchers = {}
+_keyword_matchers_lock = threading.Lock()
+
+
+def get_keyword_matcher(keyword_dict):
+    """Return the shared KeywordMatcher for a keyword dict, building it on first use"""
+    key = tuple(keyword_dict.items())
+    with _keyword_matchers_lock:
+        matcher = _keyword_matchers.get(key)
+        if matcher is None:
+            matcher = _keyword_matchers[key] = KeywordMatcher(keyword_dict)
+        return matcher
+
+
 def find_keywords_in_text(text, keyword_dict):
     """
     Find first matching keyword in text and return mapped value
     
     Args:
-        text: Text to search
+        text: Text to search (str or PageText)
         keyword_dict: Dict of {keyword: mapped_value}
     
     Returns:
@@ -308,14 +1064,7 @@ def find_keywords_in_text(text, keyword_dict):
     """
     if not text:
         return None
-    
-    text_lower = text.lower()
-    
-    for keyword, mapped_value in keyword_dict.items():
-        if keyword in text_lower:
-            return mapped_value
-    
-    return None
+    return get_keyword_matcher(keyword_dict).find(text)
 
 
 def search_text_with_context(page_text, keywords_dict, context_patterns):
@@ -323,7 +1072,7 @@ def search_text_with_context(page_text, keywords_dict, context_patterns):
     Search for keywords in page text with context validation
     
     Args:
-        page_text: Full page text to search
+        page_text: Full page text to search (str or PageText)
         keywords_dict: Dict of {keyword: mapped_value}
         context_patterns: List of regex patterns for context validation
     
@@ -332,20 +1081,7 @@ def search_text_with_context(page_text, keywords_dict, context_patterns):
     """
     if not page_text or not keywords_dict:
         return None
-    
-    page_text_lower = page_text.lower()
-    
-    for keyword, mapped_value in keywords_dict.items():
-        if keyword not in page_text_lower:
-            continue
-        
-        # Try to find keyword in context
-        for pattern_template in context_patterns:
-            pattern = pattern_template.format(keyword=re.escape(keyword))
-            if re.search(pattern, page_text_lower):
-                return mapped_value
-    
-    return None
+    return get_keyword_matcher(keywords_dict).find_in_context(page_text, context_patterns)
 
 
 # ============================================================================
@@ -488,14 +1224,15 @@ def extract_stock_analysis_data(soup, ticker):
         return None
     
     data = {}
-    page_text = soup.get_text()
+    # Patterns are written in lowercase, so search the page's shared lowercase view
+    page_text = get_page_text(soup).lower
     
     # Look for the main consensus summary text:
     # "26 analysts that cover Apple stock have a consensus rating of "Buy" and an average price target of $275.87"
     
     # Pattern 1: Look for "X analysts ... consensus rating of "..."
     consensus_pattern = r'(\d+)\s*analysts?\s+(?:that\s+cover\s+)?(?:[^"]*?)consensus\s+(?:rating\s+)?of\s*["\']?(strong\s+buy|buy|hold|sell|strong\s+sell|bullish|bearish)["\']?'
-    match = re.search(consensus_pattern, page_text, re.IGNORECASE)
+    match = re.search(consensus_pattern, page_text)
     
     if match:
         analyst_count = int(match.group(1))
@@ -503,12 +1240,14 @@ def extract_stock_analysis_data(soup, ticker):
         
         data['analyst_count'] = analyst_count
         data['consensus'] = find_keywords_in_text(consensus_text, STOCKANALYSIS_RATING_KEYWORDS) or consensus_text.title()
+        tracing.set_attribute('extract.method', 'consensus_summary')
     else:
         # Fallback: Look for just the rating keywords in common patterns
-        consensus_match = re.search(r'consensus\s+(?:rating\s+)?of\s*["\']?(\w+(?:\s+\w+)?)["\']?', page_text, re.IGNORECASE)
+        consensus_match = re.search(r'consensus\s+(?:rating\s+)?of\s*["\']?(\w+(?:\s+\w+)?)["\']?', page_text)
         if consensus_match:
             consensus_text = consensus_match.group(1).lower()
             data['consensus'] = find_keywords_in_text(consensus_text, STOCKANALYSIS_RATING_KEYWORDS) or consensus_text.title()
+            tracing.set_attribute('extract.method', 'consensus_fallback')
     
     # Look for Price Target - pattern: "average price target of $275.87"
     price_patterns = [
@@ -519,7 +1258,7 @@ def extract_stock_analysis_data(soup, ticker):
     
     price_target = None
     for pattern in price_patterns:
-        match = re.search(pattern, page_text, re.IGNORECASE)
+        match = re.search(pattern, page_text)
         if match:
             try:
                 price_target = float(match.group(1))
@@ -536,9 +1275,18 @@ def extract_stock_analysis_data(soup, ticker):
     ]
     
     for pattern in upside_patterns:
-        match = re.search(pattern, page_text, re.IGNORECASE)
+        match = re.search(pattern, page_text)
         if match:
             data['upside_downside'] = f"{match.group(1)}%"
             break
     
     return data if data else None
+
+
+# ============================================================================
+# SERVER-SENT EVENTS
+# ============================================================================
+
+def format_sse(event, data):
+    """Format one Server-Sent Events frame with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
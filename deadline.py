@@ -0,0 +1,199 @@
+"""
+Per-request deadline budgets and hedged provider attempts
+Bounds how long a lookup waits for its slowest provider: each provider gets a
+slice of the request budget, providers that miss it come back as timeouts while
+the finished ones are still returned, and (optionally) a provider that is slower
+than its own recent p95 gets a second attempt
+"""
+
+import collections
+import concurrent.futures
+import contextvars
+import math
+import os
+import threading
+import time
+
+import metrics
+
+
+# Seconds a /get_ratings lookup may take in total; {PLATFORM}_DEADLINE gives one provider a shorter slice
+LOOKUP_DEADLINE = float(os.getenv('LOOKUP_DEADLINE', '12'))
+
+# Hedging: re-send a provider's lookup once it has taken longer than its recent HEDGE_PERCENTILE latency
+HEDGE_ENABLED = os.getenv('HEDGE_ENABLED', 'False') == 'True'
+HEDGE_PERCENTILE = float(os.getenv('HEDGE_PERCENTILE', '95'))
+# Successful lookups a provider needs in the window before it is hedged at all
+HEDGE_MIN_SAMPLES = int(os.getenv('HEDGE_MIN_SAMPLES', '20'))
+HEDGE_WINDOW = int(os.getenv('HEDGE_WINDOW', '200'))
+HEDGE_MIN_DELAY = float(os.getenv('HEDGE_MIN_DELAY', '0.2'))
+
+_deadline = contextvars.ContextVar('lookup_deadline', default=None)
+
+
+def provider_budget(platform, budget=LOOKUP_DEADLINE):
+    """A provider's slice of a request budget: {PLATFORM}_DEADLINE when set and shorter"""
+    override = os.getenv(f'{platform.upper()}_DEADLINE')
+    return min(budget, float(override)) if override else budget
+
+
+def deadlines_for(platforms, budget=LOOKUP_DEADLINE):
+    """{platform: time.monotonic() deadline} for a lookup starting now"""
+    now = time.monotonic()
+    return {platform: now + provider_budget(platform, budget) for platform in platforms}
+
+
+def remaining():
+    """Seconds left before the deadline of the lookup running in this context, or None without one"""
+    deadline_at = _deadline.get()
+    return None if deadline_at is None else deadline_at - time.monotonic()
+
+
+def enter(deadline_at):
+    """
+    Make deadline_at the current lookup deadline for the rest of this context
+
+    For coroutines on the async engine, where run_until does not fit: asyncio
+    tasks the caller creates afterwards inherit the deadline.
+    """
+    _deadline.set(deadline_at)
+
+
+def run_until(deadline_at, fn, *args, **kwargs):
+    """
+    Call fn with deadline_at as the current lookup deadline
+
+    Submit this to the worker pool instead of fn; common.rate_limited_get caps
+    its socket timeout at the time remaining, so a job that missed its slice
+    gives its worker thread back instead of waiting out the full HTTP timeout.
+    """
+    token = _deadline.set(deadline_at)
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        _deadline.reset(token)
+
+
+# ============================================================================
+# ROLLING LATENCY
+# ============================================================================
+
+class LatencyWindow:
+    """The last `size` successful lookup durations per provider"""
+
+    def __init__(self, size=HEDGE_WINDOW):
+        self.size = size
+        self._samples = collections.defaultdict(lambda: collections.deque(maxlen=self.size))
+        self._lock = threading.Lock()
+
+    def record(self, platform, seconds):
+        with self._lock:
+            self._samples[platform].append(seconds)
+
+    def percentile(self, platform, q, min_samples=HEDGE_MIN_SAMPLES):
+        """Nearest-rank percentile of the window, or None with fewer than min_samples"""
+        with self._lock:
+            samples = sorted(self._samples.get(platform, ()))
+        if len(samples) < max(1, min_samples):
+            return None
+        return samples[max(1, math.ceil(q / 100 * len(samples))) - 1]
+
+    def stats(self):
+        with self._lock:
+            platforms = list(self._samples)
+        return {platform: {'p50': self.percentile(platform, 50, 1), 'p95': self.percentile(platform, 95, 1)}
+                for platform in platforms}
+
+
+latency_window = LatencyWindow()
+
+
+def hedge_delay(platform):
+    """Seconds after which a still-running lookup of platform is hedged, or None to never hedge it"""
+    if not HEDGE_ENABLED:
+        return None
+    p = latency_window.percentile(platform, HEDGE_PERCENTILE)
+    return None if p is None else max(HEDGE_MIN_DELAY, p)
+
+
+# ============================================================================
+# BUDGETED COLLECTION
+# ============================================================================
+
+def iter_within_budget(futures, deadlines, hedge=None):
+    """
+    Wait for platform futures until each platform's deadline, hedging slow ones
+
+    Args:
+        futures: {future: platform}, one running attempt per platform
+        deadlines: {platform: time.monotonic() deadline}
+        hedge: Optional function(platform) -> future of a second attempt (or None
+               if it could not be queued); called once per platform, after
+               hedge_delay(platform), when the platform has time left
+
+    Yields:
+        (platform, future) in completion order, the first attempt to succeed
+        winning; future is None for a platform that missed its deadline.
+        Attempts still queued after the last yield are cancelled.
+    """
+    pending = dict(futures)
+    started = time.monotonic()
+    hedge_at = {}
+    if hedge is not None:
+        for platform in set(pending.values()):
+            delay = hedge_delay(platform)
+            if delay is not None and started + delay < deadlines[platform]:
+                hedge_at[platform] = started + delay
+    attempts = collections.Counter(pending.values())
+    finished = set()
+
+    try:
+        while pending:
+            now = time.monotonic()
+            next_event = min([deadlines[platform] for platform in set(pending.values())] + list(hedge_at.values()))
+            done, _ = concurrent.futures.wait(pending, timeout=max(0, next_event - now),
+                                              return_when=concurrent.futures.FIRST_COMPLETED)
+            now = time.monotonic()
+            for future in done:
+                platform = pending.pop(future)
+                attempts[platform] -= 1
+                if platform in finished or future.cancelled():
+                    continue
+                # A failed attempt only counts when no other attempt is still running
+                if future.exception() is not None and attempts[platform] > 0:
+                    continue
+                finished.add(platform)
+                hedge_at.pop(platform, None)
+                if future.exception() is None:
+                    latency_window.record(platform, now - started)
+                if futures.get(future) is None:
+                    metrics.HEDGED_LOOKUPS.inc(platform, 'won')
+                for other, other_platform in list(pending.items()):
+                    if other_platform == platform:
+                        other.cancel()
+                yield platform, future
+
+            for platform, at in list(hedge_at.items()):
+                if now >= at:
+                    del hedge_at[platform]
+                    future = hedge(platform)
+                    if future is not None:
+                        metrics.HEDGED_LOOKUPS.inc(platform, 'sent')
+                        pending[future] = platform
+                        attempts[platform] += 1
+
+            for platform in {p for p in pending.values() if p not in finished and now >= deadlines[p]}:
+                finished.add(platform)
+                hedge_at.pop(platform, None)
+                metrics.DEADLINE_MISSES.inc(platform)
+                for other, other_platform in list(pending.items()):
+                    if other_platform == platform:
+                        other.cancel()
+                        del pending[other]
+                yield platform, None
+
+            # Attempts of platforms already answered only matter for their cancellation
+            pending = {f: p for f, p in pending.items() if p not in finished}
+    finally:
+        for future in pending:
+            future.cancel()
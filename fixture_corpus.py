@@ -0,0 +1,267 @@
+"""
+Recorded provider page corpus for offline extractor checks and benchmarks
+Pages live under fixtures/<platform>/<TICKER>.html.gz and are described by
+fixtures/manifest.json, which also stores what each extractor returned for them
+"""
+
+import gzip
+import html
+import json
+import os
+import random
+
+from async_fetch import build_response
+from common import PageCache, provider_url
+from rate_limiter import THROTTLE_STATUS_CODES
+
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_VERSION = 1
+
+# What a provider page showed when it was recorded
+CASES = ('rated', 'not-rated', 'not-found', 'blocked')
+
+# Stored in the manifest while synthetic pages make up the corpus
+PLACEHOLDER_NOTE = ('Placeholder corpus: synthetic template pages whose expected results were produced by the '
+                    'extractors they check, so replaying them only shows that output changed, not that it is '
+                    'right. Not regression coverage; re-record live pages with record_fixtures.py.')
+
+# Status a statusless extractor result maps to a not-rated page rather than a missing stock
+NOT_RATED_STATUSES = ('Unable to extract data', 'Price data not available')
+
+
+# ============================================================================
+# MANIFEST
+# ============================================================================
+
+def manifest_path(fixtures_dir=FIXTURES_DIR):
+    return os.path.join(fixtures_dir, MANIFEST_NAME)
+
+
+def load_manifest(fixtures_dir=FIXTURES_DIR):
+    """
+    Read the corpus manifest
+
+    Returns:
+        dict: {'version': int, 'fixtures': [entry, ...]}, empty when no corpus is recorded
+    """
+    path = manifest_path(fixtures_dir)
+    if not os.path.exists(path):
+        return {'version': MANIFEST_VERSION, 'fixtures': []}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def synthetic_count(manifest):
+    """Fixtures generated by synthetic_page rather than recorded from a provider"""
+    return sum(1 for entry in manifest['fixtures'] if entry['source'] == 'synthetic')
+
+
+def save_manifest(manifest, fixtures_dir=FIXTURES_DIR):
+    """Write the manifest with stable ordering so re-recording gives reviewable diffs"""
+    manifest['fixtures'].sort(key=lambda entry: (entry['platform'], entry['ticker']))
+    # A corpus with synthetic pages says so wherever it is read
+    manifest['placeholder'] = synthetic_count(manifest) > 0
+    if manifest['placeholder']:
+        manifest['note'] = PLACEHOLDER_NOTE
+    else:
+        manifest.pop('note', None)
+    os.makedirs(fixtures_dir, exist_ok=True)
+    with open(manifest_path(fixtures_dir), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+        f.write('\n')
+
+
+def write_page(path, content):
+    """Store a page body gzipped, with a zero mtime so identical pages give identical files"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as raw:
+        with gzip.GzipFile(fileobj=raw, mode='wb', mtime=0) as f:
+            f.write(content)
+
+
+def read_page(entry, fixtures_dir=FIXTURES_DIR):
+    """Body bytes of a manifest entry"""
+    with gzip.open(os.path.join(fixtures_dir, entry['file']), 'rb') as f:
+        return f.read()
+
+
+def classify_result(status_code, result):
+    """
+    Name the case a provider page represents from its status and extractor result
+
+    Args:
+        status_code: HTTP status the page was served with
+        result: Dict the platform function returned for it
+
+    Returns:
+        str: One of CASES
+    """
+    if status_code in THROTTLE_STATUS_CODES:
+        return 'blocked'
+    if status_code == 404:
+        return 'not-found'
+    values = set(str(value) for value in result.values())
+    if 'Not Rated' in values or 'NR' in values or result.get('status') in NOT_RATED_STATUSES:
+        return 'not-rated'
+    if result.get('success'):
+        return 'rated'
+    return 'not-found'
+
+
+# ============================================================================
+# OFFLINE REPLAY
+# ============================================================================
+
+class FixturePageCache(PageCache):
+    """
+    PageCache primed from the corpus that refuses to download anything
+
+    Platform functions given this cache read the recorded page; a URL with no
+    fixture raises instead of silently reaching the network.
+    """
+
+    def fetch(self, url, headers=None, timeout=10, add_delay=True):
+        if not self.has(url):
+            raise RuntimeError(f'No fixture recorded for {url}')
+        return super().fetch(url, headers=headers, timeout=timeout, add_delay=add_delay)
+
+
+def fixture_response(entry, content):
+    """Rebuild the requests.Response a fixture was recorded from"""
+    url = provider_url(entry['platform'], entry['ticker'])
+    return build_response(url, entry['status'], content, {'Content-Type': entry['content_type']})
+
+
+def fixture_page_cache(entry, content):
+    """Fresh FixturePageCache holding one fixture, so each run parses the page from scratch"""
+    page_cache = FixturePageCache()
+    page_cache.prime(provider_url(entry['platform'], entry['ticker']), fixture_response(entry, content))
+    return page_cache
+
+
+# ============================================================================
+# SYNTHETIC PAGES
+# ============================================================================
+
+# Provider-neutral filler; deliberately free of rating keywords, scores, targets and percentages
+FILLER_WORDS = ('market revenue earnings dividend volume sector industry quarter growth margin cash '
+                'debt shares price close open high low week range beta yield report news company '
+                'guidance filing annual interim segment product customer supply').split()
+
+# Status a blocked page is served with by each platform
+BLOCKED_STATUS = {'tipranks': 471, 'barchart': 429}
+
+
+def _filler(rng, rows):
+    """Navigation, a quote table and an inline data script sized like a real quote page"""
+    nav = ''.join(f'<li><a href="/{word}/{i}">{word.title()} {i}</a></li>'
+                  for i, word in enumerate(rng.choice(FILLER_WORDS) for _ in range(80)))
+    table = ''.join(
+        f'<tr class="row-{i % 2}"><td>{rng.choice(FILLER_WORDS).title()}</td>'
+        f'<td>{rng.uniform(1, 500):.2f}</td><td>{rng.randint(1000, 9999999)}</td>'
+        f'<td>{" ".join(rng.choice(FILLER_WORDS) for _ in range(rng.randint(4, 12)))}</td></tr>'
+        for i in range(rows))
+    history = json.dumps([[rng.randint(1600000000, 1700000000), round(rng.uniform(1, 500), 2)]
+                          for _ in range(rows * 2)])
+    return (f'<nav><ul>{nav}</ul></nav>'
+            f'<table class="quote-table"><tbody>{table}</tbody></table>'
+            f'<script>var chartHistory = {history};</script>')
+
+
+def _page(title, body, rng, rows):
+    return (f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>{html.escape(title)}</title>'
+            f'<link rel="stylesheet" href="/static/site.css"></head><body>'
+            f'{_filler(rng, rows // 2)}<main>{body}</main>{_filler(rng, rows // 2)}'
+            f'<footer><p>Copyright</p></footer></body></html>')
+
+
+def _provider_markup(platform, ticker, company, case, variant, rng):
+    """Title and the provider-specific markup its extractor reads, for one case"""
+    name = html.escape(company)
+    if platform == 'zacks':
+        rank = rng.randint(1, 5)
+        rank_names = {1: 'Strong Buy', 2: 'Buy', 3: 'Hold', 4: 'Sell', 5: 'Strong Sell'}
+        price = rng.uniform(5, 900)
+        change = rng.uniform(-9, 9)
+        rank_html = (f'<p class="rank_view"><span class="rank_chip">{rank}</span>-{rank_names[rank]}</p>'
+                     if case == 'rated' else '<p class="rank_view">NA</p>')
+        if case == 'rated' and variant:
+            rank_html = f'<p class="rank_view">{rank}-{rank_names[rank]}</p>'
+        body = (f'<h1>{name} ({ticker})</h1>{rank_html}'
+                f'<p class="last_price">${price:,.2f}<span>USD</span></p>'
+                f'<p class="change">{change:+.2f} ({change / price * 100:+.2f}%)</p>')
+        return f'{company} ({ticker}) Stock Price, News & Quote', body
+    if platform == 'tipranks':
+        score = rng.randint(1, 10)
+        sentiment = 'Bullish' if score >= 7 else 'Neutral' if score >= 4 else 'Bearish'
+        if case != 'rated':
+            body = f'<h1>{name}</h1><p>No coverage is available for this stock yet.</p>'
+        elif variant:
+            body = f'<h1>{name}</h1><p>Smart Score {score}</p>'
+        else:
+            body = (f'<h1>{name}</h1><div class="smart-score-card">'
+                    f'<span data-testid="smart-score-text">{score}</span></div>'
+                    f'<div class="consensus-label">{sentiment}</div>')
+        return f'{ticker} Stock Forecast & News - {company} - TipRanks.com', body
+    if platform == 'barchart':
+        percent = rng.randint(8, 100)
+        signal = rng.choice(['Buy', 'Sell', 'Hold'])
+        if case != 'rated':
+            body = f'<h1>{name} ({ticker})</h1><p>Overview</p>'
+        elif variant:
+            body = (f'<h1>{name} ({ticker})</h1>'
+                    f'<p>The Barchart Technical Opinion rating is a {percent}% {signal} '
+                    f'with a Strengthening short term outlook.</p>')
+        else:
+            body = (f'<h1>{name} ({ticker})</h1><div class="technical-opinion-widget">'
+                    f'<a href="/stocks/quotes/{ticker.lower()}/opinion">{percent}% {signal}</a></div>'
+                    f'<p>Technical Opinion rating is a {percent}% {signal}</p>')
+        return f'{company} ({ticker}) Stock Price - Barchart.com', body
+    if platform == 'stockopedia':
+        rank = rng.randint(1, 99)
+        style = rng.choice(['High Flyer', 'Super Stock', 'Contrarian', 'Turnaround', 'Sucker Stock'])
+        state = {'ticker': ticker, 'name': company}
+        if case == 'rated':
+            state.update({'stockRank': rank, 'style': style})
+        body = f'<h1>{name} {ticker}</h1><script>window.__STATE__ = {json.dumps(state, separators=(",", ":"))};</script>'
+        return f'{company} ({ticker}) Share Price - Stockopedia', body
+    if platform == 'stockanalysis':
+        count = rng.randint(3, 40)
+        target = rng.uniform(5, 900)
+        upside = rng.uniform(1, 60)
+        consensus = rng.choice(['Strong Buy', 'Buy', 'Hold', 'Sell'])
+        if case != 'rated':
+            body = f'<h1>{name} ({ticker}) Stock Forecast</h1><p>No forecast is available.</p>'
+        else:
+            body = (f'<h1>{name} ({ticker}) Stock Forecast</h1>'
+                    f'<p>The {count} analysts that cover {name} stock have a consensus rating of '
+                    f'"{consensus}" and an average price target of ${target:.2f}, which forecasts '
+                    f'a {upside:.2f}% upside in the stock price within the next year.</p>')
+        return f'{company} ({ticker}) Stock Forecast', body
+    raise ValueError(f'No synthetic page template for {platform}')
+
+
+def synthetic_page(platform, ticker, company, case, variant=0, rows=300):
+    """
+    Build a provider-shaped page for one case without the network
+
+    Args:
+        platform: Recorded platform ('zacks', 'tipranks', 'barchart', 'stockopedia', 'stockanalysis')
+        ticker: Stock ticker symbol
+        company: Company name shown on the page
+        case: One of CASES
+        variant: 1 to exercise the extractor's fallback path instead of its primary selector
+        rows: Filler table rows, which set the page size
+
+    Returns:
+        tuple: (status_code, body_bytes)
+    """
+    rng = random.Random(f'{platform}:{ticker}:{case}:{variant}')
+    if case == 'blocked':
+        return BLOCKED_STATUS.get(platform, 403), b'<html><head><title>Access Denied</title></head></html>'
+    if case == 'not-found':
+        return 404, _page('Page Not Found', '<h1>Page not found</h1>', rng, rows // 10).encode('utf-8')
+    title, body = _provider_markup(platform, ticker, company, case, variant, rng)
+    return 200, _page(title, body, rng, rows).encode('utf-8')
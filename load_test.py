@@ -0,0 +1,382 @@
+"""
+Load generator and latency SLO report for the Flask endpoints
+
+Usage:
+    python load_test.py [--url http://127.0.0.1:5001] [--endpoint get_ratings|get_ratings_stream]
+                        [--rps 5] [--duration 60] [--zipf-s 1.1] [--csv FILE ...]
+                        [--workers 4 --threads 1] [--slo-p95 3000] [--json out.json]
+                        [--batch 40 --max-shed 0]
+
+Requests arrive open-loop at --rps (Poisson by default), with tickers drawn
+from a Zipfian popularity distribution over the watchlist CSVs, so a few
+symbols are hot and most are rare as with real users. Latency is measured from
+each request's scheduled arrival time, so time spent queued behind a saturated
+server counts against it. The report gives p50/p95/p99 latency, throughput,
+the per-provider error mix and worker utilization (Little's law over the
+gunicorn --workers x --threads slots, plus the provider pool sampled from
+/health when the app exposes it).
+
+--batch N posts one /get_ratings_batch of N symbols when the load starts and
+keeps it running alongside the interactive requests; with --max-shed 0 the run
+fails if any interactive request was shed (HTTP 503) meanwhile, which checks
+that batch work cannot starve interactive lookups of provider pool room.
+
+Start the app with RATE_LIMIT_ENABLED=False (the per-client limit would turn
+most requests into 429s), and point it at mock_provider_server.py for
+reproducible runs that do not touch the real providers.
+"""
+
+import argparse
+import bisect
+import collections
+import concurrent.futures
+import json
+import math
+import random
+import sys
+import threading
+import time
+
+import requests
+
+from common import default_watchlists, read_watchlist
+
+PLATFORMS = ['price', 'zacks', 'tipranks', 'barchart', 'stockopedia', 'stockanalysis']
+
+
+# ============================================================================
+# WORKLOAD
+# ============================================================================
+
+class ZipfTickers:
+    """Draws tickers with P(rank k) proportional to 1 / k**s, rank 1 being the first symbol listed"""
+
+    def __init__(self, tickers, s=1.1, seed=1):
+        self.tickers = tickers
+        self.rng = random.Random(seed)
+        total = 0.0
+        self.cumulative = []
+        for rank in range(1, len(tickers) + 1):
+            total += 1 / rank ** s
+            self.cumulative.append(total)
+
+    def draw(self):
+        point = self.rng.random() * self.cumulative[-1]
+        return self.tickers[bisect.bisect_left(self.cumulative, point)]
+
+
+def arrival_times(rps, duration, process, seed):
+    """Offsets (seconds from start) at which requests are sent"""
+    rng = random.Random(seed)
+    offsets = []
+    t = 0.0
+    while True:
+        t += rng.expovariate(rps) if process == 'poisson' else 1 / rps
+        if t >= duration:
+            return offsets
+        offsets.append(t)
+
+
+# ============================================================================
+# CLIENT
+# ============================================================================
+
+_local = threading.local()
+
+
+def get_session():
+    # requests.Session is not safe to share between threads
+    if not hasattr(_local, 'session'):
+        _local.session = requests.Session()
+    return _local.session
+
+
+def classify_platform(result):
+    """'ok' for a usable provider result, else its status text"""
+    if result.get('success'):
+        return 'ok'
+    return result.get('status') or result.get('error') or 'unknown'
+
+
+def call_get_ratings(base_url, ticker, timeout):
+    """Returns (outcome, {platform: outcome}, first_result_seconds)"""
+    response = get_session().post(f'{base_url}/get_ratings', json={'ticker': ticker}, timeout=timeout)
+    if response.status_code != 200:
+        return f'HTTP {response.status_code}', {}, None
+    body = response.json()
+    if 'error' in body:
+        return body['error'][:60], {}, None
+    return 'ok', {platform: classify_platform(body[platform]) for platform in PLATFORMS if platform in body}, None
+
+
+def call_get_ratings_stream(base_url, ticker, timeout, start):
+    """Returns (outcome, {platform: outcome}, first_result_seconds) from the SSE stream"""
+    response = get_session().post(f'{base_url}/get_ratings_stream', json={'ticker': ticker},
+                                  timeout=timeout, stream=True)
+    with response:
+        if response.status_code != 200:
+            return f'HTTP {response.status_code}', {}, None
+        if not response.headers.get('Content-Type', '').startswith('text/event-stream'):
+            return response.json().get('error', 'not a stream')[:60], {}, None
+        outcome, platforms, first = 'incomplete stream', {}, None
+        event = None
+        for line in response.iter_lines(decode_unicode=True):
+            if line.startswith('event: '):
+                event = line[7:]
+            elif line.startswith('data: '):
+                try:
+                    data = json.loads(line[6:])
+                except ValueError:
+                    # A truncated or garbled event fails this request, not the whole run
+                    return 'malformed event', platforms, first
+                if event == 'platform':
+                    if first is None:
+                        first = time.monotonic() - start
+                    platforms[data['platform']] = classify_platform(data['result'])
+                elif event == 'error':
+                    outcome = data.get('error', 'error')[:60]
+                elif event == 'done' and outcome == 'incomplete stream':
+                    outcome = 'ok'
+        return outcome, platforms, first
+
+
+def run_request(args, ticker, scheduled):
+    """One request; latency counts from its scheduled arrival, not from when a thread picked it up"""
+    try:
+        if args.endpoint == 'get_ratings_stream':
+            outcome, platforms, first = call_get_ratings_stream(args.url, ticker, args.timeout, scheduled)
+        else:
+            outcome, platforms, first = call_get_ratings(args.url, ticker, args.timeout)
+    except requests.exceptions.Timeout:
+        outcome, platforms, first = 'client timeout', {}, None
+    except (ValueError, KeyError):
+        # A body that is not the JSON the endpoint should return counts as a failed request
+        outcome, platforms, first = 'malformed response', {}, None
+    except requests.exceptions.RequestException as e:
+        outcome, platforms, first = type(e).__name__, {}, None
+    return {'ticker': ticker, 'latency': time.monotonic() - scheduled, 'first': first,
+            'outcome': outcome, 'platforms': platforms}
+
+
+def run_batch(base_url, tickers, timeout):
+    """POST one /get_ratings_batch and read it to the end: {'tickers', 'results', 'seconds', 'outcome'}"""
+    start = time.monotonic()
+    results = 0
+    outcome = 'incomplete batch'
+    try:
+        response = requests.post(f'{base_url}/get_ratings_batch', json={'tickers': tickers},
+                                 timeout=timeout, stream=True)
+        with response:
+            if response.status_code != 200:
+                outcome = f'HTTP {response.status_code}'
+            else:
+                for line in response.iter_lines(decode_unicode=True):
+                    if not line:
+                        continue
+                    try:
+                        data = json.loads(line)
+                    except ValueError:
+                        outcome = 'malformed line'
+                        break
+                    if 'result' in data:
+                        results += 1
+                    elif data.get('done'):
+                        outcome = 'ok'
+    except requests.exceptions.RequestException as e:
+        outcome = type(e).__name__
+    return {'tickers': len(tickers), 'results': results, 'seconds': round(time.monotonic() - start, 2),
+            'outcome': outcome}
+
+
+class HealthSampler:
+    """Polls /health in the background to average the provider pool's running and queued jobs"""
+
+    def __init__(self, base_url, interval):
+        self.base_url = base_url
+        self.interval = interval
+        self.samples = []
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def run(self):
+        session = requests.Session()
+        while not self.stopped.wait(self.interval):
+            try:
+                response = session.get(f'{self.base_url}/health', timeout=self.interval)
+                if response.status_code != 200:
+                    return  # the dev app has no /health
+                workers = response.json().get('workers')
+                if workers:
+                    self.samples.append(workers)
+            except requests.exceptions.RequestException:
+                continue
+
+    def summary(self):
+        """{host: {'running': mean, 'queued': mean}} plus the pool size"""
+        if not self.samples:
+            return None
+        hosts = collections.defaultdict(lambda: {'running': 0.0, 'queued': 0.0})
+        for sample in self.samples:
+            for host, counts in sample['hosts'].items():
+                hosts[host]['running'] += counts['running'] / len(self.samples)
+                hosts[host]['queued'] += counts['queued'] / len(self.samples)
+        running = sum(counts['running'] for counts in hosts.values())
+        return {'samples': len(self.samples), 'max_workers': self.samples[-1]['max_workers'],
+                'mean_running': round(running, 2),
+                'utilization': round(running / self.samples[-1]['max_workers'], 3),
+                'hosts': {host: {k: round(v, 2) for k, v in counts.items()} for host, counts in sorted(hosts.items())}}
+
+
+# ============================================================================
+# REPORT
+# ============================================================================
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(q / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def build_report(args, results, wall_time, health):
+    latencies = sorted(r['latency'] * 1000 for r in results if r['outcome'] == 'ok')
+    firsts = sorted(r['first'] * 1000 for r in results if r['first'] is not None)
+    outcomes = collections.Counter(r['outcome'] for r in results)
+    providers = {}
+    for platform in PLATFORMS:
+        mix = collections.Counter(r['platforms'][platform] for r in results if platform in r['platforms'])
+        if mix:
+            total = sum(mix.values())
+            providers[platform] = {'requests': total, 'ok_rate': round(mix['ok'] / total, 3),
+                                   'errors': {status: count for status, count in mix.most_common() if status != 'ok'}}
+
+    all_latencies = [r['latency'] for r in results]
+    throughput = len(results) / wall_time if wall_time else 0.0
+    # Little's law: mean requests in the system = arrival rate x mean time in system
+    in_flight = throughput * (sum(all_latencies) / len(all_latencies)) if all_latencies else 0.0
+    slots = args.workers * args.threads if args.workers else None
+
+    report = {
+        'endpoint': args.endpoint, 'target_rps': args.rps, 'duration': args.duration,
+        'requests': len(results), 'throughput_rps': round(throughput, 2),
+        'latency_ms': {name: round(percentile(latencies, q), 1) if latencies else None
+                       for name, q in (('p50', 50), ('p95', 95), ('p99', 99), ('max', 100))},
+        'outcomes': dict(outcomes.most_common()),
+        'providers': providers,
+        'mean_in_flight': round(in_flight, 2),
+        'server_utilization': round(in_flight / slots, 3) if slots else None,
+        'provider_pool': health,
+    }
+    if firsts:
+        report['first_result_ms'] = {name: round(percentile(firsts, q), 1)
+                                     for name, q in (('p50', 50), ('p95', 95), ('p99', 99))}
+    return report
+
+
+def print_report(report, slots):
+    print(f"\n{report['endpoint']}: {report['requests']} requests, {report['throughput_rps']} req/s "
+          f"(target {report['target_rps']})")
+    latency = report['latency_ms']
+    print(f"latency ms (ok only)  p50 {latency['p50']}  p95 {latency['p95']}  p99 {latency['p99']}  max {latency['max']}")
+    if 'first_result_ms' in report:
+        first = report['first_result_ms']
+        print(f"first platform ms     p50 {first['p50']}  p95 {first['p95']}  p99 {first['p99']}")
+    print('outcomes: ' + ', '.join(f'{outcome} {count}' for outcome, count in report['outcomes'].items()))
+    print(f"\n{'provider':<14} {'requests':>8} {'ok':>7}  errors")
+    for platform, row in report['providers'].items():
+        errors = ', '.join(f'{status} {count}' for status, count in row['errors'].items()) or '-'
+        print(f"{platform:<14} {row['requests']:>8} {row['ok_rate'] * 100:>6.1f}%  {errors}")
+    if report.get('batch'):
+        batch = report['batch']
+        print(f"background batch: {batch['tickers']} tickers, {batch['results']} results in {batch['seconds']}s "
+              f"({batch['outcome']})")
+    print(f"\nmean requests in flight (Little's law): {report['mean_in_flight']}"
+          + (f" of {slots} worker slots = {report['server_utilization'] * 100:.1f}% utilization" if slots else ''))
+    pool = report['provider_pool']
+    if pool:
+        print(f"provider pool: {pool['mean_running']} of {pool['max_workers']} threads busy on average "
+              f"({pool['utilization'] * 100:.1f}%, {pool['samples']} samples)")
+        for host, counts in pool['hosts'].items():
+            print(f"  {host:<20} running {counts['running']:>6}  queued {counts['queued']:>6}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load-test /get_ratings or /get_ratings_stream')
+    parser.add_argument('--url', default='http://127.0.0.1:5001', help='app base URL')
+    parser.add_argument('--endpoint', default='get_ratings', choices=['get_ratings', 'get_ratings_stream'])
+    parser.add_argument('--rps', type=float, default=5.0, help='request arrival rate')
+    parser.add_argument('--duration', type=float, default=60.0, help='seconds to send requests for')
+    parser.add_argument('--arrivals', default='poisson', choices=['poisson', 'uniform'])
+    parser.add_argument('--max-inflight', type=int, default=256, help='client threads (requests in flight)')
+    parser.add_argument('--timeout', type=float, default=60.0, help='per-request client timeout')
+    parser.add_argument('--csv', nargs='+', help='watchlist CSVs whose symbols are drawn (default: repo watchlists)')
+    parser.add_argument('--tickers', nargs='+', help='explicit symbols, most popular first')
+    parser.add_argument('--zipf-s', type=float, default=1.1, help='Zipf exponent; 0 draws tickers uniformly')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--workers', type=int, help='gunicorn workers serving the app, for utilization')
+    parser.add_argument('--threads', type=int, default=1, help='gunicorn threads per worker')
+    parser.add_argument('--health-interval', type=float, default=1.0, help='seconds between /health samples')
+    parser.add_argument('--slo-p95', type=float, help='exit 1 if p95 latency (ms) exceeds this')
+    parser.add_argument('--json', help='write the report to this file')
+    parser.add_argument('--batch', type=int, default=0,
+                        help='also run one /get_ratings_batch of this many symbols alongside the load')
+    parser.add_argument('--max-shed', type=float,
+                        help='exit 1 if more than this share of requests were shed with HTTP 503')
+    args = parser.parse_args()
+
+    tickers = args.tickers
+    if not tickers:
+        seen = set()
+        tickers = [ticker for csv_file in args.csv or default_watchlists()
+                   for ticker, _ in read_watchlist(csv_file) if not (ticker in seen or seen.add(ticker))]
+    chooser = ZipfTickers(tickers, args.zipf_s, args.seed)
+    offsets = arrival_times(args.rps, args.duration, args.arrivals, args.seed)
+    print(f"Sending {len(offsets)} requests to {args.url}/{args.endpoint} over {args.duration:.0f}s "
+          f"({len(tickers)} symbols, zipf s={args.zipf_s})")
+
+    health = HealthSampler(args.url, args.health_interval)
+    health.thread.start()
+    results = []
+    batch = None
+    start = time.monotonic()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=args.max_inflight + 1) as executor:
+        if args.batch:
+            batch_tickers = [tickers[i % len(tickers)] for i in range(min(args.batch, len(tickers)))]
+            batch = executor.submit(run_batch, args.url, batch_tickers, args.duration + args.timeout)
+        futures = []
+        for offset in offsets:
+            delay = start + offset - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            futures.append(executor.submit(run_request, args, chooser.draw(), start + offset))
+        for future in concurrent.futures.as_completed(futures):
+            results.append(future.result())
+    wall_time = time.monotonic() - start
+    health.stopped.set()
+
+    slots = args.workers * args.threads if args.workers else None
+    report = build_report(args, results, wall_time, health.summary())
+    if batch is not None:
+        report['batch'] = batch.result()
+    print_report(report, slots)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=1)
+            f.write('\n')
+
+    failed = False
+    p95 = report['latency_ms']['p95']
+    if args.slo_p95 is not None and (p95 is None or p95 > args.slo_p95):
+        print(f"\n✗ p95 {p95} ms exceeds the {args.slo_p95:.0f} ms SLO")
+        failed = True
+    shed = report['outcomes'].get('HTTP 503', 0) / len(results) if results else 0.0
+    if args.max_shed is not None and shed > args.max_shed:
+        print(f"\n✗ {shed:.1%} of requests were shed with HTTP 503 (max {args.max_shed:.1%})")
+        failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,299 @@
+"""
+In-process metrics exposed in the Prometheus text format at /metrics
+Per-provider phase latency histograms (connect, ttfb, download, parse,
+extract), HTTP status counts and rate-limiter waits, plus the cache, rate
+limiter, worker pool and circuit breaker state read at scrape time
+
+Each gunicorn worker keeps its own counters; scrape every worker (or run one)
+to see the whole picture.
+"""
+
+import bisect
+import os
+import threading
+import time
+from functools import wraps
+
+
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True') == 'True'
+
+# Seconds; covers a cached parse (~1 ms) up to a provider timing out (15 s)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 15.0, 30.0)
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _format_labels(names, values):
+    if not names:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in values)
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(names, escaped)) + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    """Monotonic count per label set"""
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        if not METRICS_ENABLED:
+            return
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_format_labels(self.labels, label_values)} {_format_value(value)}')
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label set"""
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        if not METRICS_ENABLED:
+            return
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                # Per-bucket counts, then observation sum and count
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for label_values, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                    cumulative += bucket_count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    labels = _format_labels(self.labels + ('le',), label_values + (le,))
+                    lines.append(f'{self.name}_bucket{labels} {cumulative}')
+                labels = _format_labels(self.labels, label_values)
+                lines.append(f'{self.name}_sum{labels} {total!r}')
+                lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+
+def _gauge(name, help_text, labels, samples):
+    """Render gauge samples [(label_values, value)] computed at scrape time"""
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} gauge']
+    lines.extend(f'{name}{_format_labels(labels, values)} {_format_value(value)}' for values, value in samples)
+    return lines
+
+
+def _counter_samples(name, help_text, labels, samples):
+    """Render counters kept elsewhere (e.g. by the rating cache) [(label_values, value)]"""
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+    lines.extend(f'{name}{_format_labels(labels, values)} {_format_value(value)}' for values, value in samples)
+    return lines
+
+
+# ============================================================================
+# PROVIDER METRICS
+# ============================================================================
+
+PHASE_SECONDS = Histogram(
+    'stock_rating_provider_phase_seconds',
+    'Time per provider and lookup phase (connect includes DNS and TLS; ttfb excludes connect)',
+    labels=('provider', 'phase'))
+LOOKUP_SECONDS = Histogram(
+    'stock_rating_platform_lookup_seconds', 'Total time of one platform function call', labels=('platform',))
+HTTP_RESPONSES = Counter(
+    'stock_rating_provider_http_responses_total',
+    'Provider responses by HTTP status, or timeout/connection_error/error when none arrived',
+    labels=('provider', 'status'))
+RATE_LIMIT_WAIT = Histogram(
+    'stock_rating_rate_limiter_wait_seconds', 'Time requests waited for their host token bucket',
+    labels=('provider',))
+DEADLINE_MISSES = Counter(
+    'stock_rating_lookup_deadline_misses_total', 'Provider lookups returned as timeouts because their deadline passed',
+    labels=('platform',))
+HEDGED_LOOKUPS = Counter(
+    'stock_rating_hedged_lookups_total', 'Second lookup attempts sent to a slow provider, and how many answered first',
+    labels=('platform', 'outcome'))
+COALESCED_LOOKUPS = Counter(
+    'stock_rating_coalesced_lookups_total', 'Provider lookups that joined a fetch another request already had in flight',
+    labels=('platform',))
+POOL_WAIT = Histogram(
+    'stock_rating_worker_pool_wait_seconds', 'Time provider pool jobs spent queued before a worker picked them up',
+    labels=('host',))
+POOL_REJECTED = Counter(
+    'stock_rating_worker_pool_rejected_total', 'Provider pool jobs shed because the host queue was full',
+    labels=('host',))
+
+_local = threading.local()
+
+
+def _accounted():
+    return getattr(_local, 'accounted', None)
+
+
+def account(seconds):
+    """Attribute time to the platform lookup running in this thread without recording a phase"""
+    accounted = _accounted()
+    if accounted is not None:
+        accounted[0] += seconds
+
+
+def observe_phase(provider, phase, seconds):
+    """Record one phase duration; it is also subtracted from this thread's extract time"""
+    PHASE_SECONDS.observe(seconds, provider, phase)
+    account(seconds)
+
+
+def observe_rate_limit_wait(provider, seconds):
+    RATE_LIMIT_WAIT.observe(seconds, provider)
+    account(seconds)
+
+
+def count_response(provider, status):
+    HTTP_RESPONSES.inc(provider, str(status))
+
+
+def start_connect_tracking():
+    """Reset the connect time collected for the request about to be sent on this thread"""
+    _local.connect = 0.0
+
+
+def observe_connect(provider, seconds):
+    """Called by the HTTP connection when it opens a new socket"""
+    observe_phase(provider, 'connect', seconds)
+    _local.connect = getattr(_local, 'connect', 0.0) + seconds
+
+
+def connect_time():
+    """Connect time spent by the current request on this thread (0 on a reused keep-alive connection)"""
+    return getattr(_local, 'connect', 0.0)
+
+
+def instrument_platform(platform):
+    """
+    Decorate a platform function to record its total time and its extract phase
+
+    Extract is the call's time not already recorded as a network, parse or
+    rate-limit phase in the same thread (or spent waiting for a page another
+    thread was downloading), i.e. selector cascades, regexes and result building.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not METRICS_ENABLED:
+                return func(*args, **kwargs)
+            outer = _accounted()
+            _local.accounted = [0.0]
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                total = time.perf_counter() - start
+                accounted = _local.accounted[0]
+                _local.accounted = outer
+                LOOKUP_SECONDS.observe(total, platform)
+                PHASE_SECONDS.observe(max(0.0, total - accounted), platform, 'extract')
+                if outer is not None:
+                    outer[0] += total
+        return wrapper
+    return decorator
+
+
+# ============================================================================
+# EXPOSITION
+# ============================================================================
+
+def collect_rating_cache(rating_cache):
+    stats = rating_cache.stats()
+    lookups = []
+    ratios = []
+    for platform, counts in stats.get('platforms', {}).items():
+        for result in ('hits', 'stale_hits', 'misses'):
+            lookups.append(((platform, result), counts[result]))
+        total = counts['hits'] + counts['stale_hits'] + counts['misses']
+        if total:
+            ratios.append(((platform,), (counts['hits'] + counts['stale_hits']) / total))
+    return (_counter_samples('stock_rating_cache_lookups_total', 'Rating cache lookups by platform and result',
+                             ('platform', 'result'), lookups)
+            + _gauge('stock_rating_cache_hit_ratio', 'Share of rating cache lookups served (fresh or stale)',
+                     ('platform',), ratios)
+            + _counter_samples('stock_rating_cache_errors_total', 'Rating cache backend failures', (),
+                               [((), stats.get('errors', 0))]))
+
+
+def collect_rate_limiter(host_limiter):
+    stats = host_limiter.stats()
+    return (_gauge('stock_rating_rate_limiter_rate', 'Current adaptive request rate per host (req/s)',
+                   ('host',), [((host, ), bucket['rate']) for host, bucket in stats.items()])
+            + _gauge('stock_rating_rate_limiter_paused_seconds', 'Remaining pause after a throttling response',
+                     ('host',), [((host, ), bucket['paused_for']) for host, bucket in stats.items()])
+            + _counter_samples('stock_rating_rate_limiter_throttled_total', 'Throttling responses seen per host',
+                               ('host',), [((host, ), bucket['throttled']) for host, bucket in stats.items()]))
+
+
+def collect_provider_pool(provider_pool):
+    stats = provider_pool.stats()
+    samples = []
+    for host, counts in stats['hosts'].items():
+        samples.append(((host, 'running'), counts['running']))
+        samples.append(((host, 'queued'), counts['queued']))
+        samples.append(((host, 'batch_running'), counts['batch_running']))
+        samples.append(((host, 'batch_queued'), counts['batch_queued']))
+    return (_gauge('stock_rating_worker_pool_jobs', 'Provider pool jobs per host and state (running includes batch_running)', ('host', 'state'), samples)
+            + _gauge('stock_rating_worker_pool_busy_threads', 'Provider pool threads running a job', (),
+                     [((), sum(counts['running'] for counts in stats['hosts'].values()))])
+            + _gauge('stock_rating_worker_pool_max_threads', 'Provider pool thread limit', (),
+                     [((), stats['max_workers'])]))
+
+
+# Numeric value of each breaker state for the state gauge
+CIRCUIT_STATES = {'closed': 0, 'half_open': 1, 'open': 2}
+
+
+def collect_circuit_breakers(circuit_breakers):
+    stats = circuit_breakers.stats()
+    return (_gauge('stock_rating_circuit_breaker_state', 'Provider circuit breaker state (0 closed, 1 half-open, 2 open)',
+                   ('host',), [((host, ), CIRCUIT_STATES[breaker['state']]) for host, breaker in stats.items()])
+            + _counter_samples('stock_rating_circuit_breaker_opened_total', 'Times a host circuit breaker opened',
+                               ('host',), [((host, ), breaker['opened']) for host, breaker in stats.items()])
+            + _counter_samples('stock_rating_circuit_breaker_rejected_total',
+                               'Requests failed fast because the host circuit breaker was open',
+                               ('host',), [((host, ), breaker['rejected']) for host, breaker in stats.items()]))
+
+
+def render(rating_cache=None, host_limiter=None, provider_pool=None, circuit_breakers=None):
+    """Every metric in the Prometheus text exposition format"""
+    lines = []
+    for metric in (PHASE_SECONDS, LOOKUP_SECONDS, HTTP_RESPONSES, RATE_LIMIT_WAIT, DEADLINE_MISSES, HEDGED_LOOKUPS,
+                   COALESCED_LOOKUPS, POOL_WAIT, POOL_REJECTED):
+        lines.extend(metric.render())
+    if rating_cache is not None:
+        lines.extend(collect_rating_cache(rating_cache))
+    if host_limiter is not None:
+        lines.extend(collect_rate_limiter(host_limiter))
+    if provider_pool is not None:
+        lines.extend(collect_provider_pool(provider_pool))
+    if circuit_breakers is not None:
+        lines.extend(collect_circuit_breakers(circuit_breakers))
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,274 @@
+"""
+Local stand-in for the rating providers, for end-to-end load tests on one machine
+Serves Zacks, TipRanks, Barchart, Stockopedia and StockAnalysis shaped pages
+(see fixture_corpus.synthetic_page), one port per provider, with configurable
+latency, throttling/blocking responses and slow bodies
+
+Usage:
+    python mock_provider_server.py [--base-port 8900] [--latency lognormal:150,0.6]
+                                   [--latency-for tipranks=lognormal:400,0.8]
+                                   [--provider-rps tipranks=0.5] [--inject 429=0.02]
+                                   [--slow-body 0.05] [--seed 1]
+
+It prints the *_BASE_URL variables to export before starting the app, the
+updater or load_test.py. Each provider keeps its own port, so the rate limiter
+and worker pool treat them as separate hosts exactly as in production.
+GET /__stats on any port returns the responses served so far.
+"""
+
+import argparse
+import collections
+import json
+import math
+import random
+import re
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from fixture_corpus import synthetic_page
+
+
+# Path each provider's pages live under; group 1 is the ticker
+PROVIDER_PATHS = {
+    'zacks': re.compile(r'^/stock/quote/([^/?]+)'),
+    'tipranks': re.compile(r'^/stocks/([^/?]+)/?$'),
+    'barchart': re.compile(r'^/stocks/quotes/([^/?]+)/overview'),
+    'stockopedia': re.compile(r'^/share-prices/[^/?]+-NSQ:([^/?]+)/?'),
+    'stockanalysis': re.compile(r'^/stocks/([^/?]+)/forecast'),
+}
+
+# Status a provider answers with when its own rate limit is exceeded
+THROTTLE_STATUS = {'tipranks': 471}
+
+
+# ============================================================================
+# LATENCY DISTRIBUTIONS
+# ============================================================================
+
+def parse_latency(spec):
+    """
+    Build a latency sampler from a spec string (milliseconds)
+
+    Specs: 'fixed:MS', 'uniform:LOW,HIGH', 'lognormal:MEDIAN,SIGMA', 'exp:MEAN'
+
+    Returns:
+        function(rng) -> seconds
+    """
+    kind, _, params = spec.partition(':')
+    values = [float(value) for value in params.split(',') if value]
+    if kind == 'fixed' and len(values) == 1:
+        return lambda rng: values[0] / 1000
+    if kind == 'uniform' and len(values) == 2:
+        return lambda rng: rng.uniform(values[0], values[1]) / 1000
+    if kind == 'lognormal' and len(values) == 2:
+        mu = math.log(values[0])
+        return lambda rng: rng.lognormvariate(mu, values[1]) / 1000
+    if kind == 'exp' and len(values) == 1:
+        return lambda rng: rng.expovariate(1 / values[0]) / 1000
+    raise argparse.ArgumentTypeError(f'Bad latency spec {spec!r}')
+
+
+def parse_assignment(value, convert):
+    """'name=value' command-line pair"""
+    name, sep, raw = value.partition('=')
+    if not sep:
+        raise argparse.ArgumentTypeError(f'Expected NAME=VALUE, got {value!r}')
+    return name, convert(raw)
+
+
+class ServerBucket:
+    """Provider-side token bucket: requests over the rate are refused rather than delayed"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+# ============================================================================
+# PROVIDER BEHAVIOUR
+# ============================================================================
+
+class MockProvider:
+    """What one provider port serves: pages per ticker, latency, injected failures"""
+
+    def __init__(self, name, config):
+        self.name = name
+        self.config = config
+        self.latency = config['latency_for'].get(name, config['latency'])
+        rps = config['provider_rps'].get(name)
+        self.bucket = ServerBucket(rps, max(1.0, rps * 2)) if rps else None
+        self.rng = random.Random(f"{config['seed']}:{name}")
+        self.rng_lock = threading.Lock()
+        self.pages = {}
+        self.pages_lock = threading.Lock()
+        self.served = collections.Counter()
+        self.stats_lock = threading.Lock()
+
+    def case_for(self, ticker):
+        """Rated / not-rated / not-found, fixed per ticker so repeated runs see the same pages"""
+        draw = (zlib.crc32(f"{self.config['seed']}:{self.name}:{ticker}".encode()) % 10000) / 10000
+        if draw < self.config['not_found']:
+            return 'not-found'
+        if draw < self.config['not_found'] + self.config['not_rated']:
+            return 'not-rated'
+        return 'rated'
+
+    def page(self, ticker):
+        with self.pages_lock:
+            page = self.pages.get(ticker)
+        if page is None:
+            case = self.case_for(ticker)
+            page = synthetic_page(self.name, ticker, f'{ticker} Holdings Inc.', case,
+                                  variant=zlib.crc32(ticker.encode()) % 2, rows=self.config['rows'])
+            with self.pages_lock:
+                self.pages[ticker] = page
+        return page
+
+    def draw(self):
+        """Per-request random choices, made under one lock so a seed gives one sequence"""
+        with self.rng_lock:
+            delay = self.latency(self.rng)
+            injected = None
+            roll = self.rng.random()
+            for status, rate in self.config['inject']:
+                if roll < rate:
+                    injected = status
+                    break
+                roll -= rate
+            slow = self.rng.random() < self.config['slow_body']
+        return delay, injected, slow
+
+    def respond(self, ticker):
+        """
+        Returns:
+            tuple: (status, body, extra_headers, delay_seconds, slow_body)
+        """
+        delay, injected, slow = self.draw()
+        if self.bucket is not None and not self.bucket.allow():
+            injected = THROTTLE_STATUS.get(self.name, 429)
+        if injected is not None:
+            headers = {'Retry-After': str(self.config['retry_after'])} if injected == 429 else {}
+            return injected, b'<html><head><title>Access Denied</title></head></html>', headers, delay, False
+        status, body = self.page(ticker)
+        return status, body, {}, delay, slow
+
+    def record(self, status):
+        with self.stats_lock:
+            self.served[status] += 1
+
+    def stats(self):
+        with self.stats_lock:
+            return {str(status): count for status, count in sorted(self.served.items())}
+
+
+def make_handler(provider, providers):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            if self.path == '/__stats':
+                body = json.dumps({name: p.stats() for name, p in providers.items()}).encode()
+                return self.send_body(200, body, {'Content-Type': 'application/json'})
+            match = PROVIDER_PATHS[provider.name].match(self.path)
+            if not match:
+                provider.record(404)
+                return self.send_body(404, b'Not Found', {})
+            status, body, headers, delay, slow = provider.respond(match.group(1).upper())
+            time.sleep(delay)
+            provider.record(status)
+            self.send_body(status, body, headers, slow)
+
+        def send_body(self, status, body, headers, slow=False):
+            self.send_response(status)
+            self.send_header('Content-Type', headers.pop('Content-Type', 'text/html; charset=utf-8'))
+            self.send_header('Content-Length', str(len(body)))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            if not slow:
+                self.wfile.write(body)
+                return
+            # Trickle the body out over slow_body_ms, as a congested provider would
+            chunks = max(1, len(body) // 4096)
+            pause = provider.config['slow_body_ms'] / 1000 / chunks
+            for start in range(0, len(body), 4096):
+                self.wfile.write(body[start:start + 4096])
+                self.wfile.flush()
+                time.sleep(pause)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve provider-shaped pages locally for load testing')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--base-port', type=int, default=8900, help='providers listen on base-port+1 .. base-port+5')
+    parser.add_argument('--latency', type=parse_latency, default='lognormal:150,0.6',
+                        help="response delay in ms: fixed:MS, uniform:LO,HI, lognormal:MEDIAN,SIGMA or exp:MEAN")
+    parser.add_argument('--latency-for', action='append', default=[],
+                        type=lambda v: parse_assignment(v, parse_latency), help='PROVIDER=SPEC override')
+    parser.add_argument('--provider-rps', action='append', default=[], type=lambda v: parse_assignment(v, float),
+                        help='PROVIDER=RPS: answer 429 (471 for tipranks) above this rate')
+    parser.add_argument('--inject', action='append', default=[], type=lambda v: parse_assignment(v, float),
+                        help='STATUS=FRACTION of responses replaced by that status, e.g. 429=0.02 471=0.01 403=0.01')
+    parser.add_argument('--retry-after', type=int, default=5, help='Retry-After seconds sent with 429s')
+    parser.add_argument('--slow-body', type=float, default=0.0, help='fraction of pages whose body is trickled')
+    parser.add_argument('--slow-body-ms', type=float, default=2000, help='time a trickled body takes to send')
+    parser.add_argument('--not-rated', type=float, default=0.1, help='fraction of tickers with no rating')
+    parser.add_argument('--not-found', type=float, default=0.05, help='fraction of tickers the provider 404s')
+    parser.add_argument('--rows', type=int, default=300, help='filler rows per page (page size)')
+    parser.add_argument('--seed', default='1')
+    args = parser.parse_args()
+
+    config = {
+        'latency': args.latency,
+        'latency_for': dict(args.latency_for),
+        'provider_rps': dict(args.provider_rps),
+        'inject': [(int(status), rate) for status, rate in args.inject],
+        'retry_after': args.retry_after,
+        'slow_body': args.slow_body,
+        'slow_body_ms': args.slow_body_ms,
+        'not_rated': args.not_rated,
+        'not_found': args.not_found,
+        'rows': args.rows,
+        'seed': args.seed,
+    }
+    providers = {name: MockProvider(name, config) for name in PROVIDER_PATHS}
+
+    servers = []
+    for offset, (name, provider) in enumerate(providers.items(), start=1):
+        server = ThreadingHTTPServer((args.host, args.base_port + offset), make_handler(provider, providers))
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name=f'mock-{name}', daemon=True).start()
+        servers.append(server)
+        print(f'export {name.upper()}_BASE_URL=http://{args.host}:{args.base_port + offset}')
+
+    print('# Ctrl-C to stop', flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        for server in servers:
+            server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
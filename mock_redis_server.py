@@ -0,0 +1,224 @@
+"""
+Local stand-in for Redis, for running the rating cache's redis backend on one machine
+Speaks just enough RESP for rating_cache.RedisBackend: PING, AUTH, SELECT, GET,
+SET (with EX/PX expiry), DEL and SCAN, keeping keys in memory
+
+Usage:
+    python mock_redis_server.py [--port 6390]
+    python mock_redis_server.py --self-check
+
+Point the app at it with RATING_CACHE_BACKEND=redis and
+RATING_CACHE_URL=redis://127.0.0.1:6390/0. --self-check starts the stand-in on
+a free port, runs RedisBackend against it (get/set, expiry, delete, clear, and
+the retry cooldown after a connection failure) and exits 1 on the first
+check that fails.
+"""
+
+import argparse
+import fnmatch
+import socket
+import socketserver
+import sys
+import threading
+import time
+
+
+# ============================================================================
+# SERVER
+# ============================================================================
+
+class MockRedis:
+    """Key/value store with per-key expiry, shared by every connection"""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def _live(self, key, now):
+        """Value stored under key unless it has expired; lock held"""
+        entry = self._data.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= now:
+            del self._data[key]
+            entry = None
+        return None if entry is None else entry[0]
+
+    def execute(self, args):
+        """
+        Run one command
+
+        Args:
+            args: Command name and arguments as bytes
+
+        Returns:
+            Reply value: str (status), int, bytes, None (nil), list, or an Exception (error reply)
+        """
+        command = args[0].upper().decode()
+        now = time.monotonic()
+        with self._lock:
+            if command == 'PING':
+                return 'PONG'
+            if command in ('AUTH', 'SELECT'):
+                return 'OK'
+            if command == 'GET':
+                return self._live(args[1], now)
+            if command == 'SET':
+                expires_at = None
+                options = [arg.upper() for arg in args[3::2]]
+                for option, value in zip(options, args[4::2]):
+                    if option == b'PX':
+                        expires_at = now + int(value) / 1000
+                    elif option == b'EX':
+                        expires_at = now + int(value)
+                self._data[args[1]] = (args[2], expires_at)
+                return 'OK'
+            if command == 'DEL':
+                return sum(1 for key in args[1:] if self._live(key, now) is not None and self._data.pop(key))
+            if command == 'SCAN':
+                # One pass returns everything, so the cursor is always 0
+                pattern = '*'
+                for option, value in zip(args[2::2], args[3::2]):
+                    if option.upper() == b'MATCH':
+                        pattern = value.decode()
+                keys = [key for key in list(self._data) if self._live(key, now) is not None
+                        and fnmatch.fnmatchcase(key.decode(), pattern)]
+                return [b'0', keys]
+        return RuntimeError(f"ERR unknown command '{command}'")
+
+
+def encode_reply(value):
+    """RESP encoding of a reply value from MockRedis.execute"""
+    if isinstance(value, Exception):
+        return f'-{value}\r\n'.encode()
+    if isinstance(value, str):
+        return f'+{value}\r\n'.encode()
+    if isinstance(value, int):
+        return f':{value}\r\n'.encode()
+    if value is None:
+        return b'$-1\r\n'
+    if isinstance(value, bytes):
+        return b'$%d\r\n%s\r\n' % (len(value), value)
+    return f'*{len(value)}\r\n'.encode() + b''.join(encode_reply(item) for item in value)
+
+
+def read_command(reader):
+    """One RESP array of bulk strings from the client, or None when it disconnects"""
+    line = reader.readline()
+    if not line:
+        return None
+    if not line.startswith(b'*'):
+        # Inline command (e.g. typed into telnet)
+        return line.split()
+    args = []
+    for _ in range(int(line[1:])):
+        length = int(reader.readline()[1:])
+        args.append(reader.read(length + 2)[:-2])
+    return args
+
+
+def make_handler(store):
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            while True:
+                args = read_command(self.rfile)
+                if not args:
+                    return
+                self.wfile.write(encode_reply(store.execute(args)))
+
+    return Handler
+
+
+def start_server(host='127.0.0.1', port=0):
+    """Serve a fresh MockRedis in a daemon thread; returns (server, store)"""
+    store = MockRedis()
+    server = socketserver.ThreadingTCPServer((host, port), make_handler(store))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='mock-redis', daemon=True).start()
+    return server, store
+
+
+# ============================================================================
+# SELF-CHECK
+# ============================================================================
+
+def free_port():
+    """A local port nothing is listening on"""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def self_check():
+    """Run RedisBackend and RatingCache against the stand-in; returns the failed check names"""
+    from rating_cache import RatingCache, RedisBackend
+
+    server, _ = start_server()
+    port = server.server_address[1]
+    backend = RedisBackend(url=f'redis://127.0.0.1:{port}/1', key_prefix='check:')
+    failed = []
+
+    def check(name, ok):
+        print(f"{'✓' if ok else '✗'} {name}")
+        if not ok:
+            failed.append(name)
+
+    backend.set('zacks:AAPL', {'result': {'rating': 'Buy'}}, 60)
+    check('get returns what set stored', backend.get('zacks:AAPL') == {'result': {'rating': 'Buy'}})
+    check('get of a missing key is None', backend.get('zacks:MSFT') is None)
+
+    backend.set('price:AAPL', {'price': '$1.00'}, 0.05)
+    time.sleep(0.1)
+    check('a key is gone once its ttl has passed', backend.get('price:AAPL') is None)
+
+    backend.delete('zacks:AAPL')
+    check('delete removes a key', backend.get('zacks:AAPL') is None)
+
+    backend.set('tipranks:AAPL', {'score': 8}, 60)
+    backend.set('barchart:AAPL', {'rating': 'Hold'}, 60)
+    backend.clear()
+    check('clear removes every key', backend.get('tipranks:AAPL') is None and backend.get('barchart:AAPL') is None)
+
+    cache = RatingCache(backend=backend, enabled=True)
+    cache.set('zacks', 'AAPL', {'rating': 'Buy', 'success': True})
+    check('RatingCache round-trips a result', (cache.get('zacks', 'AAPL') or {}).get('rating') == 'Buy')
+
+    # Nothing listens on this port: the first call pays the connect attempt, the rest fail at once
+    down = RedisBackend(url=f'redis://127.0.0.1:{free_port()}/0', retry_seconds=0.5)
+    down_cache = RatingCache(backend=down, enabled=True)
+    down_cache.get('zacks', 'AAPL')
+    start = time.monotonic()
+    for _ in range(20):
+        down_cache.get('zacks', 'AAPL')
+    check('calls are skipped during the retry cooldown',
+          time.monotonic() - start < 0.05 and down.stats()['connection_failures'] == 1)
+    time.sleep(0.6)
+    down_cache.get('zacks', 'AAPL')
+    check('the server is tried again after the cooldown', down.stats()['connection_failures'] == 2)
+
+    server.shutdown()
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve a minimal Redis stand-in locally')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=6390)
+    parser.add_argument('--self-check', action='store_true', help='check RedisBackend against the stand-in and exit')
+    args = parser.parse_args()
+
+    if args.self_check:
+        failed = self_check()
+        print(f"\n{len(failed)} check(s) failed" if failed else '\nAll checks passed')
+        sys.exit(1 if failed else 0)
+
+    server, _ = start_server(args.host, args.port)
+    print(f"Mock Redis listening on {args.host}:{args.port}")
+    print(f"  export RATING_CACHE_BACKEND=redis RATING_CACHE_URL=redis://{args.host}:{args.port}/0")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
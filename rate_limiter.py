@@ -0,0 +1,193 @@
+"""
+Per-host adaptive rate limiting for provider requests
+Each provider host gets a token bucket whose refill rate backs off when the
+host answers 429/403/471 and creeps back up while requests succeed (AIMD)
+"""
+
+import os
+import threading
+import time
+
+
+# Steady-state requests per second and burst size for hosts without an override
+RATE_LIMIT_DEFAULT_RPS = float(os.getenv('RATE_LIMIT_DEFAULT_RPS', '1.0'))
+RATE_LIMIT_DEFAULT_BURST = float(os.getenv('RATE_LIMIT_DEFAULT_BURST', '3'))
+# Floor the rate can be cut to, and how much it recovers per successful response
+RATE_LIMIT_MIN_RPS = float(os.getenv('RATE_LIMIT_MIN_RPS', '0.05'))
+RATE_LIMIT_INCREASE = float(os.getenv('RATE_LIMIT_INCREASE', '0.05'))
+RATE_LIMIT_DECREASE = float(os.getenv('RATE_LIMIT_DECREASE', '0.5'))
+# Pause applied to a host on a throttling response that carries no Retry-After
+RATE_LIMIT_COOLDOWN = float(os.getenv('RATE_LIMIT_COOLDOWN', '10'))
+# Longest pause a throttling response can impose, however large its Retry-After
+RATE_LIMIT_MAX_PAUSE = float(os.getenv('RATE_LIMIT_MAX_PAUSE', '120'))
+
+# Status codes providers use to tell us to slow down (471 is TipRanks' bot block)
+THROTTLE_STATUS_CODES = (429, 403, 471)
+
+# Starting (rps, burst) for hosts known to throttle harder than the default
+HOST_RATE_LIMITS = {
+    'tipranks.com': (0.4, 2),
+    'barchart.com': (0.5, 2),
+}
+
+
+class TokenBucket:
+    """
+    Token bucket whose rate adapts to the responses it sees
+
+    reserve() takes a token immediately and returns how long the caller must
+    wait before using it, so concurrent callers are spaced out in arrival
+    order instead of all waking at once. A throttling response halves the rate
+    and pauses the bucket; each success adds a little rate back, up to the
+    configured ceiling.
+    """
+
+    def __init__(self, rate=RATE_LIMIT_DEFAULT_RPS, burst=RATE_LIMIT_DEFAULT_BURST,
+                 min_rate=RATE_LIMIT_MIN_RPS, increase=RATE_LIMIT_INCREASE,
+                 decrease=RATE_LIMIT_DECREASE, cooldown=RATE_LIMIT_COOLDOWN, max_pause=RATE_LIMIT_MAX_PAUSE):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self.max_pause = max_pause
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.throttled = 0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        start = max(self.updated, self.paused_until)
+        if now > start:
+            self.tokens = min(self.burst, self.tokens + (now - start) * self.rate)
+        self.updated = max(self.updated, now)
+
+    def reserve(self, max_wait=None):
+        """
+        Take a token
+
+        Args:
+            max_wait: Longest wait the caller can afford (e.g. what is left of its
+                      deadline); a token that would come later is not taken
+
+        Returns:
+            float: Seconds to wait before sending the request (0 when a token is
+            available), or None when that would exceed max_wait
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            wait = max(0.0, self.paused_until - now)
+            if self.tokens < 1:
+                wait += (1 - self.tokens) / self.rate
+            if max_wait is not None and wait > max_wait:
+                return None
+            self.tokens -= 1
+            return wait
+
+    def refund(self):
+        """Give back a reserved token that was never used (e.g. its caller was cancelled while waiting)"""
+        with self._lock:
+            self.tokens = min(self.burst, self.tokens + 1)
+
+    def acquire(self, max_wait=None):
+        """Block until a token is available; None without waiting when that would exceed max_wait"""
+        wait = self.reserve(max_wait)
+        if wait:
+            time.sleep(wait)
+        return wait
+
+    def observe(self, status_code, retry_after=None):
+        """
+        Adapt the rate to a response
+
+        Args:
+            status_code: HTTP status of the response
+            retry_after: Seconds from a Retry-After header, if any
+        """
+        with self._lock:
+            if status_code in THROTTLE_STATUS_CODES:
+                self.throttled += 1
+                self.rate = max(self.min_rate, self.rate * self.decrease)
+                # Drop the banked burst so the next requests really are spaced out
+                self.tokens = min(self.tokens, 0)
+                pause = min(self.max_pause, retry_after if retry_after is not None else self.cooldown)
+                self.paused_until = max(self.paused_until, time.monotonic() + pause)
+            else:
+                self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'rate': round(self.rate, 3),
+                'max_rate': self.max_rate,
+                'tokens': round(self.tokens, 2),
+                'paused_for': round(max(0.0, self.paused_until - time.monotonic()), 2),
+                'throttled': self.throttled
+            }
+
+
+class HostRateLimiter:
+    """Token buckets keyed by host, created on first use"""
+
+    def __init__(self, host_limits=None, enabled=True):
+        self.host_limits = dict(HOST_RATE_LIMITS if host_limits is None else host_limits)
+        self.enabled = enabled
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, host):
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                rate, burst = self.host_limits.get(host, (RATE_LIMIT_DEFAULT_RPS, RATE_LIMIT_DEFAULT_BURST))
+                bucket = self._buckets[host] = TokenBucket(rate=rate, burst=burst)
+            return bucket
+
+    def configure(self, host, rate, burst=None):
+        """Set host's steady-state rate (and burst), replacing any bucket already in use"""
+        with self._lock:
+            current = self.host_limits.get(host, (RATE_LIMIT_DEFAULT_RPS, RATE_LIMIT_DEFAULT_BURST))
+            self.host_limits[host] = (rate, current[1] if burst is None else burst)
+            self._buckets.pop(host, None)
+
+    def reserve(self, host, max_wait=None):
+        """Seconds the caller must wait before requesting host (for callers that sleep themselves), or None past max_wait"""
+        if not self.enabled:
+            return 0.0
+        return self.bucket(host).reserve(max_wait)
+
+    def refund(self, host):
+        """Return a token reserved for host but never used"""
+        if self.enabled:
+            self.bucket(host).refund()
+
+    def acquire(self, host, max_wait=None):
+        """Block until host may be requested again; None without waiting when that would exceed max_wait"""
+        if not self.enabled:
+            return 0.0
+        return self.bucket(host).acquire(max_wait)
+
+    def observe(self, host, status_code, retry_after=None):
+        """Feed a response status back into host's bucket"""
+        if self.enabled:
+            self.bucket(host).observe(status_code, retry_after)
+
+    def stats(self):
+        with self._lock:
+            buckets = dict(self._buckets)
+        return {host: bucket.stats() for host, bucket in sorted(buckets.items())}
+
+
+def parse_retry_after(value):
+    """Seconds from a Retry-After header given in delta-seconds form, else None"""
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+host_limiter = HostRateLimiter(enabled=os.getenv('HOST_RATE_LIMIT_ENABLED', 'True') == 'True')
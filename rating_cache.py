@@ -0,0 +1,489 @@
+"""
+Cache for per-ticker platform results
+Answers repeat lookups of popular tickers without scraping the providers again
+
+The storage is pluggable so gunicorn workers can share one cache:
+- memory: per-process LRU dict (default)
+- sqlite: WAL-mode SQLite file shared by every process on the host
+- redis:  any server speaking the Redis protocol (RESP)
+"""
+
+import concurrent.futures
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+# Seconds a successful result stays fresh, per platform
+PLATFORM_TTLS = {
+    'price': 60,
+    'zacks': 6 * 3600,
+    'tipranks': 6 * 3600,
+    'barchart': 3600,
+    'stockopedia': 12 * 3600,
+    'stockanalysis': 6 * 3600,
+}
+DEFAULT_TTL = 3600
+
+# Seconds past its TTL an expired result may still be served while it is refreshed
+PLATFORM_STALE_SECONDS = {
+    'price': 300,
+}
+DEFAULT_STALE_SECONDS = int(os.getenv('RATING_CACHE_STALE_SECONDS', str(24 * 3600)))
+
+RATING_CACHE_ENABLED = os.getenv('RATING_CACHE_ENABLED', 'True') == 'True'
+RATING_CACHE_BACKEND = os.getenv('RATING_CACHE_BACKEND', 'memory')
+RATING_CACHE_PATH = os.getenv('RATING_CACHE_PATH', '/tmp/stock_rating_cache.sqlite3')
+RATING_CACHE_URL = os.getenv('RATING_CACHE_URL', 'redis://127.0.0.1:6379/0')
+# Seconds the redis backend is skipped (every call a miss) after a connection failure
+RATING_CACHE_RETRY_SECONDS = float(os.getenv('RATING_CACHE_RETRY_SECONDS', '30'))
+RATING_CACHE_MAX_ENTRIES = int(os.getenv('RATING_CACHE_MAX_ENTRIES', '5000'))
+RATING_CACHE_MAX_BYTES = int(os.getenv('RATING_CACHE_MAX_BYTES', str(16 * 1024 * 1024)))
+RATING_CACHE_SERVE_STALE = os.getenv('RATING_CACHE_SERVE_STALE', 'True') == 'True'
+RATING_CACHE_REFRESH_WORKERS = int(os.getenv('RATING_CACHE_REFRESH_WORKERS', '4'))
+
+
+# ============================================================================
+# STORAGE BACKENDS
+# ============================================================================
+#
+# Backends store JSON-serializable values under string keys for `ttl` seconds.
+# They only need get/set/delete/clear/stats; freshness is decided by RatingCache.
+
+class MemoryBackend:
+    """Per-process LRU store bounded by entry count and approximate JSON size"""
+
+    name = 'memory'
+
+    def __init__(self, max_entries=RATING_CACHE_MAX_ENTRIES, max_bytes=RATING_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._evictions = 0
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= now:
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl):
+        size = len(json.dumps(value, default=str))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.time() + ttl, value, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self._evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self._evictions = 0
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._bytes, 'evictions': self._evictions}
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry[2]
+
+
+class SQLiteBackend:
+    """
+    SQLite file in WAL mode shared by every worker process on one host
+
+    Each thread of each process opens its own connection. Least recently read
+    entries are pruned once the table grows past max_entries.
+    """
+
+    name = 'sqlite'
+    PRUNE_EVERY = 100
+
+    def __init__(self, path=RATING_CACHE_PATH, max_entries=RATING_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS rating_cache ('
+                         'key TEXT PRIMARY KEY, value TEXT NOT NULL, '
+                         'expires_at REAL NOT NULL, accessed_at REAL NOT NULL)')
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def get(self, key):
+        conn = self._connection()
+        now = time.time()
+        row = conn.execute('SELECT value FROM rating_cache WHERE key = ? AND expires_at > ?',
+                           (key, now)).fetchone()
+        if row is None:
+            return None
+        conn.execute('UPDATE rating_cache SET accessed_at = ? WHERE key = ?', (now, key))
+        return json.loads(row[0])
+
+    def set(self, key, value, ttl):
+        conn = self._connection()
+        now = time.time()
+        conn.execute('INSERT OR REPLACE INTO rating_cache (key, value, expires_at, accessed_at) '
+                     'VALUES (?, ?, ?, ?)', (key, json.dumps(value, default=str), now + ttl, now))
+        self._writes += 1
+        if self._writes % self.PRUNE_EVERY == 0:
+            self._prune(conn, now)
+
+    def delete(self, key):
+        self._connection().execute('DELETE FROM rating_cache WHERE key = ?', (key,))
+
+    def clear(self):
+        self._connection().execute('DELETE FROM rating_cache')
+
+    def stats(self):
+        entries, size = self._connection().execute(
+            'SELECT COUNT(*), COALESCE(SUM(LENGTH(value)), 0) FROM rating_cache').fetchone()
+        return {'entries': entries, 'bytes': size, 'path': self.path}
+
+    def _prune(self, conn, now):
+        conn.execute('DELETE FROM rating_cache WHERE expires_at <= ?', (now,))
+        conn.execute('DELETE FROM rating_cache WHERE key IN ('
+                     'SELECT key FROM rating_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)',
+                     (self.max_entries,))
+
+
+class RedisBackend:
+    """
+    Minimal Redis-protocol (RESP) client: GET, SET with PX expiry, DEL, SCAN
+
+    Works against Redis, Valkey, KeyDB or any local stand-in that speaks RESP
+    (e.g. mock_redis_server.py). Eviction is left to the server's maxmemory
+    policy. After a connection failure the server is not tried again for
+    retry_seconds: calls fail at once instead of each waiting out the socket
+    timeout while Redis is down.
+    """
+
+    name = 'redis'
+
+    def __init__(self, url=RATING_CACHE_URL, socket_timeout=0.5, key_prefix='stock-ratings:',
+                 retry_seconds=RATING_CACHE_RETRY_SECONDS):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or '127.0.0.1'
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip('/') or 0)
+        self.socket_timeout = socket_timeout
+        self.key_prefix = key_prefix
+        self.retry_seconds = retry_seconds
+        self._down_until = 0.0
+        self._failures = 0
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            if time.monotonic() < self._down_until:
+                raise ConnectionError(f'Redis at {self.host}:{self.port} is down; retrying later')
+            try:
+                sock = socket.create_connection((self.host, self.port), timeout=self.socket_timeout)
+            except OSError:
+                self._mark_down()
+                raise
+            conn = (sock, sock.makefile('rb'))
+            self._local.conn, self._local.pid = conn, os.getpid()
+            if self.password:
+                self._command('AUTH', self.password)
+            if self.db:
+                self._command('SELECT', self.db)
+        return conn
+
+    def _command(self, *args):
+        sock, reader = self._connection()
+        parts = [f'*{len(args)}\r\n'.encode()]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode()
+            parts.append(b'$%d\r\n%s\r\n' % (len(data), data))
+        try:
+            sock.sendall(b''.join(parts))
+            return self._read_reply(reader)
+        except (OSError, ConnectionError):
+            self._local.conn = None
+            sock.close()
+            self._mark_down()
+            raise
+
+    def _mark_down(self):
+        self._failures += 1
+        self._down_until = time.monotonic() + self.retry_seconds
+
+    def _read_reply(self, reader):
+        line = reader.readline()
+        if not line:
+            raise ConnectionError('Redis connection closed')
+        kind, payload = line[:1], line[1:-2]
+        if kind == b'+':
+            return payload.decode()
+        if kind == b'-':
+            raise RuntimeError(payload.decode())
+        if kind == b':':
+            return int(payload)
+        if kind == b'$':
+            length = int(payload)
+            if length < 0:
+                return None
+            return reader.read(length + 2)[:-2]
+        if kind == b'*':
+            count = int(payload)
+            return None if count < 0 else [self._read_reply(reader) for _ in range(count)]
+        raise RuntimeError(f'Unexpected Redis reply: {line[:20]!r}')
+
+    def get(self, key):
+        value = self._command('GET', self.key_prefix + key)
+        return None if value is None else json.loads(value)
+
+    def set(self, key, value, ttl):
+        self._command('SET', self.key_prefix + key, json.dumps(value, default=str), 'PX', max(1, int(ttl * 1000)))
+
+    def delete(self, key):
+        self._command('DEL', self.key_prefix + key)
+
+    def clear(self):
+        cursor = '0'
+        while True:
+            cursor, keys = self._command('SCAN', cursor, 'MATCH', self.key_prefix + '*', 'COUNT', 1000)
+            if keys:
+                self._command('DEL', *keys)
+            cursor = cursor.decode() if isinstance(cursor, bytes) else str(cursor)
+            if cursor == '0':
+                break
+
+    def stats(self):
+        return {'url': f'redis://{self.host}:{self.port}/{self.db}', 'connection_failures': self._failures,
+                'retry_in': round(max(0.0, self._down_until - time.monotonic()), 2)}
+
+
+def create_backend(name=RATING_CACHE_BACKEND):
+    """Build the storage backend selected by RATING_CACHE_BACKEND"""
+    if name == 'sqlite':
+        return SQLiteBackend()
+    if name == 'redis':
+        return RedisBackend()
+    if name == 'memory':
+        return MemoryBackend()
+    raise ValueError(f'Unknown rating cache backend: {name}')
+
+
+# ============================================================================
+# CACHE
+# ============================================================================
+
+class RatingCache:
+    """
+    TTL cache of platform results keyed by (platform, ticker)
+
+    Only successful results are stored, so errors and blocks are always retried.
+    Expired entries are kept for a further stale window so lookups can serve
+    them immediately (stale-while-revalidate) while refresh() re-scrapes the
+    platform in the background. Storage errors (a locked SQLite file, an
+    unreachable Redis) are treated as misses so the cache can never fail a
+    lookup. Hit/miss counters are kept per process.
+    """
+
+    def __init__(self, backend=None, ttls=None, stale_seconds=None, enabled=RATING_CACHE_ENABLED,
+                 serve_stale=RATING_CACHE_SERVE_STALE, refresh_workers=RATING_CACHE_REFRESH_WORKERS):
+        self.backend = backend if backend is not None else create_backend()
+        self.ttls = dict(PLATFORM_TTLS if ttls is None else ttls)
+        self.stale_seconds = dict(PLATFORM_STALE_SECONDS if stale_seconds is None else stale_seconds)
+        self.enabled = enabled
+        self.serve_stale = serve_stale
+        self.refresh_workers = refresh_workers
+        self._lock = threading.Lock()
+        self._hits = {}
+        self._stale_hits = {}
+        self._misses = {}
+        self._errors = 0
+        self._refreshing = set()
+        self._refresh_executor = None
+
+    def ttl_for(self, platform):
+        """Seconds a result for platform stays fresh"""
+        return self.ttls.get(platform, DEFAULT_TTL)
+
+    def stale_for(self, platform):
+        """Seconds past its TTL a result for platform may still be served stale"""
+        return self.stale_seconds.get(platform, DEFAULT_STALE_SECONDS)
+
+    def get(self, platform, ticker, allow_stale=False):
+        """
+        Return a cached result, or None on a miss
+
+        Every hit carries 'age_seconds'; a hit past its TTL (only returned when
+        allow_stale is set) is also flagged 'stale': True.
+        """
+        if not self.enabled:
+            return None
+
+        entry = self._backend_call('get', cache_key(platform, ticker))
+        age = time.time() - entry['stored_at'] if entry is not None else None
+        is_stale = entry is not None and age >= self.ttl_for(platform)
+        if is_stale and (not allow_stale or age >= self.ttl_for(platform) + self.stale_for(platform)):
+            entry = None
+
+        if entry is None:
+            self._count(self._misses, platform)
+            return None
+        self._count(self._stale_hits if is_stale else self._hits, platform)
+        result = dict(entry['result'], age_seconds=int(age))
+        if is_stale:
+            result['stale'] = True
+        return result
+
+    def set(self, platform, ticker, result):
+        """Store result if it is a successful lookup"""
+        if not self.enabled or not result or not result.get('success'):
+            return
+        result = {k: v for k, v in result.items() if k not in ('age_seconds', 'stale')}
+        entry = {'result': result, 'stored_at': time.time()}
+        retention = self.ttl_for(platform) + (self.stale_for(platform) if self.serve_stale else 0)
+        self._backend_call('set', cache_key(platform, ticker), entry, retention)
+
+    def lookup(self, ticker, platforms, allow_stale=None):
+        """
+        Look up several platforms for one ticker
+
+        Args:
+            ticker: Stock ticker symbol
+            platforms: Platform names to look up
+            allow_stale: Also return expired results flagged 'stale' (defaults to serve_stale)
+
+        Returns:
+            dict: {platform: result} for the platforms that were cache hits
+        """
+        if allow_stale is None:
+            allow_stale = self.serve_stale
+        hits = {}
+        for platform in platforms:
+            result = self.get(platform, ticker, allow_stale=allow_stale)
+            if result is not None:
+                hits[platform] = result
+        return hits
+
+    def get_or_fetch(self, platform, ticker, fetch):
+        """Return the fresh cached result for (platform, ticker) or call fetch() and cache it"""
+        result = self.get(platform, ticker)
+        if result is None:
+            result = fetch()
+            self.set(platform, ticker, result)
+        return result
+
+    def refresh(self, platform, ticker, fetch):
+        """
+        Re-fetch (platform, ticker) in the background and store the new result
+
+        A refresh already running for the same key is not started twice.
+
+        Returns:
+            bool: True if a refresh was scheduled
+        """
+        key = cache_key(platform, ticker)
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+            if self._refresh_executor is None:
+                self._refresh_executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.refresh_workers, thread_name_prefix='cache-refresh')
+            executor = self._refresh_executor
+
+        def run():
+            try:
+                self.set(platform, ticker, fetch())
+            except Exception:
+                pass
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        executor.submit(run)
+        return True
+
+    def clear(self):
+        """Drop every entry and reset the counters"""
+        self._backend_call('clear')
+        with self._lock:
+            self._hits.clear()
+            self._stale_hits.clear()
+            self._misses.clear()
+            self._errors = 0
+
+    def stats(self):
+        """Hit/miss counters per platform plus backend size"""
+        backend_stats = self._backend_call('stats') or {}
+        with self._lock:
+            platforms = sorted(set(self._hits) | set(self._stale_hits) | set(self._misses))
+            return {
+                'backend': self.backend.name,
+                **backend_stats,
+                'hits': sum(self._hits.values()),
+                'stale_hits': sum(self._stale_hits.values()),
+                'misses': sum(self._misses.values()),
+                'errors': self._errors,
+                'refreshing': len(self._refreshing),
+                'platforms': {
+                    platform: {'hits': self._hits.get(platform, 0),
+                               'stale_hits': self._stale_hits.get(platform, 0),
+                               'misses': self._misses.get(platform, 0)}
+                    for platform in platforms
+                }
+            }
+
+    def _backend_call(self, method, *args):
+        try:
+            return getattr(self.backend, method)(*args)
+        except Exception:
+            with self._lock:
+                self._errors += 1
+            return None
+
+    def _count(self, counter, platform):
+        with self._lock:
+            counter[platform] = counter.get(platform, 0) + 1
+
+
+def cache_key(platform, ticker):
+    """Storage key for one platform result"""
+    return f'{platform}:{ticker}'
+
+
+rating_cache = RatingCache()
@@ -0,0 +1,129 @@
+"""
+Record provider pages into the offline fixture corpus (see fixture_corpus.py)
+
+Usage:
+    python record_fixtures.py [TICKER ...] [--csv FILE ...] [--limit N] [--platforms ...]
+    python record_fixtures.py --synthetic [--limit N]
+
+Live mode downloads each provider page once (through the normal per-host rate
+limiter) and stores it with its HTTP status. --synthetic writes provider-shaped
+pages covering every case instead, for machines without network access. Either
+way each page is then replayed through both apps' extractors and their results
+are stored in the manifest as the expected output.
+
+Synthetic pages are a placeholder: their expected output comes from the
+extractors under test, so they only catch changes in output, never a wrong
+extraction. The manifest is marked "placeholder" while it holds any of them.
+"""
+
+import argparse
+import importlib
+import os
+import time
+
+from common import PROVIDER_ENDPOINTS, default_watchlists, provider_url, rate_limited_get, read_watchlist
+from fixture_corpus import (
+    CASES, FIXTURES_DIR, MANIFEST_VERSION, classify_result, fixture_page_cache,
+    load_manifest, read_page, save_manifest, synthetic_page, write_page
+)
+
+# Zacks before price: both read the quote page, which is stored once under zacks/
+PLATFORMS = ['zacks', 'price', 'tipranks', 'barchart', 'stockopedia', 'stockanalysis']
+APP_MODULES = ['stock_rating_app', 'stock_rating_app_production']
+
+# Synthetic case mix per ticker; rotated per platform so every platform gets every case
+SYNTHETIC_CASES = ['rated', 'rated', 'not-rated', 'rated', 'not-found', 'rated', 'blocked', 'rated']
+
+
+def collect_tickers(tickers, csv_files, limit):
+    """[(ticker, company)] from the command line or the watchlists, de-duplicated, at most limit"""
+    watchlist = [(ticker.upper(), ticker.upper()) for ticker in tickers]
+    if not watchlist:
+        for csv_file in csv_files or default_watchlists():
+            watchlist.extend(read_watchlist(csv_file))
+    seen = set()
+    unique = []
+    for ticker, company in watchlist:
+        if ticker not in seen:
+            seen.add(ticker)
+            unique.append((ticker, company or ticker))
+    return unique[:limit] if limit else unique
+
+
+def record_live(platform, ticker):
+    """Download one provider page: (status_code, content_type, body)"""
+    endpoint = PROVIDER_ENDPOINTS[platform]
+    response = rate_limited_get(provider_url(platform, ticker), headers=endpoint['headers'],
+                                timeout=endpoint['timeout'])
+    return response.status_code, response.headers.get('Content-Type', 'text/html; charset=utf-8'), response.content
+
+
+def record_synthetic(platform, ticker, company, index):
+    """Build one synthetic page: (status_code, content_type, body)"""
+    case = SYNTHETIC_CASES[(index + PLATFORMS.index(platform)) % len(SYNTHETIC_CASES)]
+    # Alternate rated pages between the primary selector and the fallback path
+    status, body = synthetic_page(platform, ticker, company, case, variant=(index // len(SYNTHETIC_CASES)) % 2)
+    return status, 'text/html; charset=utf-8', body
+
+
+def expected_results(entry, content, apps):
+    """What each app's platform function returns for a recorded page"""
+    return {name: app.SYNC_FETCHERS[entry['platform']](entry['ticker'], fixture_page_cache(entry, content))
+            for name, app in apps.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Record provider pages into fixtures/')
+    parser.add_argument('tickers', nargs='*', help='tickers to record (default: the repo watchlists)')
+    parser.add_argument('--csv', nargs='+', help='watchlist CSV files to take tickers from')
+    parser.add_argument('--limit', type=int, default=24, help='maximum tickers to record (0 for all)')
+    parser.add_argument('--platforms', nargs='+', choices=PLATFORMS, default=PLATFORMS)
+    parser.add_argument('--synthetic', action='store_true', help='generate pages instead of downloading them')
+    parser.add_argument('--fixtures-dir', default=FIXTURES_DIR)
+    args = parser.parse_args()
+
+    apps = {name: importlib.import_module(name) for name in APP_MODULES}
+    manifest = load_manifest(args.fixtures_dir)
+    manifest['version'] = MANIFEST_VERSION
+    entries = {(entry['platform'], entry['ticker']): entry for entry in manifest['fixtures']}
+    platforms = [platform for platform in PLATFORMS if platform in args.platforms]
+    source = 'synthetic' if args.synthetic else 'live'
+    recorded_at = time.strftime('%Y-%m-%d')
+
+    for index, (ticker, company) in enumerate(collect_tickers(args.tickers, args.csv, args.limit)):
+        # Platforms sharing a URL share one stored page
+        files = {}
+        for platform in platforms:
+            url = provider_url(platform, ticker)
+            if url in files:
+                entry = dict(entries[(files[url], ticker)], platform=platform)
+            else:
+                if args.synthetic:
+                    status, content_type, body = record_synthetic(platform, ticker, company, index)
+                else:
+                    try:
+                        status, content_type, body = record_live(platform, ticker)
+                    except Exception as e:
+                        print(f"✗ {ticker} {platform}: {str(e)[:80]}")
+                        continue
+                relative = os.path.join(platform, f'{ticker}.html.gz')
+                write_page(os.path.join(args.fixtures_dir, relative), body)
+                files[url] = platform
+                entry = {'platform': platform, 'ticker': ticker, 'file': relative, 'status': status,
+                         'content_type': content_type, 'source': source, 'recorded_at': recorded_at}
+
+            content = read_page(entry, args.fixtures_dir)
+            entry['expected'] = expected_results(entry, content, apps)
+            entry['case'] = classify_result(entry['status'], entry['expected'][APP_MODULES[0]])
+            entries[(platform, ticker)] = entry
+            print(f"✓ {ticker:<8} {platform:<14} {entry['status']} {entry['case']}")
+
+    manifest['fixtures'] = list(entries.values())
+    save_manifest(manifest, args.fixtures_dir)
+    counts = {case: sum(1 for entry in manifest['fixtures'] if entry['case'] == case) for case in CASES}
+    print(f"\n{len(manifest['fixtures'])} fixtures in {args.fixtures_dir}: "
+          + ', '.join(f'{count} {case}' for case, count in counts.items()))
+
+
+if __name__ == '__main__':
+    main()
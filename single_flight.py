@@ -0,0 +1,185 @@
+"""
+Single-flight coalescing of concurrent provider lookups
+A request that needs a (platform, ticker) another request is already fetching
+waits on that fetch and gets its result instead of scraping the provider
+again, so a burst of lookups for one popular ticker costs one scrape per
+provider
+"""
+
+import concurrent.futures
+import os
+import threading
+
+import metrics
+
+
+SINGLE_FLIGHT_ENABLED = os.getenv('SINGLE_FLIGHT_ENABLED', 'True') == 'True'
+
+
+class Flight:
+    """
+    One in-flight fetch and the futures of every caller waiting on it
+
+    The caller that started the flight resolves it: follow() a pool job, or
+    set_result() / set_exception() when it fetches some other way, and
+    cancel() if it gives up. Each waiter has a future of its own, so one caller
+    cancelling its wait (e.g. past its deadline) leaves the others waiting; the
+    job itself is cancelled only once every waiter has given up.
+    """
+
+    def __init__(self, group, key):
+        self.group = group
+        self.key = key
+        self.job = None
+        self.waiters = set()
+        self.finished = False
+
+    def _add_waiter(self):
+        """Future for one more caller; group lock held"""
+        waiter = concurrent.futures.Future()
+        self.waiters.add(waiter)
+        waiter.add_done_callback(self._waiter_done)
+        return waiter
+
+    def _waiter_done(self, waiter):
+        if not waiter.cancelled():
+            return
+        with self.group._lock:
+            self.waiters.discard(waiter)
+            job = self.job if not self.waiters and not self.finished else None
+        if job is not None:
+            # Only succeeds while the job is still queued
+            job.cancel()
+
+    def follow(self, job):
+        """Resolve the flight with the outcome of a pool job future"""
+        with self.group._lock:
+            self.job = job
+            abandoned = not self.waiters
+        if abandoned:
+            job.cancel()
+        job.add_done_callback(self._job_done)
+
+    def _job_done(self, job):
+        if job.cancelled():
+            self.cancel()
+        elif job.exception() is not None:
+            self.set_exception(job.exception())
+        else:
+            self.set_result(job.result())
+
+    def set_result(self, result):
+        self._resolve(lambda waiter: waiter.set_result(result))
+
+    def set_exception(self, exception):
+        self._resolve(lambda waiter: waiter.set_exception(exception))
+
+    def cancel(self):
+        """Give up on the flight; callers still waiting see their future cancelled"""
+        self._resolve(lambda waiter: waiter.cancel())
+
+    def _resolve(self, settle):
+        with self.group._lock:
+            if self.finished:
+                return
+            self.finished = True
+            if self.group._flights.get(self.key) is self:
+                del self.group._flights[self.key]
+            waiters = list(self.waiters)
+        # Settled outside the lock: waiter callbacks take it again
+        for waiter in waiters:
+            try:
+                settle(waiter)
+            except concurrent.futures.InvalidStateError:
+                # Cancelled by its caller in the meantime
+                pass
+
+
+class SingleFlight:
+    """In-flight fetches keyed by (platform, ticker)"""
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._flights = {}
+        self._coalesced = 0
+        self._lock = threading.Lock()
+
+    def claim(self, keys, on_join=None):
+        """
+        Join the fetch in flight for each key, or start a new one
+
+        Keys are claimed together, so one caller leads every platform of a
+        ticker that nobody else is fetching (price and Zacks then still share
+        its quote page download).
+
+        Args:
+            keys: (platform, ticker) tuples
+            on_join: Optional function(job) called with the pool job of each
+                     flight joined (e.g. ProviderPool.promote for an interactive
+                     lookup joining a batch's queued job)
+
+        Returns:
+            dict: {key: (flight, future)}. flight is a new Flight the caller
+            must resolve, or None when the caller joined a fetch already
+            running; future gets the fetch's result either way.
+        """
+        claims = {}
+        joined_jobs = []
+        with self._lock:
+            for key in keys:
+                flight = self._flights.get(key)
+                if flight is not None:
+                    self._coalesced += 1
+                    metrics.COALESCED_LOOKUPS.inc(key[0])
+                    claims[key] = (None, flight._add_waiter())
+                    if flight.job is not None:
+                        joined_jobs.append(flight.job)
+                    continue
+                flight = Flight(self, key)
+                if self.enabled:
+                    self._flights[key] = flight
+                claims[key] = (flight, flight._add_waiter())
+        if on_join is not None:
+            for job in joined_jobs:
+                on_join(job)
+        return claims
+
+    def submit(self, starts, on_join=None):
+        """
+        Futures of each key's result, queueing fetches only for keys not already in flight
+
+        Args:
+            starts: {(platform, ticker): function that queues the fetch and
+                    returns its concurrent.futures.Future}
+            on_join: See claim()
+
+        Returns:
+            dict: {key: future}
+
+        Raises:
+            Whatever a start function raises (e.g. worker_pool.PoolSaturated),
+            after every future claimed here is cancelled; callers that had
+            joined a flight this call leads get the exception as their result
+        """
+        claims = self.claim(starts, on_join)
+        for key, (flight, _) in claims.items():
+            if flight is None:
+                continue
+            try:
+                flight.follow(starts[key]())
+            except BaseException as e:
+                # Flights not queued yet fail for anyone who joined them; jobs already queued are dropped
+                for other, _ in claims.values():
+                    if other is not None and other.job is None:
+                        other.set_exception(e)
+                for _, future in claims.values():
+                    future.cancel()
+                raise
+        return {key: future for key, (_, future) in claims.items()}
+
+    def stats(self):
+        with self._lock:
+            return {'enabled': self.enabled, 'in_flight': len(self._flights), 'coalesced': self._coalesced}
+
+
+lookup_flights = SingleFlight(enabled=SINGLE_FLIGHT_ENABLED)
@@ -23,23 +23,8 @@ function searchRatings() {
     // Initialize results display immediately
     initializeResultsDisplay(ticker);
 
-    // Use single parallel request (fastest approach)
-    fetch('/get_ratings', {
-        method: 'POST',
-        headers: {
-            'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({ ticker: ticker })
-    })
-    .then(response => response.json())
-    .then(data => {
-        if (data.error) {
-            showError(data.error);
-        } else {
-            // Simulate progressive loading for better UX
-            displayResultsProgressively(data);
-        }
-    })
+    // Stream results: each platform card renders as soon as the server sends it
+    streamRatings(ticker)
     .catch(error => {
         showError('Network error: ' + error.message);
     })
@@ -49,27 +34,89 @@ function searchRatings() {
     });
 }
 
-function displayResultsProgressively(data) {
-    // Update ticker with stock name and ticker symbol
-    updateTickerDisplay(data.ticker, data.price ? data.price.stock_name : null);
-    document.getElementById('timestamp').textContent = 'Updated: ' + data.timestamp;
-    
-    // Update all platform data immediately (no artificial delays)
-    updatePriceDisplay(data.price);
-    updatePlatformCard('zacks', data.zacks);
-    updatePlatformCard('tipranks', data.tipranks);
-    updatePlatformCard('barchart', data.barchart);
-    updatePlatformCard('stockopedia', data.stockopedia);
-    updatePlatformCard('stockanalysis', data.stockanalysis);
-    
-    // Update price target display after price is available
-    updatePriceTargetDisplay(data.stockanalysis);
-    
-    // Display consensus immediately
-    displayConsensus(data);
-    
-    // Hide loading indicator
-    document.getElementById('loading').style.display = 'none';
+async function streamRatings(ticker) {
+    const response = await fetch('/get_ratings_stream', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({ ticker: ticker })
+    });
+
+    // Validation errors come back as plain JSON instead of an event stream
+    const contentType = response.headers.get('Content-Type') || '';
+    if (!contentType.includes('text/event-stream')) {
+        const data = await response.json();
+        showError(data.error || 'Unexpected response from server');
+        return;
+    }
+
+    const data = { ticker: ticker };
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        // Events are separated by a blank line
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const frame = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            handleStreamEvent(parseStreamEvent(frame), data);
+        }
+    }
+}
+
+function parseStreamEvent(frame) {
+    let event = 'message';
+    const dataLines = [];
+    frame.split('\n').forEach(line => {
+        if (line.startsWith('event:')) {
+            event = line.slice(6).trim();
+        } else if (line.startsWith('data:')) {
+            dataLines.push(line.slice(5).trim());
+        }
+    });
+    return { event: event, data: dataLines.length ? JSON.parse(dataLines.join('\n')) : null };
+}
+
+function handleStreamEvent(message, data) {
+    switch (message.event) {
+        case 'platform': {
+            const platform = message.data.platform;
+            const result = message.data.result;
+            data[platform] = result;
+
+            if (platform === 'price') {
+                updateTickerDisplay(data.ticker, result.stock_name);
+                updatePriceDisplay(result);
+                // Target difference needs the current price, so redraw it if the target arrived first
+                if (data.stockanalysis) updatePriceTargetDisplay(data.stockanalysis);
+            } else {
+                updatePlatformCard(platform, result);
+                if (platform === 'stockanalysis') updatePriceTargetDisplay(result);
+            }
+            break;
+        }
+        case 'error':
+            // Keep any cards that already arrived; only replace the page when nothing did
+            if (Object.keys(data).length === 1) {
+                showError(message.data.error);
+            } else {
+                console.error(message.data.error);
+            }
+            break;
+        case 'done':
+            document.getElementById('timestamp').textContent = 'Updated: ' + message.data.timestamp +
+                (message.data.stale ? ' (cached)' : '');
+            displayConsensus(data);
+            document.getElementById('loading').style.display = 'none';
+            break;
+    }
 }
 
 function updatePlatformCard(platform, data) {
@@ -359,7 +406,7 @@ function displayConsensus(data) {
     let total = 0;
 
     // Analyze Zacks
-    if (data.zacks.success) {
+    if (data.zacks && data.zacks.success) {
         total++;
         const zacksRating = data.zacks.rating.toLowerCase();
         if (zacksRating.includes('strong buy') || zacksRating.includes('buy')) positive++;
@@ -368,7 +415,7 @@ function displayConsensus(data) {
     }
 
     // Analyze TipRanks
-    if (data.tipranks.success) {
+    if (data.tipranks && data.tipranks.success) {
         total++;
         const tipranksRating = data.tipranks.rating.toLowerCase();
         if (tipranksRating.includes('outperform')) positive++;
@@ -377,7 +424,7 @@ function displayConsensus(data) {
     }
 
     // Analyze Barchart
-    if (data.barchart.success) {
+    if (data.barchart && data.barchart.success) {
         total++;
         const barchartRating = data.barchart.rating.toLowerCase();
         if (barchartRating.includes('strong buy') || barchartRating.includes('buy')) positive++;
@@ -386,7 +433,7 @@ function displayConsensus(data) {
     }
 
     // Analyze Stockopedia
-    if (data.stockopedia.success) {
+    if (data.stockopedia && data.stockopedia.success) {
         total++;
         const stockopediaCategory = data.stockopedia.category.toLowerCase();
         if (stockopediaCategory.includes('excellent') || stockopediaCategory.includes('good')) positive++;
@@ -395,7 +442,7 @@ function displayConsensus(data) {
     }
 
     // Analyze Stock Analysis
-    if (data.stockanalysis.success) {
+    if (data.stockanalysis && data.stockanalysis.success) {
         total++;
         const stockanalysisConsensus = data.stockanalysis.consensus.toLowerCase();
         if (stockanalysisConsensus.includes('strong buy') || stockanalysisConsensus.includes('buy')) positive++;
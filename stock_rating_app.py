@@ -1,30 +1,58 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, Response, stream_with_context
+import os
 import requests
 from bs4 import BeautifulSoup
 import re
+import json
 from datetime import datetime
 import concurrent.futures
 import threading
+import time
 from common import (
-    normalize_ticker, is_foreign_ticker, add_human_delay, make_request,
-    handle_http_status, get_page_soup, validate_stock_page, ticker_in_page,
+    normalize_ticker, is_foreign_ticker, make_request,
+    handle_http_status, get_page_soup, get_page_text, validate_stock_page, ticker_in_page,
     find_element_by_selectors, extract_text_by_selectors, extract_number_from_text,
     find_keywords_in_text, search_text_with_context, validate_score_range,
     map_score_to_rating, find_json_value, find_all_regex_matches,
-    build_error_response, build_success_response, extract_stock_analysis_data,
-    HEADERS_STANDARD, HEADERS_COMPREHENSIVE, RATING_KEYWORDS, BARCHART_RATING_KEYWORDS,
+    build_error_response, build_success_response, extract_stock_analysis_data, PageCache,
+    provider_url, format_sse, host_key, ZACKS_QUOTE_FILTER, stream_search, STOCKOPEDIA_PATTERNS,
+    HEADERS_STANDARD, HEADERS_COMPREHENSIVE, RATING_KEYWORDS, BARCHART_RATING_KEYWORDS, BARCHART_PERCENTAGE_PATTERNS,
     STOCKANALYSIS_RATING_KEYWORDS
 )
+from async_fetch import async_platform_fetcher, async_engine
+from circuit_breaker import circuit_breakers
+from rating_cache import rating_cache
+from single_flight import lookup_flights
+from rate_limiter import host_limiter
+import deadline
+import metrics
+import tracing
+from metrics import instrument_platform
+from tracing import trace_platform
+from worker_pool import PoolSaturated, provider_pool
 
 app = Flask(__name__)
 
-def get_stock_price(ticker):
+# 'threads' runs one worker thread per provider; 'async' multiplexes every download on one event loop
+FETCH_ENGINE = os.getenv('FETCH_ENGINE', 'threads')
+
+PLATFORMS = ['price', 'zacks', 'tipranks', 'barchart', 'stockopedia', 'stockanalysis']
+
+# Most tickers accepted by one /get_ratings_batch call, and seconds it may run before the rest time out
+BATCH_MAX_TICKERS = int(os.getenv('BATCH_MAX_TICKERS', '500'))
+BATCH_TIMEOUT = int(os.getenv('BATCH_TIMEOUT', '300'))
+
+TICKER_PATTERN = r'^[A-Z]{1,5}(\.[A-Z]{1,2})?$'
+
+@trace_platform('price')
+@instrument_platform('price')
+def get_stock_price(ticker, page_cache=None):
     """Fetch current stock price and daily change using Zacks"""
     try:
         ticker = normalize_ticker(ticker)
-        url = f"https://www.zacks.com/stock/quote/{ticker}"
+        url = provider_url('price', ticker)
         
-        response, error = make_request(url, headers=HEADERS_STANDARD, timeout=10)
+        response, error = make_request(url, headers=HEADERS_STANDARD, timeout=10, page_cache=page_cache)
         if error:
             return build_error_response('current_price', error['status'], 
                                       additional_fields={'change': 'N/A', 'change_percent': 'N/A', 
@@ -36,7 +64,7 @@ def get_stock_price(ticker):
                 return {**status_error, 'current_price': 'N/A', 'change': 'N/A', 
                        'change_percent': 'N/A', 'currency': 'USD', 'stock_name': ticker}
         
-        soup = get_page_soup(response)
+        soup = get_page_soup(response, page_cache, parse_only=ZACKS_QUOTE_FILTER)
         
         # Extract stock name from H1 title
         stock_name = ticker  # Default fallback
@@ -60,6 +88,7 @@ def get_stock_price(ticker):
             price_match = re.search(r'\$?([\d,]+\.?\d*)', price_text)
             if price_match:
                 current_price = float(price_match.group(1).replace(',', ''))
+                tracing.set_attribute('extract.method', 'last_price_element')
             
             # Extract currency if present
             if 'USD' in price_text:
@@ -98,7 +127,7 @@ def get_stock_price(ticker):
             }
         else:
             # Check if it's a valid stock page
-            if ticker in str(soup):
+            if ticker in response.text:
                 return {
                     'current_price': 'N/A',
                     'change': 'N/A',
@@ -124,13 +153,15 @@ def get_stock_price(ticker):
             'status': f'Error: {str(e)[:50]}'
         }
 
-def get_zacks_rating(ticker):
+@trace_platform('zacks')
+@instrument_platform('zacks')
+def get_zacks_rating(ticker, page_cache=None):
     """Fetch Zacks rating - confirmed working method"""
     try:
         ticker = normalize_ticker(ticker)
-        url = f"https://www.zacks.com/stock/quote/{ticker}"
+        url = provider_url('zacks', ticker)
         
-        response, error = make_request(url, headers=HEADERS_STANDARD, timeout=10)
+        response, error = make_request(url, headers=HEADERS_STANDARD, timeout=10, page_cache=page_cache)
         if error:
             return build_error_response('rank', error['status'])
         
@@ -139,7 +170,7 @@ def get_zacks_rating(ticker):
             if status_error:
                 return {**status_error, 'rank': status_error.get('error', 'N/A')}
         
-        soup = get_page_soup(response)
+        soup = get_page_soup(response, page_cache, parse_only=ZACKS_QUOTE_FILTER)
         
         # Method 1: Look for rank_view with rank_chip (confirmed working)
         rank_element = soup.find('p', class_='rank_view')
@@ -149,11 +180,13 @@ def get_zacks_rating(ticker):
             
             if rank_chip and rank_chip.text.strip():
                 rank = rank_chip.text.strip()
+                tracing.set_attribute('extract.method', 'rank_chip')
             else:
                 rank_text = rank_element.get_text(strip=True)
                 rank_match = re.match(r'^(\d)-', rank_text)
                 if rank_match:
                     rank = rank_match.group(1)
+                    tracing.set_attribute('extract.method', 'rank_view_text')
             
             # Map to rating
             rank_mapping = {
@@ -176,7 +209,9 @@ def get_zacks_rating(ticker):
     except Exception as e:
         return build_error_response('rank', str(e)[:50])
 
-def get_tipranks_rating(ticker):
+@trace_platform('tipranks')
+@instrument_platform('tipranks')
+def get_tipranks_rating(ticker, page_cache=None):
     """Fetch TipRanks Smart Score and rating with improved rate limiting and error handling"""
     try:
         ticker = normalize_ticker(ticker)
@@ -184,9 +219,9 @@ def get_tipranks_rating(ticker):
         if is_foreign_ticker(ticker):
             return build_error_response('score', 'Foreign ticker', additional_fields={'rating': 'Foreign/OTC'})
         
-        url = f"https://www.tipranks.com/stocks/{ticker.lower()}"
+        url = provider_url('tipranks', ticker)
         
-        response, error = make_request(url, headers=HEADERS_COMPREHENSIVE, timeout=15)
+        response, error = make_request(url, headers=HEADERS_COMPREHENSIVE, timeout=15, page_cache=page_cache)
         if error:
             return build_error_response('score', error['status'], additional_fields={'rating': 'Error'})
         
@@ -200,7 +235,7 @@ def get_tipranks_rating(ticker):
         if status_error:
             return status_error
         
-        soup = get_page_soup(response)
+        soup = get_page_soup(response, page_cache)
         
         # Validate page
         is_valid, title_text = validate_stock_page(soup, ticker)
@@ -225,11 +260,13 @@ def get_tipranks_rating(ticker):
                 score_num = extract_number_from_text(score_text)
                 if score_num and validate_score_range(score_num):
                     score = str(score_num)
+                    tracing.set_attribute('extract.method', 'score_selector')
+                    tracing.set_attribute('extract.selector', selector)
                     break
         
         # Fallback: search in page text
         if not score:
-            page_text = soup.get_text()
+            page_text = get_page_text(soup).normalized
             score_patterns = [r'Smart Score[:\s]*(\d+)', r'(\d+)/10', r'Score[:\s]*(\d+)']
             for pattern in score_patterns:
                 matches = find_all_regex_matches(page_text, pattern)
@@ -238,6 +275,7 @@ def get_tipranks_rating(ticker):
                         score_num = int(match)
                         if validate_score_range(score_num):
                             score = str(score_num)
+                            tracing.set_attribute('extract.method', 'score_page_text')
                             break
                     except (ValueError, TypeError):
                         continue
@@ -274,13 +312,15 @@ def get_tipranks_rating(ticker):
     except Exception as e:
         return build_error_response('score', str(e)[:50], additional_fields={'rating': 'Error'})
 
-def get_barchart_rating(ticker):
+@trace_platform('barchart')
+@instrument_platform('barchart')
+def get_barchart_rating(ticker, page_cache=None):
     """Fetch Barchart opinion/signal rating with percentage score"""
     try:
         ticker = normalize_ticker(ticker)
-        url = f"https://www.barchart.com/stocks/quotes/{ticker.lower()}/overview"
+        url = provider_url('barchart', ticker)
         
-        response, error = make_request(url, headers=HEADERS_COMPREHENSIVE, timeout=15)
+        response, error = make_request(url, headers=HEADERS_COMPREHENSIVE, timeout=15, page_cache=page_cache)
         if error:
             return build_error_response('rating', error['status'])
         
@@ -293,7 +333,7 @@ def get_barchart_rating(ticker):
         if status_error:
             return status_error
         
-        soup = get_page_soup(response)
+        soup = get_page_soup(response, page_cache)
         
         is_valid, title_text = validate_stock_page(soup, ticker)
         if not is_valid:
@@ -304,8 +344,8 @@ def get_barchart_rating(ticker):
         percentage_score = None
         full_opinion_text = None
         
-        # Get the full page text first for percentage extraction
-        page_text = soup.get_text().lower()
+        # Shared text view of the page, for percentage extraction and the final fallback
+        page_text = get_page_text(soup)
         
         # Method 1: Technical Opinion Widget
         technical_opinion = soup.find('div', class_='technical-opinion-widget')
@@ -317,17 +357,12 @@ def get_barchart_rating(ticker):
                 rating_text_lower = rating_text.lower()
                 rating_text_lower = re.sub(r'\s+', ' ', rating_text_lower)
                 rating = find_keywords_in_text(rating_text_lower, BARCHART_RATING_KEYWORDS)
+                if rating:
+                    tracing.set_attribute('extract.method', 'technical_widget')
         
         # Always search for percentage in the full page text regardless of where we found the rating
-        percentage_patterns = [
-            r'(?:technical\s+opinion\s+rating\s+is\s+a?\s*)?(\d+)%\s*(buy|sell|hold|strong\s+buy|strong\s+sell)',
-            r'(\d+)\s*%\s*(buy|sell|hold)',
-            r'technical.*?(\d+)\s*%.*?(buy|sell|hold)',
-            r'opinion.*?(\d+)\s*%.*?(buy|sell|hold)'
-        ]
-        
-        for pattern in percentage_patterns:
-            percentage_match = re.search(pattern, page_text)
+        for pattern in BARCHART_PERCENTAGE_PATTERNS:
+            percentage_match = pattern.search(page_text.lower)
             if percentage_match:
                 potential_percentage = percentage_match.group(1)
                 rating_from_percentage = percentage_match.group(2)
@@ -352,6 +387,7 @@ def get_barchart_rating(ticker):
                     percentage_score = potential_percentage
                     if not rating:
                         rating = mapped_percentage_rating
+                        tracing.set_attribute('extract.method', 'percentage_text')
                     break
         
         # Method 2: Main rating element (if not found in technical opinion widget)
@@ -364,6 +400,8 @@ def get_barchart_rating(ticker):
                 full_opinion_text = rating_text
                 rating_text_lower = rating_text.lower()
                 rating = find_keywords_in_text(rating_text_lower, BARCHART_RATING_KEYWORDS)
+                if rating:
+                    tracing.set_attribute('extract.method', 'rating_element')
         
         # Method 3: Selector-based search (if still not found)
         if not rating:
@@ -380,6 +418,8 @@ def get_barchart_rating(ticker):
                     text_lower = text.lower()
                     rating = find_keywords_in_text(text_lower, BARCHART_RATING_KEYWORDS)
                     if rating:
+                        tracing.set_attribute('extract.method', 'selectors')
+                        tracing.set_attribute('extract.selector', selector)
                         break
                 if rating:
                     break
@@ -393,6 +433,8 @@ def get_barchart_rating(ticker):
                 r'{keyword}.*?barchart'
             ]
             rating = search_text_with_context(page_text, BARCHART_RATING_KEYWORDS, context_patterns)
+            if rating:
+                tracing.set_attribute('extract.method', 'page_text_context')
         
         # Check if valid stock page and return appropriate response
         if ticker.lower() in title_text.lower() or ticker.upper() in title_text:
@@ -416,13 +458,18 @@ def get_barchart_rating(ticker):
     except Exception as e:
         return build_error_response('rating', str(e)[:50])
 
-def get_stockopedia_rating(ticker):
+@trace_platform('stockopedia')
+@instrument_platform('stockopedia')
+def get_stockopedia_rating(ticker, page_cache=None):
     """Fetch Stockopedia StockRank - reliable data source without blocking"""
     try:
         ticker = normalize_ticker(ticker)
-        url = f"https://www.stockopedia.com/share-prices/{ticker.lower()}-NSQ:{ticker}/"
+        url = provider_url('stockopedia', ticker)
         
-        response, error = make_request(url, headers=HEADERS_STANDARD, timeout=10)
+        # Stream the page and stop downloading once StockRank and style have both been seen
+        response, error, found, seen = stream_search(url, STOCKOPEDIA_PATTERNS, watch=[ticker],
+                                                     headers=HEADERS_STANDARD, timeout=10,
+                                                     page_cache=page_cache)
         if error:
             return build_error_response('stockrank', error['status'], additional_fields={'style': 'N/A'})
         
@@ -434,10 +481,11 @@ def get_stockopedia_rating(ticker):
             return status_error
         
         # Extract StockRank from JSON data
-        stockrank_str = find_json_value(response.text, r'"stockRank":(\d+)')
+        stockrank_str = found['stockrank']
         if stockrank_str:
             try:
                 stockrank = int(stockrank_str)
+                tracing.set_attribute('extract.method', 'json_stockrank')
                 
                 # Map StockRank to category
                 if stockrank >= 80:
@@ -451,7 +499,7 @@ def get_stockopedia_rating(ticker):
                 else:
                     category = 'Very Poor'
                 
-                style = find_json_value(response.text, r'"style":"([^"]+)"')
+                style = found['style']
                 
                 return build_success_response({
                     'stockrank': str(stockrank),
@@ -462,7 +510,7 @@ def get_stockopedia_rating(ticker):
                 pass
         
         # Check if valid stock page
-        if ticker in response.text:
+        if ticker in seen:
             return {'stockrank': 'NR', 'style': 'Not Rated', 'status': 'Stock found but not rated', 'success': True}
         else:
             return build_error_response('stockrank', 'Stock not found', additional_fields={'style': 'N/A'})
@@ -476,13 +524,15 @@ def get_stockopedia_rating(ticker):
 
 
 
-def get_stockanalysis_rating(ticker):
+@trace_platform('stockanalysis')
+@instrument_platform('stockanalysis')
+def get_stockanalysis_rating(ticker, page_cache=None):
     """Fetch Stock Analysis Analyst Consensus and Price Target"""
     try:
         ticker = normalize_ticker(ticker)
-        url = f"https://stockanalysis.com/stocks/{ticker.lower()}/forecast/"
+        url = provider_url('stockanalysis', ticker)
         
-        response, error = make_request(url, headers=HEADERS_COMPREHENSIVE, timeout=15)
+        response, error = make_request(url, headers=HEADERS_COMPREHENSIVE, timeout=15, page_cache=page_cache)
         if error:
             return build_error_response('consensus', error['status'], additional_fields={'price_target': 'N/A'})
         
@@ -495,7 +545,7 @@ def get_stockanalysis_rating(ticker):
         if status_error:
             return status_error
         
-        soup = get_page_soup(response)
+        soup = get_page_soup(response, page_cache)
         
         is_valid, title_text = validate_stock_page(soup, ticker)
         if not is_valid:
@@ -533,6 +583,293 @@ def get_stockanalysis_rating(ticker):
     except Exception as e:
         return build_error_response('consensus', str(e)[:50], additional_fields={'price_target': 'Error'})
 
+# Async versions: await the download on the engine loop, then run the same extractor
+get_stock_price_async = async_platform_fetcher('price', get_stock_price)
+get_zacks_rating_async = async_platform_fetcher('zacks', get_zacks_rating)
+get_tipranks_rating_async = async_platform_fetcher('tipranks', get_tipranks_rating)
+get_barchart_rating_async = async_platform_fetcher('barchart', get_barchart_rating)
+get_stockopedia_rating_async = async_platform_fetcher('stockopedia', get_stockopedia_rating)
+get_stockanalysis_rating_async = async_platform_fetcher('stockanalysis', get_stockanalysis_rating)
+
+ASYNC_FETCHERS = {
+    'price': get_stock_price_async,
+    'zacks': get_zacks_rating_async,
+    'tipranks': get_tipranks_rating_async,
+    'barchart': get_barchart_rating_async,
+    'stockopedia': get_stockopedia_rating_async,
+    'stockanalysis': get_stockanalysis_rating_async
+}
+
+SYNC_FETCHERS = {
+    'price': get_stock_price,
+    'zacks': get_zacks_rating,
+    'tipranks': get_tipranks_rating,
+    'barchart': get_barchart_rating,
+    'stockopedia': get_stockopedia_rating,
+    'stockanalysis': get_stockanalysis_rating
+}
+
+def refresh_stale_results(ticker, cached):
+    """Re-scrape expired cache hits in the background; the stale values are served meanwhile"""
+    stale = [platform for platform, result in cached.items() if result.get('stale')]
+    if stale:
+        page_cache = PageCache()
+        for platform in stale:
+            # Bounded like a lookup, so a paused or slow host cannot hold a refresh thread indefinitely
+            rating_cache.refresh(platform, ticker, lambda p=platform: deadline.run_until(
+                time.monotonic() + deadline.provider_budget(p), SYNC_FETCHERS[p], ticker, page_cache))
+
+def lookup_hosts(ticker, platforms):
+    """Provider hosts a lookup of these platforms will queue jobs for"""
+    return {host_key(provider_url(platform, ticker)) for platform in platforms}
+
+def submit_lookup(ticker, platform, page_cache, deadline_at):
+    """Queue one platform lookup on the shared provider pool; its requests stop at deadline_at"""
+    host = host_key(provider_url(platform, ticker))
+    return provider_pool.submit(host, tracing.bind(deadline.run_until), deadline_at,
+                                SYNC_FETCHERS[platform], ticker, page_cache)
+
+def submit_lookups(ticker, platforms, page_cache, deadlines):
+    """
+    Queue one ticker's platform lookups on the shared provider pool
+    
+    Either every platform is queued or none is: if a host's queue is full the
+    jobs already queued are cancelled and PoolSaturated propagates. A platform
+    another request is already fetching for this ticker is joined instead of
+    queued again (see single_flight), and its future gets that fetch's result.
+    
+    Returns:
+        dict: {future: platform}
+    """
+    starts = {(platform, ticker): lambda p=platform: submit_lookup(ticker, p, page_cache, deadlines[p])
+              for platform in platforms}
+    # A lookup that joins a batch's job still queued moves it ahead of the rest of the batch
+    futures = lookup_flights.submit(starts, on_join=provider_pool.promote)
+    return {future: platform for (platform, _), future in futures.items()}
+
+def pool_saturated_response():
+    """503 telling the client to back off while the provider pool queues are full"""
+    return jsonify({'error': 'Server busy - please try again shortly'}), 503, {'Retry-After': '5'}
+
+def timeout_result(platform):
+    """Result for a platform that did not answer within its slice of the lookup budget"""
+    return {
+        'status': 'Request timeout',
+        'success': False,
+        'timeout': True,
+        'rating': 'Timeout' if platform != 'price' else 'N/A'
+    }
+
+def claim_lookups(ticker, platforms):
+    """
+    Split platforms into lookups to fetch and lookups another request already has in flight
+    
+    Returns:
+        tuple: ({platform: Flight} to fetch and resolve, {future: platform} to wait on)
+    """
+    flights = {}
+    joined = {}
+    for (platform, _), (flight, future) in lookup_flights.claim([(p, ticker) for p in platforms]).items():
+        if flight is None:
+            joined[future] = platform
+        else:
+            flights[platform] = flight
+    return flights, joined
+
+def iter_joined_results(joined, deadline_at):
+    """Yield (platform, result) for lookups joined from another request, up to deadline_at"""
+    try:
+        for future in concurrent.futures.as_completed(joined, timeout=max(0, deadline_at - time.monotonic())):
+            platform = joined.pop(future)
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"✗ {platform.title()} failed: {str(e)[:50]}")
+                result = {
+                    'status': f'Error: {str(e)[:50]}',
+                    'success': False,
+                    'rating': 'Error' if platform != 'price' else 'N/A'
+                }
+            yield platform, result
+    except concurrent.futures.TimeoutError:
+        for platform in joined.values():
+            print(f"✗ {platform.title()} timed out")
+            yield platform, timeout_result(platform)
+    finally:
+        for future in joined:
+            future.cancel()
+
+def iter_platform_results(ticker, platforms, budget=deadline.LOOKUP_DEADLINE):
+    """
+    Yield (platform, result) as each platform becomes available, serving fresh cache entries first
+    
+    Each platform gets its slice of budget (see deadline.provider_budget); one
+    that misses it is yielded as timeout_result() and the rest are unaffected.
+    """
+    # Serve platforms that are still fresh in the cache and only scrape the rest
+    cached = rating_cache.lookup(ticker, platforms)
+    refresh_stale_results(ticker, cached)
+    tracing.set_attribute('cache.hits', len(cached))
+    yield from cached.items()
+    missing = [platform for platform in platforms if platform not in cached]
+    if not missing:
+        return
+    
+    if FETCH_ENGINE == 'async':
+        # Platforms another request is already fetching for this ticker are waited on, not fetched again
+        flights, joined = claim_lookups(ticker, missing)
+        started = time.monotonic()
+        try:
+            # One shared event loop downloads every provider page; no thread per provider
+            fetchers = {p: ASYNC_FETCHERS[p] for p in flights}
+            outstanding = list(flights)
+            try:
+                if fetchers:
+                    for platform, result in async_engine.iter_lookup(ticker, fetchers, timeout=budget):
+                        outstanding.remove(platform)
+                        rating_cache.set(platform, ticker, result)
+                        flights[platform].set_result(result)
+                        yield platform, result
+            except concurrent.futures.TimeoutError:
+                for platform in outstanding:
+                    print(f"✗ {platform.title()} timed out")
+                    flights[platform].set_result(timeout_result(platform))
+                    yield platform, timeout_result(platform)
+            yield from iter_joined_results(joined, started + budget)
+        finally:
+            # A lookup abandoned midway (e.g. a closed stream) cancels its requests for the others waiting
+            for flight in flights.values():
+                flight.cancel()
+        return
+    
+    # Price and Zacks rating read the same quote page, so share one download and parse
+    page_cache = PageCache()
+    
+    # Run every platform on the process-wide provider pool rather than threads of our own
+    deadlines = deadline.deadlines_for(missing, budget)
+    future_to_platform = submit_lookups(ticker, missing, page_cache, deadlines)
+    
+    def hedge(platform):
+        # A second attempt needs its own page cache, or it would only wait on the first download
+        try:
+            return submit_lookup(ticker, platform, PageCache(), deadlines[platform])
+        except PoolSaturated:
+            return None
+    
+    # Collect results as they complete, up to each platform's deadline
+    for platform, future in deadline.iter_within_budget(future_to_platform, deadlines, hedge):
+        if future is None:
+            print(f"✗ {platform.title()} timed out")
+            yield platform, timeout_result(platform)
+            continue
+        try:
+            result = future.result()
+            rating_cache.set(platform, ticker, result)
+            print(f"✓ {platform.title()} completed")
+        except Exception as e:
+            print(f"✗ {platform.title()} failed: {str(e)[:50]}")
+            result = {
+                'status': f'Error: {str(e)[:50]}',
+                'success': False,
+                'rating': 'Error' if platform != 'price' else 'N/A'
+            }
+        yield platform, result
+
+def iter_batch_results(tickers, platforms, timeout=BATCH_TIMEOUT):
+    """
+    Yield (ticker, platform, result) for every pair, scraping cache misses on the shared provider pool
+    
+    Jobs are handed to the pool only while their host's batch queue has room;
+    the rest wait here and are queued as earlier jobs finish, so results keep
+    streaming while a slow host works through its share of the batch. Pairs
+    still unfinished after timeout seconds are yielded as timeouts.
+    """
+    futures = {}
+    waiting = []
+    batch_deadline = time.monotonic() + timeout
+    for ticker in tickers:
+        cached = rating_cache.lookup(ticker, platforms)
+        refresh_stale_results(ticker, cached)
+        for platform, result in cached.items():
+            yield ticker, platform, result
+        
+        # Price and Zacks for the same ticker still share one quote page download
+        page_cache = PageCache()
+        waiting.extend((ticker, platform, page_cache) for platform in platforms if platform not in cached)
+    
+    def start(ticker, platform, page_cache, block=False):
+        # The pool caps concurrent jobs per provider host across every request; batch jobs
+        # wait in their own host queue behind interactive lookups
+        host = host_key(provider_url(platform, ticker))
+        # Its requests stop at the batch deadline, so rate limiter pauses fail fast instead of parking a worker
+        queue_job = lambda: provider_pool.submit(host, tracing.bind(deadline.run_until), batch_deadline,
+                                                 SYNC_FETCHERS[platform], ticker, page_cache,
+                                                 block=block, batch=True,
+                                                 timeout=max(0, batch_deadline - time.monotonic()))
+        # Joins the same lookup if another request already has it in flight
+        future = lookup_flights.submit({(platform, ticker): queue_job})[(platform, ticker)]
+        futures[future] = (ticker, platform)
+    
+    try:
+        while waiting or futures:
+            # Queue whatever has room; jobs for a host whose batch queue is full wait for the next pass
+            full_hosts = set()
+            still_waiting = []
+            for ticker, platform, page_cache in waiting:
+                host = host_key(provider_url(platform, ticker))
+                if host not in full_hosts and provider_pool.has_room([host], batch=True):
+                    try:
+                        start(ticker, platform, page_cache)
+                        continue
+                    except PoolSaturated:
+                        pass
+                full_hosts.add(host)
+                still_waiting.append((ticker, platform, page_cache))
+            waiting = still_waiting
+            
+            if not futures:
+                # Other requests fill every queue we need and none of our jobs will free a slot: wait for room
+                ticker, platform, page_cache = waiting.pop(0)
+                try:
+                    start(ticker, platform, page_cache, block=True)
+                except PoolSaturated:
+                    for ticker, platform, _ in [(ticker, platform, page_cache)] + waiting:
+                        yield ticker, platform, {'status': 'Server busy', 'success': False,
+                                                 'rating': 'Error' if platform != 'price' else 'N/A'}
+                    waiting = []
+                continue
+            
+            done, _ = concurrent.futures.wait(futures, timeout=max(0, batch_deadline - time.monotonic()),
+                                              return_when=concurrent.futures.FIRST_COMPLETED)
+            if not done:
+                raise concurrent.futures.TimeoutError()
+            for future in done:
+                ticker, platform = futures.pop(future)
+                try:
+                    result = future.result()
+                    rating_cache.set(platform, ticker, result)
+                except Exception as e:
+                    print(f"✗ {ticker} {platform.title()} failed: {str(e)[:50]}")
+                    result = {
+                        'status': f'Error: {str(e)[:50]}',
+                        'success': False,
+                        'rating': 'Error' if platform != 'price' else 'N/A'
+                    }
+                yield ticker, platform, result
+    except concurrent.futures.TimeoutError:
+        print(f"✗ Batch timed out with {len(futures) + len(waiting)} jobs outstanding")
+        for ticker, platform in list(futures.values()) + [(ticker, platform) for ticker, platform, _ in waiting]:
+            yield ticker, platform, timeout_result(platform)
+    finally:
+        # Drop jobs still queued if the batch times out or the client disconnects mid-batch
+        for future in futures:
+            future.cancel()
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus scrape endpoint: provider phase histograms, HTTP statuses, cache, rate limiter and pool state"""
+    return Response(metrics.render(rating_cache, host_limiter, provider_pool, circuit_breakers), content_type=metrics.PROMETHEUS_CONTENT_TYPE)
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -560,38 +897,9 @@ def get_ratings():
         print(f"Fetching ratings for {ticker} using parallel execution...")
         start_time = datetime.now()
         
-        # Define all functions to run in parallel
-        fetch_functions = {
-            'price': lambda: get_stock_price(ticker),
-            'zacks': lambda: get_zacks_rating(ticker),
-            'tipranks': lambda: get_tipranks_rating(ticker),
-            'barchart': lambda: get_barchart_rating(ticker),
-            'stockopedia': lambda: get_stockopedia_rating(ticker),
-            'stockanalysis': lambda: get_stockanalysis_rating(ticker)
-        }
-        
-        # Execute all functions concurrently
-        with concurrent.futures.ThreadPoolExecutor(max_workers=6) as executor:
-            # Submit all tasks
-            future_to_platform = {
-                executor.submit(func): platform 
-                for platform, func in fetch_functions.items()
-            }
-            
-            # Collect results as they complete
-            for future in concurrent.futures.as_completed(future_to_platform):
-                platform = future_to_platform[future]
-                try:
-                    result = future.result(timeout=15)  # 15 second timeout per request
-                    results[platform] = result
-                    print(f"✓ {platform.title()} completed")
-                except Exception as e:
-                    print(f"✗ {platform.title()} failed: {str(e)[:50]}")
-                    results[platform] = {
-                        'status': f'Error: {str(e)[:50]}',
-                        'success': False,
-                        'rating': 'Error' if platform != 'price' else 'N/A'
-                    }
+        with tracing.span('get_ratings', kind='SERVER', ticker=ticker, engine=FETCH_ENGINE):
+            for platform, result in iter_platform_results(ticker, PLATFORMS):
+                results[platform] = result
         
         end_time = datetime.now()
         execution_time = (end_time - start_time).total_seconds()
@@ -599,11 +907,86 @@ def get_ratings():
         
         # Update timestamp to reflect actual completion time
         results['timestamp'] = end_time.strftime('%Y-%m-%d %H:%M:%S')
+        results['stale'] = any(results[platform].get('stale', False) for platform in PLATFORMS)
         
         return jsonify(results)
     
+    except PoolSaturated as e:
+        print(f"✗ Shed request for {ticker}: {e}")
+        return pool_saturated_response()
     except Exception as e:
         return jsonify({'error': f'An error occurred: {str(e)}'})
 
+@app.route('/get_ratings_stream', methods=['POST'])
+def get_ratings_stream():
+    """Stream one Server-Sent Event per platform as soon as it completes"""
+    ticker = request.json.get('ticker', '').strip().upper()
+    
+    if not ticker:
+        return jsonify({'error': 'Please enter a ticker symbol'})
+    
+    # Refuse before the stream starts when the provider pool has no room for this lookup
+    if FETCH_ENGINE != 'async' and not provider_pool.has_room(lookup_hosts(ticker, PLATFORMS)):
+        return pool_saturated_response()
+    
+    def generate():
+        print(f"Streaming ratings for {ticker}...")
+        start_time = datetime.now()
+        stale = False
+        yield format_sse('start', {'ticker': ticker, 'platforms': PLATFORMS})
+        
+        try:
+            with tracing.span('get_ratings_stream', kind='SERVER', ticker=ticker, engine=FETCH_ENGINE):
+                for platform, result in iter_platform_results(ticker, PLATFORMS):
+                    stale = stale or result.get('stale', False)
+                    yield format_sse('platform', {'platform': platform, 'result': result})
+        except PoolSaturated:
+            yield format_sse('error', {'error': 'Server busy - please try again shortly'})
+        except Exception as e:
+            yield format_sse('error', {'error': f'An error occurred: {str(e)}'})
+        
+        end_time = datetime.now()
+        print(f"Stream completed in {(end_time - start_time).total_seconds():.2f}s")
+        yield format_sse('done', {'ticker': ticker, 'timestamp': end_time.strftime('%Y-%m-%d %H:%M:%S'),
+                                  'stale': stale})
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/get_ratings_batch', methods=['POST'])
+def get_ratings_batch():
+    """Fetch many tickers at once, returning one NDJSON line per (ticker, platform) as it completes"""
+    tickers = (request.get_json(silent=True) or {}).get('tickers')
+    
+    if not isinstance(tickers, list) or not tickers:
+        return jsonify({'error': 'Please provide a list of tickers'}), 400
+    
+    # Upper-case and de-duplicate, keeping the caller's order
+    tickers = list(dict.fromkeys(str(t).strip().upper() for t in tickers if str(t).strip()))
+    if len(tickers) > BATCH_MAX_TICKERS:
+        return jsonify({'error': f'Too many tickers (max {BATCH_MAX_TICKERS})'}), 400
+    valid = [t for t in tickers if re.match(TICKER_PATTERN, t)]
+    invalid = [t for t in tickers if t not in valid]
+    
+    def generate():
+        print(f"Fetching ratings for {len(valid)} tickers on the shared worker pool...")
+        start_time = datetime.now()
+        count = 0
+        
+        for ticker in invalid:
+            yield json.dumps({'ticker': ticker, 'error': 'Invalid ticker symbol format'}) + '\n'
+        with tracing.span('get_ratings_batch', kind='SERVER', tickers=len(valid)):
+            for ticker, platform, result in iter_batch_results(valid, PLATFORMS):
+                count += 1
+                yield json.dumps({'ticker': ticker, 'platform': platform, 'result': result}) + '\n'
+        
+        end_time = datetime.now()
+        print(f"Batch completed in {(end_time - start_time).total_seconds():.2f}s")
+        yield json.dumps({'done': True, 'tickers': len(valid), 'results': count,
+                          'timestamp': end_time.strftime('%Y-%m-%d %H:%M:%S')}) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 if __name__ == '__main__':
     app.run(debug=True, host='127.0.0.1', port=5001)
@@ -1,21 +1,34 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, Response, stream_with_context
 import requests
 from bs4 import BeautifulSoup
 import re
 import os
 import json
+import time
 import concurrent.futures
 from datetime import datetime
 from dotenv import load_dotenv
 from common import (
     normalize_ticker, is_foreign_ticker, make_request,
-    handle_http_status, get_page_soup, validate_stock_page, ticker_in_page,
+    handle_http_status, get_page_soup, get_page_text, validate_stock_page, ticker_in_page,
     extract_number_from_text, find_keywords_in_text, search_text_with_context, 
     validate_score_range, map_score_to_rating, find_json_value, find_all_regex_matches,
-    build_error_response, build_success_response, extract_stock_analysis_data,
-    HEADERS_STANDARD, HEADERS_COMPREHENSIVE, RATING_KEYWORDS, BARCHART_RATING_KEYWORDS,
+    build_error_response, build_success_response, extract_stock_analysis_data, PageCache,
+    provider_url, format_sse, host_key, ZACKS_QUOTE_FILTER, stream_search, STOCKOPEDIA_PATTERNS,
+    HEADERS_STANDARD, HEADERS_COMPREHENSIVE, RATING_KEYWORDS, BARCHART_RATING_KEYWORDS, BARCHART_PERCENTAGE_PATTERNS,
     STOCKANALYSIS_RATING_KEYWORDS
 )
+from async_fetch import async_platform_fetcher, async_engine
+from circuit_breaker import circuit_breakers
+from rating_cache import rating_cache
+from single_flight import lookup_flights
+from rate_limiter import host_limiter
+import deadline
+import metrics
+import tracing
+from metrics import instrument_platform
+from tracing import trace_platform
+from worker_pool import PoolSaturated, provider_pool
 
 # Load environment variables
 load_dotenv()
@@ -36,6 +49,8 @@ try:
     from flask_limiter.util import get_remote_address
     
     rate_limits = ["200 per day", "50 per hour"] if os.getenv('RATE_LIMIT_ENABLED') == 'True' else None
+    # An explicit RATE_LIMIT_ENABLED=False also lifts the per-route limits (e.g. for load_test.py)
+    app.config['RATELIMIT_ENABLED'] = os.getenv('RATE_LIMIT_ENABLED') != 'False'
     
     try:
         limiter = Limiter(
@@ -52,13 +67,24 @@ try:
 except ImportError:
     limiter = None
 
-def get_stock_price(ticker):
+# 'threads' runs one worker thread per provider; 'async' multiplexes every download on one event loop
+FETCH_ENGINE = os.getenv('FETCH_ENGINE', 'threads')
+
+# Batch endpoint limits
+BATCH_MAX_TICKERS = int(os.getenv('BATCH_MAX_TICKERS', '500'))
+BATCH_TIMEOUT = int(os.getenv('BATCH_TIMEOUT', '300'))
+
+TICKER_PATTERN = r'^[A-Z]{1,5}(\.[A-Z]{1,2})?$'
+
+@trace_platform('price')
+@instrument_platform('price')
+def get_stock_price(ticker, page_cache=None):
     """Fetch current stock price and daily change using Zacks"""
     try:
         ticker = normalize_ticker(ticker)
-        url = f"https://www.zacks.com/stock/quote/{ticker}"
+        url = provider_url('price', ticker)
         
-        response, error = make_request(url, headers=HEADERS_STANDARD, timeout=10)
+        response, error = make_request(url, headers=HEADERS_STANDARD, timeout=10, page_cache=page_cache)
         if error:
             return build_error_response('current_price', error['status'], 
                                       additional_fields={'change': 'N/A', 'change_percent': 'N/A', 
@@ -70,7 +96,7 @@ def get_stock_price(ticker):
                 return {**status_error, 'current_price': 'N/A', 'change': 'N/A', 
                        'change_percent': 'N/A', 'currency': 'USD', 'stock_name': ticker}
         
-        soup = get_page_soup(response)
+        soup = get_page_soup(response, page_cache, parse_only=ZACKS_QUOTE_FILTER)
         
         # Extract stock name from H1 title
         stock_name = ticker  # Default fallback
@@ -94,6 +120,7 @@ def get_stock_price(ticker):
             price_match = re.search(r'\$?([\d,]+\.?\d*)', price_text)
             if price_match:
                 current_price = float(price_match.group(1).replace(',', ''))
+                tracing.set_attribute('extract.method', 'last_price_element')
             
             # Extract currency if present
             if 'USD' in price_text:
@@ -132,7 +159,7 @@ def get_stock_price(ticker):
             }
         else:
             # Check if it's a valid stock page
-            if ticker in str(soup):
+            if ticker in response.text:
                 return {
                     'current_price': 'N/A',
                     'change': 'N/A',
@@ -159,29 +186,33 @@ def get_stock_price(ticker):
         }
 
 # Import all 5 rating functions from common module
-def get_zacks_rating(ticker):
+@trace_platform('zacks')
+@instrument_platform('zacks')
+def get_zacks_rating(ticker, page_cache=None):
     try:
         ticker = normalize_ticker(ticker)
-        url = f"https://www.zacks.com/stock/quote/{ticker}"
-        response, error = make_request(url, headers=HEADERS_STANDARD, timeout=10)
+        url = provider_url('zacks', ticker)
+        response, error = make_request(url, headers=HEADERS_STANDARD, timeout=10, page_cache=page_cache)
         if error:
             return build_error_response('rank', error['status'])
         if response.status_code != 200:
             status_error = handle_http_status(response.status_code)
             if status_error:
                 return {**status_error, 'rank': status_error.get('error', 'N/A')}
-        soup = get_page_soup(response)
+        soup = get_page_soup(response, page_cache, parse_only=ZACKS_QUOTE_FILTER)
         rank_element = soup.find('p', class_='rank_view')
         if rank_element:
             rank_chip = rank_element.find('span', class_='rank_chip')
             rank = None
             if rank_chip and rank_chip.text.strip():
                 rank = rank_chip.text.strip()
+                tracing.set_attribute('extract.method', 'rank_chip')
             else:
                 rank_text = rank_element.get_text(strip=True)
                 rank_match = re.match(r'^(\d)-', rank_text)
                 if rank_match:
                     rank = rank_match.group(1)
+                    tracing.set_attribute('extract.method', 'rank_view_text')
             rank_mapping = {'1': 'Strong Buy', '2': 'Buy', '3': 'Hold', '4': 'Sell', '5': 'Strong Sell'}
             if rank and rank in rank_mapping:
                 return build_success_response({'rank': rank, 'rating': rank_mapping[rank]})
@@ -192,13 +223,15 @@ def get_zacks_rating(ticker):
     except Exception as e:
         return build_error_response('rank', str(e)[:50])
 
-def get_tipranks_rating(ticker):
+@trace_platform('tipranks')
+@instrument_platform('tipranks')
+def get_tipranks_rating(ticker, page_cache=None):
     try:
         ticker = normalize_ticker(ticker)
         if is_foreign_ticker(ticker):
             return build_error_response('score', 'Foreign ticker', additional_fields={'rating': 'Foreign/OTC'})
-        url = f"https://www.tipranks.com/stocks/{ticker.lower()}"
-        response, error = make_request(url, headers=HEADERS_COMPREHENSIVE, timeout=15)
+        url = provider_url('tipranks', ticker)
+        response, error = make_request(url, headers=HEADERS_COMPREHENSIVE, timeout=15, page_cache=page_cache)
         if error:
             return build_error_response('score', error['status'], additional_fields={'rating': 'Error'})
         status_error = handle_http_status(response.status_code, {
@@ -209,26 +242,27 @@ def get_tipranks_rating(ticker):
         })
         if status_error:
             return status_error
-        soup = get_page_soup(response)
+        soup = get_page_soup(response, page_cache)
         is_valid, title_text = validate_stock_page(soup, ticker)
         if not is_valid or not ticker_in_page(ticker, title_text):
             return build_error_response('score', 'Stock not found')
         score = None
+        page_text = get_page_text(soup)
         score_patterns = [r'Smart Score[:\s]*(\d+)', r'(\d+)/10', r'Score[:\s]*(\d+)']
         for pattern in score_patterns:
-            matches = find_all_regex_matches(soup.get_text(), pattern)
+            matches = find_all_regex_matches(page_text.normalized, pattern)
             for match in matches:
                 try:
                     score_num = int(match)
                     if validate_score_range(score_num):
                         score = str(score_num)
+                        tracing.set_attribute('extract.method', 'score_page_text')
                         break
                 except (ValueError, TypeError):
                     continue
             if score:
                 break
-        rating_text = soup.get_text().lower() if soup else ''
-        rating = find_keywords_in_text(rating_text, RATING_KEYWORDS)
+        rating = find_keywords_in_text(page_text, RATING_KEYWORDS)
         if score and not rating:
             rating = map_score_to_rating(score)
         if score:
@@ -245,12 +279,14 @@ def get_tipranks_rating(ticker):
     except Exception as e:
         return build_error_response('score', str(e)[:50], additional_fields={'rating': 'Error'})
 
-def get_barchart_rating(ticker):
+@trace_platform('barchart')
+@instrument_platform('barchart')
+def get_barchart_rating(ticker, page_cache=None):
     """Fetch Barchart opinion/signal rating with percentage score"""
     try:
         ticker = normalize_ticker(ticker)
-        url = f"https://www.barchart.com/stocks/quotes/{ticker.lower()}/overview"
-        response, error = make_request(url, headers=HEADERS_COMPREHENSIVE, timeout=15)
+        url = provider_url('barchart', ticker)
+        response, error = make_request(url, headers=HEADERS_COMPREHENSIVE, timeout=15, page_cache=page_cache)
         if error:
             return build_error_response('rating', error['status'])
         status_error = handle_http_status(response.status_code, {
@@ -260,7 +296,7 @@ def get_barchart_rating(ticker):
         })
         if status_error:
             return status_error
-        soup = get_page_soup(response)
+        soup = get_page_soup(response, page_cache)
         is_valid, title_text = validate_stock_page(soup, ticker)
         if not is_valid:
             return build_error_response('rating', 'Stock not found')
@@ -270,8 +306,8 @@ def get_barchart_rating(ticker):
         percentage_score = None
         full_opinion_text = None
         
-        # Get the full page text first for percentage extraction
-        page_text = soup.get_text().lower()
+        # Shared text view of the page, for percentage extraction and the final fallback
+        page_text = get_page_text(soup)
         
         # Method 1: Technical Opinion Widget
         technical_opinion = soup.find('div', class_='technical-opinion-widget')
@@ -282,17 +318,12 @@ def get_barchart_rating(ticker):
                 full_opinion_text = rating_text
                 rating_text_lower = rating_text.lower()
                 rating = find_keywords_in_text(rating_text_lower, BARCHART_RATING_KEYWORDS)
+                if rating:
+                    tracing.set_attribute('extract.method', 'technical_widget')
         
         # Always search for percentage in the full page text regardless of where we found the rating
-        percentage_patterns = [
-            r'(?:technical\s+opinion\s+rating\s+is\s+a?\s*)?(\d+)%\s*(buy|sell|hold|strong\s+buy|strong\s+sell)',
-            r'(\d+)\s*%\s*(buy|sell|hold)',
-            r'technical.*?(\d+)\s*%.*?(buy|sell|hold)',
-            r'opinion.*?(\d+)\s*%.*?(buy|sell|hold)'
-        ]
-        
-        for pattern in percentage_patterns:
-            percentage_match = re.search(pattern, page_text)
+        for pattern in BARCHART_PERCENTAGE_PATTERNS:
+            percentage_match = pattern.search(page_text.lower)
             if percentage_match:
                 potential_percentage = percentage_match.group(1)
                 rating_from_percentage = percentage_match.group(2)
@@ -317,6 +348,7 @@ def get_barchart_rating(ticker):
                     percentage_score = potential_percentage
                     if not rating:
                         rating = mapped_percentage_rating
+                        tracing.set_attribute('extract.method', 'percentage_text')
                     break
         
         # Method 2: Page text search with context (if still not found)
@@ -324,6 +356,8 @@ def get_barchart_rating(ticker):
             context_patterns = [r'(opinion|signal|rating|recommendation|consensus|analyst).*?{keyword}',
                               r'{keyword}.*?(opinion|signal|rating|recommendation)', r'barchart.*?{keyword}', r'{keyword}.*?barchart']
             rating = search_text_with_context(page_text, BARCHART_RATING_KEYWORDS, context_patterns)
+            if rating:
+                tracing.set_attribute('extract.method', 'page_text_context')
         
         if ticker.lower() in title_text.lower() or ticker.upper() in title_text:
             if rating:
@@ -344,11 +378,14 @@ def get_barchart_rating(ticker):
     except Exception as e:
         return build_error_response('rating', str(e)[:50])
 
-def get_stockopedia_rating(ticker):
+@trace_platform('stockopedia')
+@instrument_platform('stockopedia')
+def get_stockopedia_rating(ticker, page_cache=None):
     try:
         ticker = normalize_ticker(ticker)
-        url = f"https://www.stockopedia.com/share-prices/{ticker.lower()}-NSQ:{ticker}/"
-        response, error = make_request(url, headers=HEADERS_STANDARD, timeout=10)
+        url = provider_url('stockopedia', ticker)
+        response, error, found, seen = stream_search(url, STOCKOPEDIA_PATTERNS, watch=[ticker], headers=HEADERS_STANDARD,
+                                                     timeout=10, page_cache=page_cache)
         if error:
             return build_error_response('stockrank', error['status'], additional_fields={'style': 'N/A'})
         status_error = handle_http_status(response.status_code, {
@@ -356,16 +393,17 @@ def get_stockopedia_rating(ticker):
         })
         if status_error:
             return status_error
-        stockrank_str = find_json_value(response.text, r'"stockRank":(\d+)')
+        stockrank_str = found['stockrank']
         if stockrank_str:
             try:
                 stockrank = int(stockrank_str)
+                tracing.set_attribute('extract.method', 'json_stockrank')
                 category = 'Excellent' if stockrank >= 80 else 'Good' if stockrank >= 60 else 'Average' if stockrank >= 40 else 'Poor' if stockrank >= 20 else 'Very Poor'
-                style = find_json_value(response.text, r'"style":"([^"]+)"')
+                style = found['style']
                 return build_success_response({'stockrank': str(stockrank), 'category': category, 'style': style or 'Unknown'})
             except (ValueError, TypeError):
                 pass
-        if ticker in response.text:
+        if ticker in seen:
             return {'stockrank': 'NR', 'style': 'Not Rated', 'status': 'Stock found but not rated', 'success': True}
         else:
             return build_error_response('stockrank', 'Stock not found', additional_fields={'style': 'N/A'})
@@ -376,12 +414,14 @@ def get_stockopedia_rating(ticker):
     except Exception as e:
         return build_error_response('stockrank', str(e)[:50], additional_fields={'style': 'Error'})
 
-def get_stockanalysis_rating(ticker):
+@trace_platform('stockanalysis')
+@instrument_platform('stockanalysis')
+def get_stockanalysis_rating(ticker, page_cache=None):
     try:
         ticker = normalize_ticker(ticker)
-        url = f"https://stockanalysis.com/stocks/{ticker.lower()}/forecast/"
+        url = provider_url('stockanalysis', ticker)
         
-        response, error = make_request(url, headers=HEADERS_COMPREHENSIVE, timeout=15)
+        response, error = make_request(url, headers=HEADERS_COMPREHENSIVE, timeout=15, page_cache=page_cache)
         if error:
             return build_error_response('consensus', error['status'], additional_fields={'price_target': 'N/A'})
         
@@ -393,7 +433,7 @@ def get_stockanalysis_rating(ticker):
         if status_error:
             return status_error
         
-        soup = get_page_soup(response)
+        soup = get_page_soup(response, page_cache)
         is_valid, title_text = validate_stock_page(soup, ticker)
         if not is_valid or not ticker_in_page(ticker, title_text):
             return build_error_response('consensus', 'Stock not found', additional_fields={'price_target': 'N/A'})
@@ -422,48 +462,288 @@ def get_stockanalysis_rating(ticker):
     except Exception as e:
         return build_error_response('consensus', str(e)[:50], additional_fields={'price_target': 'Error'})
 
+get_stock_price_async = async_platform_fetcher('price', get_stock_price)
+get_zacks_rating_async = async_platform_fetcher('zacks', get_zacks_rating)
+get_tipranks_rating_async = async_platform_fetcher('tipranks', get_tipranks_rating)
+get_barchart_rating_async = async_platform_fetcher('barchart', get_barchart_rating)
+get_stockopedia_rating_async = async_platform_fetcher('stockopedia', get_stockopedia_rating)
+get_stockanalysis_rating_async = async_platform_fetcher('stockanalysis', get_stockanalysis_rating)
+
+ASYNC_FETCHERS = {'price': get_stock_price_async, 'zacks': get_zacks_rating_async,
+                  'tipranks': get_tipranks_rating_async, 'barchart': get_barchart_rating_async,
+                  'stockopedia': get_stockopedia_rating_async, 'stockanalysis': get_stockanalysis_rating_async}
+
+SYNC_FETCHERS = {'price': get_stock_price, 'zacks': get_zacks_rating, 'tipranks': get_tipranks_rating,
+                 'barchart': get_barchart_rating, 'stockopedia': get_stockopedia_rating,
+                 'stockanalysis': get_stockanalysis_rating}
+
+RATING_PLATFORMS = ['zacks', 'tipranks', 'barchart', 'stockopedia', 'stockanalysis']
+ALL_PLATFORMS = ['price'] + RATING_PLATFORMS
+
+def refresh_stale_results(ticker, cached):
+    """Re-scrape expired cache hits in the background; the stale values are served meanwhile"""
+    stale = [platform for platform, result in cached.items() if result.get('stale')]
+    if stale:
+        page_cache = PageCache()
+        for platform in stale:
+            # Bounded like a lookup, so a paused or slow host cannot hold a refresh thread indefinitely
+            rating_cache.refresh(platform, ticker, lambda p=platform: deadline.run_until(
+                time.monotonic() + deadline.provider_budget(p), SYNC_FETCHERS[p], ticker, page_cache))
+
+def lookup_hosts(ticker, platforms):
+    """Provider hosts a lookup of these platforms will queue jobs for"""
+    return {host_key(provider_url(platform, ticker)) for platform in platforms}
+
+def submit_lookup(ticker, platform, page_cache, deadline_at):
+    """Queue one platform lookup on the shared provider pool, bounded by deadline_at"""
+    return provider_pool.submit(host_key(provider_url(platform, ticker)), tracing.bind(deadline.run_until),
+                                deadline_at, SYNC_FETCHERS[platform], ticker, page_cache)
+
+def submit_lookups(ticker, platforms, page_cache, deadlines):
+    """
+    Queue one ticker's platform lookups on the shared provider pool: all of them, or none (PoolSaturated)
+    
+    A platform another request is already fetching for this ticker is joined
+    rather than queued again (see single_flight).
+    """
+    starts = {(platform, ticker): lambda p=platform: submit_lookup(ticker, p, page_cache, deadlines[p])
+              for platform in platforms}
+    # A lookup that joins a batch's job still queued moves it ahead of the rest of the batch
+    futures = lookup_flights.submit(starts, on_join=provider_pool.promote)
+    return {future: platform for (platform, _), future in futures.items()}
+
+def pool_saturated_response():
+    """503 telling the client to back off while the provider pool queues are full"""
+    return jsonify({'error': 'Server busy - please try again shortly'}), 503, {'Retry-After': '5'}
+
+def timeout_result():
+    """Result for a platform that did not answer within its slice of the lookup budget"""
+    return {'rating': 'Timeout', 'status': 'Request timeout', 'success': False, 'timeout': True}
+
+def claim_lookups(ticker, platforms):
+    """({platform: Flight} this request must fetch, {future: platform} already in flight elsewhere)"""
+    flights = {}
+    joined = {}
+    for (platform, _), (flight, future) in lookup_flights.claim([(p, ticker) for p in platforms]).items():
+        if flight is None:
+            joined[future] = platform
+        else:
+            flights[platform] = flight
+    return flights, joined
+
+def iter_joined_results(joined, deadline_at):
+    """Yield (platform, result) for lookups joined from another request, up to deadline_at"""
+    try:
+        for future in concurrent.futures.as_completed(joined, timeout=max(0, deadline_at - time.monotonic())):
+            platform = joined.pop(future)
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {'rating': 'Error', 'status': f'Error: {str(e)[:50]}', 'success': False}
+            yield platform, result
+    except concurrent.futures.TimeoutError:
+        for platform in joined.values():
+            yield platform, timeout_result()
+    finally:
+        for future in joined:
+            future.cancel()
+
+def iter_platform_results(ticker, platforms, budget=deadline.LOOKUP_DEADLINE):
+    """
+    Yield (platform, result) as each platform becomes available, serving fresh cache entries first
+
+    A platform still running when its slice of budget runs out is yielded as
+    timeout_result(); the others are unaffected.
+    """
+    cached = rating_cache.lookup(ticker, platforms)
+    refresh_stale_results(ticker, cached)
+    tracing.set_attribute('cache.hits', len(cached))
+    yield from cached.items()
+    missing = [platform for platform in platforms if platform not in cached]
+    if not missing:
+        return
+    if FETCH_ENGINE == 'async':
+        # Platforms already in flight for another request are waited on, not fetched again
+        flights, joined = claim_lookups(ticker, missing)
+        started = time.monotonic()
+        try:
+            fetchers = {p: ASYNC_FETCHERS[p] for p in flights}
+            outstanding = list(flights)
+            try:
+                if fetchers:
+                    for platform, result in async_engine.iter_lookup(ticker, fetchers, timeout=budget):
+                        outstanding.remove(platform)
+                        rating_cache.set(platform, ticker, result)
+                        flights[platform].set_result(result)
+                        yield platform, result
+            except concurrent.futures.TimeoutError:
+                app.logger.warning(f"{', '.join(outstanding)} missed the {budget}s budget for {ticker}")
+                for platform in outstanding:
+                    flights[platform].set_result(timeout_result())
+                    yield platform, timeout_result()
+            yield from iter_joined_results(joined, started + budget)
+        finally:
+            # An abandoned lookup (e.g. a closed stream) cancels what the others were waiting on
+            for flight in flights.values():
+                flight.cancel()
+        return
+    # One page cache per lookup so price and Zacks share a single quote page download
+    page_cache = PageCache()
+    deadlines = deadline.deadlines_for(missing, budget)
+    future_to_platform = submit_lookups(ticker, missing, page_cache, deadlines)
+
+    def hedge(platform):
+        # The second attempt gets its own page cache, or it would just wait on the first download
+        try:
+            return submit_lookup(ticker, platform, PageCache(), deadlines[platform])
+        except PoolSaturated:
+            return None
+
+    for platform, future in deadline.iter_within_budget(future_to_platform, deadlines, hedge):
+        if future is None:
+            app.logger.warning(f"{platform} missed its deadline for {ticker}")
+            yield platform, timeout_result()
+            continue
+        try:
+            result = future.result()
+            rating_cache.set(platform, ticker, result)
+            app.logger.info(f"Completed {platform} for {ticker}")
+        except Exception as e:
+            app.logger.error(f"Error fetching {platform} for {ticker}: {str(e)}")
+            result = {'rating': 'Error', 'status': f'Error: {str(e)[:50]}', 'success': False}
+        yield platform, result
+
+def iter_batch_results(tickers, platforms, timeout=BATCH_TIMEOUT):
+    """
+    Yield (ticker, platform, result) for every pair, scraping cache misses on the shared provider pool
+
+    Jobs reach the pool only while their host's batch queue has room and are
+    otherwise queued as earlier ones finish, so results keep streaming.
+    """
+    futures = {}
+    waiting = []
+    batch_deadline = time.monotonic() + timeout
+    for ticker in tickers:
+        cached = rating_cache.lookup(ticker, platforms)
+        refresh_stale_results(ticker, cached)
+        for platform, result in cached.items():
+            yield ticker, platform, result
+        # Price and Zacks for the same ticker still share one quote page download
+        page_cache = PageCache()
+        waiting.extend((ticker, platform, page_cache) for platform in platforms if platform not in cached)
+
+    def start(ticker, platform, page_cache, block=False):
+        # Batch jobs wait in their own host queue, behind interactive lookups; their requests stop at
+        # the batch deadline, so rate limiter pauses fail fast instead of parking a worker
+        queue_job = lambda: provider_pool.submit(host_key(provider_url(platform, ticker)),
+                                                 tracing.bind(deadline.run_until), batch_deadline,
+                                                 SYNC_FETCHERS[platform], ticker, page_cache,
+                                                 block=block, batch=True, timeout=max(0, batch_deadline - time.monotonic()))
+        futures[lookup_flights.submit({(platform, ticker): queue_job})[(platform, ticker)]] = (ticker, platform)
+
+    try:
+        while waiting or futures:
+            # Queue whatever has room; jobs for a host whose batch queue is full wait for the next pass
+            full_hosts = set()
+            still_waiting = []
+            for ticker, platform, page_cache in waiting:
+                host = host_key(provider_url(platform, ticker))
+                if host not in full_hosts and provider_pool.has_room([host], batch=True):
+                    try:
+                        start(ticker, platform, page_cache)
+                        continue
+                    except PoolSaturated:
+                        pass
+                full_hosts.add(host)
+                still_waiting.append((ticker, platform, page_cache))
+            waiting = still_waiting
+            if not futures:
+                # Other requests fill every queue we need and none of our jobs will free a slot: wait for room
+                ticker, platform, page_cache = waiting.pop(0)
+                try:
+                    start(ticker, platform, page_cache, block=True)
+                except PoolSaturated:
+                    for ticker, platform, _ in [(ticker, platform, page_cache)] + waiting:
+                        yield ticker, platform, {'rating': 'Error', 'status': 'Server busy', 'success': False}
+                    waiting = []
+                continue
+            done, _ = concurrent.futures.wait(futures, timeout=max(0, batch_deadline - time.monotonic()),
+                                              return_when=concurrent.futures.FIRST_COMPLETED)
+            if not done:
+                raise concurrent.futures.TimeoutError()
+            for future in done:
+                ticker, platform = futures.pop(future)
+                try:
+                    result = future.result()
+                    rating_cache.set(platform, ticker, result)
+                except Exception as e:
+                    app.logger.error(f"Error fetching {platform} for {ticker}: {str(e)}")
+                    result = {'rating': 'Error', 'status': f'Error: {str(e)[:50]}', 'success': False}
+                yield ticker, platform, result
+    except concurrent.futures.TimeoutError:
+        app.logger.error(f"Batch timed out with {len(futures) + len(waiting)} jobs outstanding")
+        for ticker, platform in list(futures.values()) + [(ticker, platform) for ticker, platform, _ in waiting]:
+            yield ticker, platform, {'rating': 'Error', 'status': 'Request timeout', 'success': False}
+    finally:
+        # Drop queued jobs when the batch times out or the client disconnects
+        for future in futures:
+            future.cancel()
+
 @app.route('/')
 def index():
     return render_template('index.html')
 
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus scrape endpoint: provider phase histograms, HTTP statuses, cache, rate limiter and pool state"""
+    return Response(metrics.render(rating_cache, host_limiter, provider_pool, circuit_breakers), content_type=metrics.PROMETHEUS_CONTENT_TYPE)
+
 @app.route('/health')
 def health_check():
-    return jsonify({'status': 'healthy', 'timestamp': datetime.now().isoformat(), 'version': os.getenv('APP_VERSION', '1.0.0')})
+    return jsonify({'status': 'healthy', 'timestamp': datetime.now().isoformat(), 'version': os.getenv('APP_VERSION', '1.0.0'),
+                    'cache': rating_cache.stats(), 'workers': provider_pool.stats(),
+                    'circuit_breakers': circuit_breakers.stats(), 'in_flight': lookup_flights.stats()})
+
+# Scrapes and health probes are operational traffic, not user lookups
+if limiter:
+    limiter.exempt(metrics_endpoint)
+    limiter.exempt(health_check)
 
 @app.route('/get_ratings_stream', methods=['POST'])
 def get_ratings_stream():
+    """Stream one Server-Sent Event per platform as soon as it completes"""
     if limiter:
         limiter.limit("10 per minute")(lambda: None)()
     ticker = request.json.get('ticker', '').strip().upper()
     if not ticker:
         return jsonify({'error': 'Please enter a ticker symbol'})
-    if not re.match(r'^[A-Z]{1,5}(\.[A-Z]{1,2})?$', ticker):
+    if not re.match(TICKER_PATTERN, ticker):
         return jsonify({'error': 'Invalid ticker symbol format'})
-    try:
-        with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-            future_to_platform = {
-                executor.submit(get_zacks_rating, ticker): 'zacks',
-                executor.submit(get_tipranks_rating, ticker): 'tipranks',
-                executor.submit(get_barchart_rating, ticker): 'barchart',
-                executor.submit(get_stockopedia_rating, ticker): 'stockopedia',
-                executor.submit(get_stockanalysis_rating, ticker): 'stockanalysis'
-            }
-            results = {'ticker': ticker, 'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-            for future in concurrent.futures.as_completed(future_to_platform, timeout=45):
-                platform = future_to_platform[future]
-                try:
-                    results[platform] = future.result()
-                    app.logger.info(f"Completed {platform} for {ticker}")
-                except Exception as e:
-                    app.logger.error(f"Error fetching {platform} for {ticker}: {str(e)}")
-                    results[platform] = {'rating': 'Error', 'status': f'Error: {str(e)[:50]}', 'success': False}
-        return jsonify(results)
-    except concurrent.futures.TimeoutError:
-        app.logger.error(f"Timeout fetching ratings for {ticker}")
-        return jsonify({'error': 'Request timeout - some platforms may be slow'})
-    except Exception as e:
-        app.logger.error(f"Error fetching ratings for {ticker}: {str(e)}")
-        return jsonify({'error': f'An error occurred: {str(e)}'})
+    if FETCH_ENGINE != 'async' and not provider_pool.has_room(lookup_hosts(ticker, ALL_PLATFORMS)):
+        return pool_saturated_response()
+
+    def generate():
+        stale = False
+        yield format_sse('start', {'ticker': ticker, 'platforms': ALL_PLATFORMS})
+        try:
+            with tracing.span('get_ratings_stream', kind='SERVER', ticker=ticker, engine=FETCH_ENGINE):
+                for platform, result in iter_platform_results(ticker, ALL_PLATFORMS):
+                    stale = stale or result.get('stale', False)
+                    yield format_sse('platform', {'platform': platform, 'result': result})
+        except concurrent.futures.TimeoutError:
+            app.logger.error(f"Timeout fetching ratings for {ticker}")
+            yield format_sse('error', {'error': 'Request timeout - some platforms may be slow'})
+        except PoolSaturated as e:
+            app.logger.warning(f"Shed stream for {ticker}: {e}")
+            yield format_sse('error', {'error': 'Server busy - please try again shortly'})
+        except Exception as e:
+            app.logger.error(f"Error fetching ratings for {ticker}: {str(e)}")
+            yield format_sse('error', {'error': f'An error occurred: {str(e)}'})
+        yield format_sse('done', {'ticker': ticker, 'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                                  'stale': stale})
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 @app.route('/get_ratings', methods=['POST'])
 def get_ratings():
@@ -472,7 +752,7 @@ def get_ratings():
     ticker = request.json.get('ticker', '').strip().upper()
     if not ticker:
         return jsonify({'error': 'Please enter a ticker symbol'})
-    if not re.match(r'^[A-Z]{1,5}(\.[A-Z]{1,2})?$', ticker):
+    if not re.match(TICKER_PATTERN, ticker):
         return jsonify({'error': 'Invalid ticker symbol format'})
     results = {'ticker': ticker, 'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
                'price': {'status': 'Fetching...'},
@@ -480,31 +760,53 @@ def get_ratings():
                'barchart': {'status': 'Fetching...'}, 'stockopedia': {'status': 'Fetching...'},
                'stockanalysis': {'status': 'Fetching...'}}
     try:
-        with concurrent.futures.ThreadPoolExecutor(max_workers=6) as executor:
-            future_to_platform = {
-                executor.submit(get_stock_price, ticker): 'price',
-                executor.submit(get_zacks_rating, ticker): 'zacks',
-                executor.submit(get_tipranks_rating, ticker): 'tipranks',
-                executor.submit(get_barchart_rating, ticker): 'barchart',
-                executor.submit(get_stockopedia_rating, ticker): 'stockopedia',
-                executor.submit(get_stockanalysis_rating, ticker): 'stockanalysis'
-            }
-            for future in concurrent.futures.as_completed(future_to_platform, timeout=45):
-                platform = future_to_platform[future]
-                try:
-                    results[platform] = future.result()
-                    app.logger.info(f"Completed {platform} for {ticker}")
-                except Exception as e:
-                    app.logger.error(f"Error fetching {platform} for {ticker}: {str(e)}")
-                    results[platform] = {'rating': 'Error', 'status': f'Error: {str(e)[:50]}', 'success': False}
+        with tracing.span('get_ratings', kind='SERVER', ticker=ticker, engine=FETCH_ENGINE):
+            for platform, result in iter_platform_results(ticker, ALL_PLATFORMS):
+                results[platform] = result
+        results['stale'] = any(results[platform].get('stale', False) for platform in ALL_PLATFORMS)
         return jsonify(results)
     except concurrent.futures.TimeoutError:
         app.logger.error(f"Timeout fetching ratings for {ticker}")
         return jsonify({'error': 'Request timeout - some platforms may be slow'})
+    except PoolSaturated as e:
+        app.logger.warning(f"Shed request for {ticker}: {e}")
+        return pool_saturated_response()
     except Exception as e:
         app.logger.error(f"Error fetching ratings for {ticker}: {str(e)}")
         return jsonify({'error': f'An error occurred: {str(e)}'})
 
+@app.route('/get_ratings_batch', methods=['POST'])
+def get_ratings_batch():
+    """Fetch many tickers at once, returning one NDJSON line per (ticker, platform) as it completes"""
+    if limiter:
+        limiter.limit("10 per minute")(lambda: None)()
+    data = request.get_json(silent=True) or {}
+    tickers = data.get('tickers')
+    if not isinstance(tickers, list) or not tickers:
+        return jsonify({'error': 'Please provide a list of tickers'}), 400
+    tickers = list(dict.fromkeys(str(t).strip().upper() for t in tickers if str(t).strip()))
+    if len(tickers) > BATCH_MAX_TICKERS:
+        return jsonify({'error': f'Too many tickers (max {BATCH_MAX_TICKERS})'}), 400
+    platforms = [p for p in data.get('platforms', ALL_PLATFORMS) if p in SYNC_FETCHERS] or ALL_PLATFORMS
+    valid = [t for t in tickers if re.match(TICKER_PATTERN, t)]
+    invalid = [t for t in tickers if t not in valid]
+
+    def generate():
+        started = datetime.now()
+        for ticker in invalid:
+            yield json.dumps({'ticker': ticker, 'error': 'Invalid ticker symbol format'}) + '\n'
+        count = 0
+        with tracing.span('get_ratings_batch', kind='SERVER', tickers=len(valid)):
+            for ticker, platform, result in iter_batch_results(valid, platforms):
+                count += 1
+                yield json.dumps({'ticker': ticker, 'platform': platform, 'result': result}) + '\n'
+        app.logger.info(f"Batch of {len(valid)} tickers completed in {(datetime.now() - started).total_seconds():.2f}s")
+        yield json.dumps({'done': True, 'tickers': len(valid), 'results': count,
+                          'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')}) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.after_request
 def add_security_headers(response):
     if os.getenv('SECURE_HEADERS') == 'True':
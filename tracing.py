@@ -0,0 +1,339 @@
+"""
+Request-scoped tracing for rating lookups
+Spans follow the OpenTelemetry model (trace/span/parent ids, nanosecond start
+and end times, attributes, status) and are written one JSON object per line
+to stderr or a file as they end
+
+A trace starts at the Flask route and follows the lookup into the worker
+threads and the async engine: route -> lookup.<platform> -> http.get /
+page.wait -> parse. Extractors tag their lookup span with extract.method, the
+fallback that actually produced the rating, so a provider redesign that pushes
+lookups onto a slow fallback shows up in the traces.
+
+Usage:
+    TRACING_EXPORTER=file TRACING_FILE=traces.jsonl python stock_rating_app_production.py
+    python tracing.py traces.jsonl          # extract.method counts and timings per platform
+"""
+
+import argparse
+import contextvars
+import json
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from functools import wraps
+
+
+# 'console' (stderr), 'file' (TRACING_FILE) or 'none'
+TRACING_EXPORTER = os.getenv('TRACING_EXPORTER', 'none').lower()
+TRACING_FILE = os.getenv('TRACING_FILE', 'traces.jsonl')
+# Share of traces kept; decided once at the root span and inherited by its children
+TRACING_SAMPLE_RATE = float(os.getenv('TRACING_SAMPLE_RATE', '1.0'))
+SERVICE_NAME = os.getenv('APP_NAME', 'Stock Rating Checker')
+
+_current_span = contextvars.ContextVar('current_span', default=None)
+
+
+# ============================================================================
+# EXPORTERS
+# ============================================================================
+
+class ConsoleExporter:
+    """Writes each finished span as one JSON line to stderr"""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stderr
+        self._lock = threading.Lock()
+
+    def export(self, record):
+        line = json.dumps(record, default=str)
+        with self._lock:
+            self.stream.write(line + '\n')
+            self.stream.flush()
+
+
+class FileExporter:
+    """Appends each finished span as one JSON line to a file"""
+
+    def __init__(self, path=TRACING_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, record):
+        line = json.dumps(record, default=str)
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+
+
+def create_exporter(name=TRACING_EXPORTER):
+    """Exporter for a TRACING_EXPORTER value, or None when tracing is off"""
+    if name == 'console':
+        return ConsoleExporter()
+    if name == 'file':
+        return FileExporter()
+    return None
+
+
+_exporter = create_exporter()
+
+
+def configure(exporter=None, sample_rate=None):
+    """
+    Replace the exporter (e.g. ConsoleExporter(), FileExporter(path), or None to disable tracing)
+
+    Args:
+        exporter: Object with export(record), or None
+        sample_rate: Optional new share of traces to keep (0.0 - 1.0)
+    """
+    global _exporter, TRACING_SAMPLE_RATE
+    _exporter = exporter
+    if sample_rate is not None:
+        TRACING_SAMPLE_RATE = sample_rate
+
+
+def enabled():
+    return _exporter is not None
+
+
+# ============================================================================
+# SPANS
+# ============================================================================
+
+class Span:
+    """
+    One timed operation; use as a context manager so it becomes the current span
+
+    Attributes set on a span are exported with it when it ends. An exception
+    leaving the with block marks the span as an error and propagates.
+    """
+
+    def __init__(self, name, parent=None, kind='INTERNAL', attributes=None):
+        self.name = name
+        self.kind = kind
+        self.parent = parent
+        if parent is None:
+            self.trace_id = f'{random.getrandbits(128):032x}'
+            self.sampled = random.random() < TRACING_SAMPLE_RATE
+        else:
+            self.trace_id = parent.trace_id
+            self.sampled = parent.sampled
+        self.span_id = f'{random.getrandbits(64):016x}'
+        self.attributes = dict(attributes or {})
+        self.status = 'UNSET'
+        self.status_message = None
+        self.start_ns = None
+        self.end_ns = None
+        self._token = None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def set_status(self, status, message=None):
+        self.status = status
+        self.status_message = message
+
+    def __enter__(self):
+        self.start_ns = time.time_ns()
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end_ns = time.time_ns()
+        if exc_type is not None and exc_type is not GeneratorExit:
+            self.set_status('ERROR', f'{exc_type.__name__}: {str(exc)[:200]}')
+        elif self.status == 'UNSET':
+            self.status = 'OK'
+        try:
+            _current_span.reset(self._token)
+        except ValueError:
+            # Ended in another context (e.g. a streamed response's generator); restore the parent there
+            _current_span.set(self.parent)
+        if self.sampled and _exporter is not None:
+            _exporter.export(self.to_dict())
+        return False
+
+    def to_dict(self):
+        """OTLP/JSON-shaped record of the span"""
+        record = {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'parentSpanId': self.parent.span_id if self.parent is not None else None,
+            'name': self.name,
+            'kind': self.kind,
+            'startTimeUnixNano': self.start_ns,
+            'endTimeUnixNano': self.end_ns,
+            'durationMs': round((self.end_ns - self.start_ns) / 1e6, 3),
+            'attributes': self.attributes,
+            'status': {'code': self.status},
+            'resource': {'service.name': SERVICE_NAME, 'process.pid': os.getpid()},
+        }
+        if self.status_message:
+            record['status']['message'] = self.status_message
+        return record
+
+
+class _NoopSpan:
+    """Stands in for a span when tracing is off, so call sites need no checks"""
+
+    sampled = False
+
+    def set_attribute(self, key, value):
+        pass
+
+    def set_status(self, status, message=None):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def span(name, kind='INTERNAL', **attributes):
+    """
+    Start a span as a child of the current one (or a new trace)
+
+    Args:
+        name: Low-cardinality operation name, e.g. 'http.get'
+        kind: OpenTelemetry span kind ('INTERNAL', 'SERVER', 'CLIENT')
+        **attributes: Initial attributes; dots are spelled with underscores
+                      here and can be set exactly with set_attribute
+
+    Returns:
+        Span (or NOOP_SPAN when tracing is off) to use in a with block
+    """
+    if _exporter is None:
+        return NOOP_SPAN
+    parent = _current_span.get()
+    if parent is not None and not parent.sampled:
+        return NOOP_SPAN
+    return Span(name, parent=parent, kind=kind, attributes=attributes)
+
+
+def current_span():
+    """The span active in this thread or task, or NOOP_SPAN"""
+    return _current_span.get() or NOOP_SPAN
+
+
+def set_attribute(key, value):
+    """Set an attribute on the current span, if any"""
+    current = _current_span.get()
+    if current is not None:
+        current.set_attribute(key, value)
+
+
+def attach(parent):
+    """
+    Make parent the current span in this context
+
+    For code that starts in a context of its own (a coroutine submitted to the
+    async engine's loop) but belongs to a trace started elsewhere. Pass the
+    value of current_span() taken in the originating thread.
+    """
+    if isinstance(parent, Span):
+        _current_span.set(parent)
+
+
+def bind(func):
+    """
+    Wrap func to run in a copy of the caller's context
+
+    Executors do not carry contextvars into their threads; submit bind(fn)
+    instead of fn so the worker's spans join the submitting request's trace.
+    """
+    if _exporter is None:
+        return func
+    context = contextvars.copy_context()
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        return context.run(func, *args, **kwargs)
+    return wrapper
+
+
+def trace_platform(platform):
+    """
+    Decorate a platform function to run inside a lookup.<platform> span
+
+    The span records the result's success flag and status; the function sets
+    extract.method itself on the path that produced its answer.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if _exporter is None:
+                return func(*args, **kwargs)
+            with span(f'lookup.{platform}', platform=platform) as lookup_span:
+                if args:
+                    lookup_span.set_attribute('ticker', args[0])
+                result = func(*args, **kwargs)
+                if isinstance(result, dict):
+                    lookup_span.set_attribute('result.success', result.get('success'))
+                    lookup_span.set_attribute('result.status', result.get('status'))
+                    if not result.get('success'):
+                        lookup_span.set_status('ERROR', result.get('status'))
+                return result
+        return wrapper
+    return decorator
+
+
+# ============================================================================
+# TRACE SUMMARY
+# ============================================================================
+
+def read_spans(path):
+    spans = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith('{'):
+                try:
+                    spans.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    return spans
+
+
+def summarize_methods(spans):
+    """
+    Returns:
+        dict: {(platform, extract.method): [lookup durations in ms]}
+    """
+    summary = {}
+    for record in spans:
+        attributes = record.get('attributes') or {}
+        if not record.get('name', '').startswith('lookup.'):
+            continue
+        key = (attributes.get('platform'), attributes.get('extract.method') or '-')
+        summary.setdefault(key, []).append(record['durationMs'])
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Summarize which extraction method each platform lookup used')
+    parser.add_argument('path', nargs='?', default=TRACING_FILE, help='span file written by the file exporter')
+    args = parser.parse_args()
+
+    summary = summarize_methods(read_spans(args.path))
+    if not summary:
+        raise SystemExit(f'No lookup spans in {args.path}')
+    totals = {}
+    for (platform, _), durations in summary.items():
+        totals[platform] = totals.get(platform, 0) + len(durations)
+
+    print(f"{'platform':<14} {'extract.method':<28} {'lookups':>8} {'share':>7} {'p50 ms':>9} {'max ms':>9}")
+    for (platform, method), durations in sorted(summary.items(), key=lambda item: (item[0][0] or '', -len(item[1]))):
+        print(f"{platform or '-':<14} {method:<28} {len(durations):>8} {len(durations) / totals[platform]:>7.0%} "
+              f"{statistics.median(durations):>9.1f} {max(durations):>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,248 @@
+"""
+Shared bounded worker pool for provider scrapes
+Runs (ticker, provider) jobs from every request on one set of threads while
+capping how many run against any one provider host at a time
+"""
+
+import collections
+import concurrent.futures
+import os
+import threading
+import time
+
+import metrics
+
+
+# Worker threads shared by every request in the process
+WORKER_POOL_MAX_WORKERS = int(os.getenv('WORKER_POOL_MAX_WORKERS', '32'))
+# Jobs allowed to run at once against any single provider host
+WORKER_POOL_PER_HOST = int(os.getenv('WORKER_POOL_PER_HOST', '4'))
+# Jobs allowed to wait behind the running ones for any single host; beyond that submit() sheds load
+WORKER_POOL_MAX_QUEUED = int(os.getenv('WORKER_POOL_MAX_QUEUED', '64'))
+# Batch jobs wait in a queue of their own per host, so a batch never fills the interactive one
+WORKER_POOL_BATCH_QUEUED = int(os.getenv('WORKER_POOL_BATCH_QUEUED', '64'))
+# Per-host slots batch jobs leave free for interactive lookups (a host always runs at least one batch job)
+WORKER_POOL_INTERACTIVE_RESERVE = int(os.getenv('WORKER_POOL_INTERACTIVE_RESERVE', '1'))
+
+
+class PoolSaturated(Exception):
+    """Raised by ProviderPool.submit when a host's queue is full"""
+
+    def __init__(self, host):
+        super().__init__(f'Worker pool queue for {host} is full')
+        self.host = host
+
+
+class ProviderPool:
+    """
+    Thread pool with a FIFO queue and a concurrency cap per host
+
+    Jobs are submitted under a host key. At most per_host jobs for one host are
+    handed to the executor at a time; the rest wait in that host's queue and
+    are dispatched as running jobs finish, so a large batch cannot flood one
+    provider while the others sit idle. Each host queue holds at most
+    max_queued jobs: a full queue rejects new jobs (or makes a blocking
+    submit wait for room) instead of letting work pile up without bound.
+
+    Batch jobs (submit(batch=True)) wait in a separate per-host queue bounded
+    by batch_queued, run only when no interactive job is waiting, and leave
+    interactive_reserve of the host's slots free, so a long batch neither
+    fills the interactive queue nor occupies every slot while lookups wait.
+    """
+
+    def __init__(self, max_workers=WORKER_POOL_MAX_WORKERS, per_host=WORKER_POOL_PER_HOST, host_limits=None,
+                 max_queued=WORKER_POOL_MAX_QUEUED, batch_queued=WORKER_POOL_BATCH_QUEUED,
+                 interactive_reserve=WORKER_POOL_INTERACTIVE_RESERVE):
+        """
+        Args:
+            max_workers: Total worker threads
+            per_host: Default cap on concurrent jobs per host
+            host_limits: Optional dict of {host: cap} overriding per_host
+            max_queued: Jobs that may wait per host (None for no bound)
+            batch_queued: Batch jobs that may wait per host (None for no bound)
+            interactive_reserve: Per-host slots batch jobs may not take
+        """
+        self.max_workers = max_workers
+        self.per_host = per_host
+        self.host_limits = dict(host_limits or {})
+        self.max_queued = max_queued
+        self.batch_queued = batch_queued
+        self.interactive_reserve = interactive_reserve
+        self._lock = threading.Lock()
+        self._room = threading.Condition(self._lock)
+        self._rejected = collections.Counter()
+        self._executor = None
+        self._pid = None
+        self._queues = collections.defaultdict(collections.deque)
+        self._batch_queues = collections.defaultdict(collections.deque)
+        self._active = collections.Counter()
+        self._batch_active = collections.Counter()
+
+    def _get_executor(self):
+        # Started lazily, and again after fork, so each gunicorn worker owns its threads
+        if self._executor is None or self._pid != os.getpid():
+            self._executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix='provider-pool')
+            self._pid = os.getpid()
+            self._queues.clear()
+            self._batch_queues.clear()
+            self._active.clear()
+            self._batch_active.clear()
+        return self._executor
+
+    def limit_for(self, host):
+        """Concurrency cap for a host"""
+        return self.host_limits.get(host, self.per_host)
+
+    def batch_limit_for(self, host):
+        """Concurrent batch jobs allowed on a host: its cap less the interactive reserve, at least one"""
+        return max(1, self.limit_for(host) - self.interactive_reserve)
+
+    def _full(self, host, batch=False):
+        """Whether host's (batch) queue has no room for another job; caller holds the lock"""
+        if batch:
+            return self.batch_queued is not None and len(self._batch_queues[host]) >= self.batch_queued
+        return (self.max_queued is not None and self._active[host] >= self.limit_for(host)
+                and len(self._queues[host]) >= self.max_queued)
+
+    def has_room(self, hosts, batch=False):
+        """Check that none of hosts has a full (batch) queue (a hint: a later submit can still be rejected)"""
+        with self._lock:
+            return not any(self._full(host, batch) for host in hosts)
+
+    def submit(self, host, fn, *args, block=False, timeout=None, batch=False, **kwargs):
+        """
+        Queue fn(*args, **kwargs) under a host key
+
+        Args:
+            host: Key the per-host cap applies to (see common.host_key)
+            fn: Callable to run in a worker thread
+            block: Wait for room when the host's queue is full instead of rejecting the job
+            timeout: Seconds a blocking submit waits before giving up
+            batch: Queue as background batch work, behind every interactive job
+
+        Returns:
+            concurrent.futures.Future: cancel() succeeds while the job is still queued
+
+        Raises:
+            PoolSaturated: if the host's queue is full (after timeout, when blocking)
+        """
+        future = concurrent.futures.Future()
+        with self._lock:
+            self._get_executor()
+            if self._full(host, batch):
+                if not block or not self._room.wait_for(lambda: not self._full(host, batch), timeout):
+                    self._rejected[host] += 1
+                    metrics.POOL_REJECTED.inc(host)
+                    raise PoolSaturated(host)
+            queues = self._batch_queues if batch else self._queues
+            queues[host].append((future, fn, args, kwargs, time.perf_counter()))
+            self._dispatch(host)
+        # A job cancelled while queued gives its place back straight away instead of when a worker reaches it
+        future.add_done_callback(lambda done: self._discard(host, done))
+        return future
+
+    def _discard(self, host, future):
+        """Drop a cancelled job from host's queues"""
+        if not future.cancelled():
+            return
+        with self._lock:
+            for queue in (self._queues[host], self._batch_queues[host]):
+                for job in queue:
+                    if job[0] is future:
+                        queue.remove(job)
+                        self._room.notify_all()
+                        return
+
+    def promote(self, future):
+        """
+        Move a batch job that is still queued to the back of its host's interactive queue
+
+        For an interactive lookup that joined a batch's job (see single_flight),
+        so it does not wait behind the rest of the batch.
+        """
+        with self._lock:
+            for host, queue in self._batch_queues.items():
+                for job in queue:
+                    if job[0] is future:
+                        queue.remove(job)
+                        self._queues[host].append(job)
+                        self._room.notify_all()
+                        self._dispatch(host)
+                        return True
+        return False
+
+    def _next_job(self, host):
+        """Pop the next job host may start now, interactive first: (job, batch) or None; caller holds the lock"""
+        if self._active[host] >= self.limit_for(host):
+            return None
+        if self._queues[host]:
+            return self._queues[host].popleft(), False
+        if self._batch_queues[host] and self._batch_active[host] < self.batch_limit_for(host):
+            return self._batch_queues[host].popleft(), True
+        return None
+
+    def _dispatch(self, host):
+        """Hand queued jobs for host to the executor up to its cap; caller holds the lock"""
+        while True:
+            picked = self._next_job(host)
+            if picked is None:
+                return
+            (future, fn, args, kwargs, queued_at), batch = picked
+            self._room.notify_all()
+            if not future.set_running_or_notify_cancel():
+                continue
+            metrics.POOL_WAIT.observe(time.perf_counter() - queued_at, host)
+            self._active[host] += 1
+            if batch:
+                self._batch_active[host] += 1
+            self._executor.submit(self._run, host, future, fn, args, kwargs, batch)
+
+    def _run(self, host, future, fn, args, kwargs, batch=False):
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+        finally:
+            with self._lock:
+                self._active[host] -= 1
+                if batch:
+                    self._batch_active[host] -= 1
+                self._room.notify_all()
+                self._dispatch(host)
+
+    def stats(self):
+        """Running and queued job counts per host"""
+        with self._lock:
+            hosts = set(self._active) | set(self._queues) | set(self._batch_queues)
+            return {
+                'max_workers': self.max_workers,
+                'per_host': self.per_host,
+                'max_queued': self.max_queued,
+                'batch_queued': self.batch_queued,
+                'hosts': {host: {'running': self._active[host], 'queued': len(self._queues[host]),
+                                 'batch_running': self._batch_active[host],
+                                 'batch_queued': len(self._batch_queues[host]),
+                                 'rejected': self._rejected[host]}
+                          for host in sorted(hosts)}
+            }
+
+    def shutdown(self, wait=True):
+        """Cancel queued jobs and stop the worker threads"""
+        with self._lock:
+            queued = []
+            for queue in list(self._queues.values()) + list(self._batch_queues.values()):
+                queued.extend(job[0] for job in queue)
+                queue.clear()
+            self._room.notify_all()
+            executor, self._executor = self._executor, None
+        # Cancelled outside the lock: each future's callback takes it to leave the queue
+        for future in queued:
+            future.cancel()
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+provider_pool = ProviderPool()
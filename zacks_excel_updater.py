@@ -1,26 +1,39 @@
 import pandas as pd
 import requests
-from bs4 import BeautifulSoup
-import time
-from datetime import datetime
-import sys
+from datetime import datetime, timedelta
+import argparse
+import concurrent.futures
+import json
+import os
+import threading
+from circuit_breaker import ProviderUnavailable
+from common import rate_limited_get, parse_html, get_page_text, provider_url, ZACKS_QUOTE_FILTER
+from rate_limiter import host_limiter
+from worker_pool import ProviderPool
 
 def get_zacks_rating(ticker):
     """Fetch Zacks rating - confirmed working method"""
     try:
         ticker = ticker.upper().strip()
-        url = f"https://www.zacks.com/stock/quote/{ticker}"
+        url = provider_url('zacks', ticker)
         
         headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
         
-        response = requests.get(url, headers=headers, timeout=10)
+        response = rate_limited_get(url, headers=headers, timeout=10)
         
-        if response.status_code != 200:
+        # Same notes as TipRanks and Barchart, so --resume and --incremental refetch these rows
+        if response.status_code == 403:
+            return {'Zacks_Rank': 'N/A', 'Zacks_Rating': 'Forbidden', 'Note': 'Access forbidden'}
+        elif response.status_code == 429:
+            return {'Zacks_Rank': 'N/A', 'Zacks_Rating': 'Rate Limited', 'Note': 'Too many requests'}
+        elif response.status_code == 404:
+            return {'Zacks_Rank': 'N/A', 'Zacks_Rating': 'N/A', 'Note': 'Stock not found'}
+        elif response.status_code != 200:
             return {'Zacks_Rank': 'N/A', 'Zacks_Rating': 'N/A', 'Note': f'HTTP {response.status_code}'}
         
-        soup = BeautifulSoup(response.content, 'html.parser')
+        soup = parse_html(response.content, ZACKS_QUOTE_FILTER)
         
         # Method 1: Look for rank_view with rank_chip (confirmed working)
         rank_element = soup.find('p', class_='rank_view')
@@ -62,6 +75,8 @@ def get_zacks_rating(ticker):
         else:
             return {'Zacks_Rank': 'N/A', 'Zacks_Rating': 'N/A', 'Note': 'Stock not found'}
         
+    except ProviderUnavailable:
+        return {'Zacks_Rank': 'Unavailable', 'Zacks_Rating': 'Unavailable', 'Note': 'Provider unavailable'}
     except Exception as e:
         return {'Zacks_Rank': 'Error', 'Zacks_Rating': 'Error', 'Note': str(e)[:30]}
 
@@ -75,7 +90,7 @@ def get_tipranks_rating(ticker):
         if any(ticker.endswith(suffix) for suffix in foreign_suffixes):
             return {'TipRanks_Score': 'N/A', 'TipRanks_Rating': 'Foreign/OTC', 'Note': 'Foreign ticker'}
         
-        url = f"https://www.tipranks.com/stocks/{ticker.lower()}"
+        url = provider_url('tipranks', ticker)
         
         # More comprehensive headers to appear more like a real browser
         headers = {
@@ -96,11 +111,7 @@ def get_tipranks_rating(ticker):
             'sec-ch-ua-platform': '"macOS"'
         }
         
-        # Add random delay to appear more human-like
-        import random
-        time.sleep(random.uniform(1.5, 3.5))
-        
-        response = requests.get(url, headers=headers, timeout=20)
+        response = rate_limited_get(url, headers=headers, timeout=20)
         
         # Handle different error codes
         if response.status_code == 471:
@@ -114,7 +125,7 @@ def get_tipranks_rating(ticker):
         elif response.status_code != 200:
             return {'TipRanks_Score': 'N/A', 'TipRanks_Rating': 'N/A', 'Note': f'HTTP {response.status_code}'}
         
-        soup = BeautifulSoup(response.content, 'html.parser')
+        soup = parse_html(response.content)
         
         # Check if we got a valid stock page first
         page_title = soup.find('title')
@@ -164,7 +175,7 @@ def get_tipranks_rating(ticker):
         
         # Method 2: Search in page text with better validation
         if not score:
-            page_text = soup.get_text()
+            page_text = get_page_text(soup).raw
             import re
             # Look for patterns like "Smart Score: 8" or "8/10"
             score_patterns = [
@@ -222,7 +233,7 @@ def get_tipranks_rating(ticker):
         
         # Method 4: Search in general text with context validation
         if not rating:
-            page_text = soup.get_text().lower()
+            page_text = get_page_text(soup).lower
             for keyword, mapped_rating in rating_keywords.items():
                 if keyword in page_text:
                     # Try to find it in context to make sure it's a rating
@@ -263,6 +274,8 @@ def get_tipranks_rating(ticker):
             else:
                 return {'TipRanks_Score': 'N/A', 'TipRanks_Rating': 'N/A', 'Note': 'Stock not found'}
         
+    except ProviderUnavailable:
+        return {'TipRanks_Score': 'UNAVAILABLE', 'TipRanks_Rating': 'Unavailable', 'Note': 'Provider unavailable'}
     except requests.exceptions.Timeout:
         return {'TipRanks_Score': 'TIMEOUT', 'TipRanks_Rating': 'Timeout', 'Note': 'Request timeout'}
     except requests.exceptions.ConnectionError:
@@ -274,7 +287,7 @@ def get_barchart_rating(ticker):
     """Fetch Barchart opinion/signal rating"""
     try:
         ticker = ticker.upper().strip()
-        url = f"https://www.barchart.com/stocks/quotes/{ticker.lower()}/overview"
+        url = provider_url('barchart', ticker)
         
         headers = {
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
@@ -294,11 +307,7 @@ def get_barchart_rating(ticker):
             'sec-ch-ua-platform': '"macOS"'
         }
         
-        # Add random delay to appear more human-like
-        import random
-        time.sleep(random.uniform(1.0, 2.5))
-        
-        response = requests.get(url, headers=headers, timeout=20)
+        response = rate_limited_get(url, headers=headers, timeout=20)
         
         # Handle different error codes
         if response.status_code == 403:
@@ -310,7 +319,7 @@ def get_barchart_rating(ticker):
         elif response.status_code != 200:
             return {'Barchart_Rating': 'N/A', 'Note': f'HTTP {response.status_code}'}
         
-        soup = BeautifulSoup(response.content, 'html.parser')
+        soup = parse_html(response.content)
         
         # Check if we got a valid stock page first
         page_title = soup.find('title')
@@ -381,7 +390,7 @@ def get_barchart_rating(ticker):
         
         # Method 2: Search in page text with context validation
         if not rating:
-            page_text = soup.get_text().lower()
+            page_text = get_page_text(soup).lower
             for keyword, mapped_rating in rating_keywords.items():
                 if keyword in page_text:
                     # Try to find it in context to make sure it's a rating
@@ -429,6 +438,8 @@ def get_barchart_rating(ticker):
         else:
             return {'Barchart_Rating': 'N/A', 'Note': 'Stock not found'}
         
+    except ProviderUnavailable:
+        return {'Barchart_Rating': 'Unavailable', 'Note': 'Provider unavailable'}
     except requests.exceptions.Timeout:
         return {'Barchart_Rating': 'Timeout', 'Note': 'Request timeout'}
     except requests.exceptions.ConnectionError:
@@ -436,10 +447,330 @@ def get_barchart_rating(ticker):
     except Exception as e:
         return {'Barchart_Rating': 'Error', 'Note': str(e)[:30]}
 
-def process_csv_file(csv_file):
+# Suffix of the enriched file written next to the input CSV
+OUTPUT_SUFFIX = '_zacks_tipranks_barchart_complete.csv'
+
+# Provider fetchers run for every row, and the host each one's requests go to
+PROVIDERS = {
+    'zacks': get_zacks_rating,
+    'tipranks': get_tipranks_rating,
+    'barchart': get_barchart_rating
+}
+
+PROVIDER_HOSTS = {
+    'zacks': 'zacks.com',
+    'tipranks': 'tipranks.com',
+    'barchart': 'barchart.com'
+}
+
+def record_zacks_stats(stats, result):
+    """Count a Zacks result and return its short status for the progress line"""
+    if result['Note'] == 'Found':
+        stats[result['Zacks_Rating']] += 1
+        return f"Z:{result['Zacks_Rank']}"
+    elif result['Note'] == 'Stock found but not rated':
+        stats['Not Rated'] += 1
+        return "Z:NR"
+    elif result['Note'] == 'Provider unavailable':
+        stats['Error'] += 1
+        return "Z:Open"
+    elif result['Note'] in RETRY_NOTES or result['Note'].startswith('HTTP '):
+        stats['Error'] += 1
+        return "Z:Err"
+    elif 'Error' in result['Zacks_Rating']:
+        stats['Error'] += 1
+        return "Z:Err"
+    else:
+        stats['Not Found'] += 1
+        return "Z:NF"
+
+def record_tipranks_stats(tipranks_stats, result):
+    """Count a TipRanks result and return its short status for the progress line"""
+    if result['Note'] == 'Found':
+        tipranks_stats[result['TipRanks_Rating']] += 1
+        return f"T:{result['TipRanks_Score']}"
+    elif result['Note'] == 'Stock found but no Smart Score':
+        tipranks_stats['Not Rated'] += 1
+        return "T:NR"
+    elif result['Note'] == 'Foreign ticker':
+        tipranks_stats['Foreign/OTC'] += 1
+        return "T:Foreign"
+    elif result['Note'] == 'Site blocking automated requests':
+        tipranks_stats['Blocked'] += 1
+        return "T:Block"
+    elif result['Note'] == 'Too many requests':
+        tipranks_stats['Rate Limited'] += 1
+        return "T:RateLimit"
+    elif result['Note'] == 'Provider unavailable':
+        tipranks_stats['Unavailable'] += 1
+        return "T:Open"
+    elif result['Note'] == 'Request timeout':
+        tipranks_stats['Timeout'] += 1
+        return "T:Timeout"
+    elif 'Error' in result['TipRanks_Rating']:
+        tipranks_stats['Error'] += 1
+        return "T:Err"
+    else:
+        tipranks_stats['Not Found'] += 1
+        return "T:NF"
+
+def record_barchart_stats(barchart_stats, result):
+    """Count a Barchart result and return its short status for the progress line"""
+    if result['Note'] == 'Found':
+        barchart_stats[result['Barchart_Rating']] += 1
+        return f"B:{result['Barchart_Rating'][:3]}"
+    elif result['Note'] == 'Stock found but no rating':
+        barchart_stats['Not Rated'] += 1
+        return "B:NR"
+    elif result['Note'] == 'Too many requests':
+        barchart_stats['Rate Limited'] += 1
+        return "B:RateLimit"
+    elif result['Note'] == 'Provider unavailable':
+        barchart_stats['Unavailable'] += 1
+        return "B:Open"
+    elif result['Note'] == 'Request timeout':
+        barchart_stats['Timeout'] += 1
+        return "B:Timeout"
+    elif 'Error' in result['Barchart_Rating']:
+        barchart_stats['Error'] += 1
+        return "B:Err"
+    else:
+        barchart_stats['Not Found'] += 1
+        return "B:NF"
+
+# Notes that mean a provider never really answered, so --resume fetches them again
+RETRY_NOTES = ['Too many requests', 'Site blocking automated requests', 'Access forbidden',
+               'Request timeout', 'Connection failed', 'Provider unavailable']
+
+def needs_retry(result):
+    """True if a journaled result was rate limited, blocked or failed and should be fetched again"""
+    # 'HTTP <status>' is any other non-200 answer (e.g. a 5xx), which is just as transient
+    return result['Note'] in RETRY_NOTES or result['Note'].startswith('HTTP ') or 'Error' in result.values()
+
+# Columns each provider fills in the enriched CSV
+PROVIDER_COLUMNS = {
+    'zacks': ['Zacks_Rank', 'Zacks_Rating'],
+    'tipranks': ['TipRanks_Score', 'TipRanks_Rating'],
+    'barchart': ['Barchart_Rating']
+}
+
+# When each provider's values in a row were fetched; Last_Updated is the oldest of them
+PROVIDER_UPDATED_COLUMNS = {
+    'zacks': 'Zacks_Updated',
+    'tipranks': 'TipRanks_Updated',
+    'barchart': 'Barchart_Updated'
+}
+
+# How old a provider's values may be before --incremental fetches them again
+PROVIDER_MAX_AGE = {
+    'zacks': timedelta(hours=24),
+    'tipranks': timedelta(hours=48),
+    'barchart': timedelta(hours=24)
+}
+
+# Rating column values that mean the last fetch never got a real answer
+ERROR_VALUES = ['Error', 'Access Blocked', 'Forbidden', 'Rate Limited', 'Timeout', 'Connection Error',
+                'Unavailable']
+
+# Rating column value -> fetch note, so carried-over values are counted like fresh ones
+CARRIED_NOTES = {
+    'zacks': {'Not Rated': 'Stock found but not rated'},
+    'tipranks': {'Not Rated': 'Stock found but no Smart Score', 'Foreign/OTC': 'Foreign ticker'},
+    'barchart': {'Not Rated': 'Stock found but no rating'}
+}
+
+RATED_VALUES = {
+    'zacks': ['Strong Buy', 'Buy', 'Hold', 'Sell', 'Strong Sell'],
+    'tipranks': ['Outperform', 'Neutral', 'Underperform'],
+    'barchart': ['Strong Buy', 'Buy', 'Hold', 'Sell', 'Strong Sell']
+}
+
+def carried_result(provider, row):
+    """
+    Rebuild a provider result dict from its columns in an existing enriched row
+    
+    Only meaningful for values load_fresh_results carries over: an 'N/A' there
+    is a real not-found answer, failed fetches being listed in Retry_Providers.
+    """
+    result = {col: row[col] for col in PROVIDER_COLUMNS[provider]}
+    rating = result[PROVIDER_COLUMNS[provider][-1]]
+    if rating in RATED_VALUES[provider]:
+        result['Note'] = 'Found'
+    else:
+        result['Note'] = CARRIED_NOTES[provider].get(rating, 'Stock not found')
+    return result
+
+def load_fresh_results(output_file, delimiter, ticker_column, max_age=None):
+    """
+    Read a previous enriched CSV and keep the provider values that are still fresh
+    
+    Args:
+        output_file: Enriched CSV written by an earlier run
+        delimiter: CSV delimiter
+        ticker_column: Name of the ticker column
+        max_age: Optional timedelta overriding PROVIDER_MAX_AGE for every provider
+    
+    Returns:
+        tuple: ({(ticker, provider): result} to carry over, {(ticker, provider): time it was fetched})
+    """
+    carried = {}
+    last_updated = {}
+    if not os.path.exists(output_file):
+        return carried, last_updated
+    
+    # Read everything as text so 'N/A' and ranks like '3' come back exactly as written
+    existing = pd.read_csv(output_file, delimiter=delimiter, dtype=str, keep_default_na=False)
+    if ticker_column not in existing.columns or 'Last_Updated' not in existing.columns:
+        return carried, last_updated
+    
+    now = datetime.now()
+    for _, row in existing.iterrows():
+        ticker = str(row[ticker_column]).strip()
+        
+        for provider, columns in PROVIDER_COLUMNS.items():
+            if any(col not in existing.columns for col in columns):
+                continue
+            # Files written before the per-provider columns only have the row's timestamp
+            updated_column = PROVIDER_UPDATED_COLUMNS[provider]
+            fetched_at = row[updated_column] if updated_column in existing.columns else row['Last_Updated']
+            try:
+                updated = datetime.strptime(str(fetched_at), '%Y-%m-%d %H:%M:%S')
+            except ValueError:
+                continue
+            if now - updated > (max_age or PROVIDER_MAX_AGE[provider]):
+                continue
+            result = carried_result(provider, row)
+            # Errored or rate-limited values are refetched however recent they are
+            if result[columns[-1]] in ERROR_VALUES or result[columns[-1]] == '':
+                continue
+            if 'Retry_Providers' in existing.columns:
+                if provider in row['Retry_Providers'].split():
+                    continue
+            elif result[columns[-1]] == 'N/A':
+                # Files written before Retry_Providers cannot tell a 404 from a failed fetch
+                continue
+            carried[(ticker, provider)] = result
+            last_updated[(ticker, provider)] = fetched_at
+    return carried, last_updated
+
+class CheckpointJournal:
+    """
+    Append-only JSONL journal with one record per finished (ticker, provider) job
+    
+    Each record is flushed as soon as its job completes, so a crashed or blocked
+    run loses at most the jobs that were in flight. Reading the journal back
+    gives the results a resumed run can reuse.
+    """
+    
+    def __init__(self, path, resume=False):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, 'a' if resume else 'w', encoding='utf-8')
+    
+    @staticmethod
+    def load(path):
+        """Return {(ticker, provider): result} from a journal, later records winning"""
+        results = {}
+        if not os.path.exists(path):
+            return results
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A crash can leave the last line half written
+                    continue
+                results[(record['ticker'], record['provider'])] = record['result']
+        return results
+    
+    def record(self, ticker, provider, result):
+        line = json.dumps({'ticker': ticker, 'provider': provider, 'result': result,
+                           'at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')})
+        with self._lock:
+            self._file.write(line + '\n')
+            self._file.flush()
+    
+    def close(self):
+        self._file.close()
+
+def run_job(fetch, ticker, provider, journal=None):
+    """Run one provider fetch and journal its result"""
+    result = fetch(ticker)
+    if journal is not None:
+        journal.record(ticker, provider, result)
+    return result
+
+def iter_row_results(rows, concurrency=1, per_host=None, journal=None, completed=None):
+    """
+    Fetch every provider for each (idx, ticker) row
+    
+    With concurrency 1 providers are called one after another, row by row.
+    Otherwise every (ticker, provider) job is queued on a ProviderPool of
+    `concurrency` threads with at most `per_host` jobs per provider host, and
+    rows are yielded in file order as soon as all their providers are done.
+    
+    Args:
+        rows: List of (idx, ticker)
+        concurrency: Worker threads
+        per_host: Jobs allowed per host at once (defaults to an even share of the threads)
+        journal: Optional CheckpointJournal each finished job is appended to
+        completed: Optional {(ticker, provider): result} from a previous run, reused instead of fetching
+    
+    Yields:
+        (idx, ticker, {provider: result_dict}) in row order
+    """
+    completed = completed or {}
+    
+    if concurrency <= 1:
+        for idx, ticker in rows:
+            yield idx, ticker, {
+                name: completed[(ticker, name)] if (ticker, name) in completed
+                else run_job(fetch, ticker, name, journal)
+                for name, fetch in PROVIDERS.items()
+            }
+        return
+    
+    if per_host is None:
+        per_host = max(1, -(-concurrency // len(PROVIDERS)))
+    # The whole file is queued up front; the pool belongs to this run, so its queues are unbounded
+    pool = ProviderPool(max_workers=concurrency, per_host=per_host, max_queued=None)
+    
+    def submit(ticker, name, fetch):
+        if (ticker, name) in completed:
+            future = concurrent.futures.Future()
+            future.set_result(completed[(ticker, name)])
+            return future
+        return pool.submit(PROVIDER_HOSTS[name], run_job, fetch, ticker, name, journal)
+    
+    # Queue row by row so each host works through the file from the top
+    row_futures = [
+        (idx, ticker, {name: submit(ticker, name, fetch) for name, fetch in PROVIDERS.items()})
+        for idx, ticker in rows
+    ]
+    try:
+        for idx, ticker, futures in row_futures:
+            yield idx, ticker, {name: future.result() for name, future in futures.items()}
+    finally:
+        pool.shutdown(wait=False)
+
+def process_csv_file(csv_file, concurrency=1, per_host=None, resume=False, incremental=False, max_age=None):
     """Process CSV file and add Zacks, TipRanks, and Barchart ratings"""
     print(f"\nProcessing: {csv_file}")
     
+    # An already enriched file is refreshed in place
+    if csv_file.endswith(OUTPUT_SUFFIX):
+        output_file = csv_file
+    else:
+        output_file = csv_file.replace('.csv', OUTPUT_SUFFIX)
+    journal_file = output_file.replace('.csv', '.journal.jsonl')
+    
+    # Reuse every journaled result except the ones that were rate limited or failed
+    completed = {}
+    if resume:
+        completed = {key: result for key, result in CheckpointJournal.load(journal_file).items()
+                     if not needs_retry(result)}
+        print(f"Resuming from {journal_file}: {len(completed)} completed (ticker, provider) jobs")
+    
     # Detect delimiter
     with open(csv_file, 'r', encoding='utf-8') as f:
         first_line = f.readline()
@@ -463,6 +794,13 @@ def process_csv_file(csv_file):
     
     print(f"Using ticker column: {ticker_column}")
     
+    # Keep provider values from the previous output that are still within their freshness policy
+    carried = {}
+    last_updated = {}
+    if incremental:
+        carried, last_updated = load_fresh_results(output_file, delimiter, ticker_column, max_age)
+        print(f"Incremental: {len(carried)} fresh (ticker, provider) values carried over from {output_file}")
+    
     # Add new columns
     df['Zacks_Rank'] = ''
     df['Zacks_Rating'] = ''
@@ -470,6 +808,10 @@ def process_csv_file(csv_file):
     df['TipRanks_Rating'] = ''
     df['Barchart_Rating'] = ''
     df['Last_Updated'] = ''
+    for column in PROVIDER_UPDATED_COLUMNS.values():
+        df[column] = ''
+    # Providers whose values in the row are not a real answer (see needs_retry); --incremental refetches them
+    df['Retry_Providers'] = ''
     
     # Track fetch notes internally but don't add to CSV
     fetch_notes = {}
@@ -498,7 +840,8 @@ def process_csv_file(csv_file):
         'Blocked': 0,
         'Foreign/OTC': 0,
         'Rate Limited': 0,
-        'Timeout': 0
+        'Timeout': 0,
+        'Unavailable': 0
     }
     
     barchart_stats = {
@@ -511,129 +854,78 @@ def process_csv_file(csv_file):
         'Not Found': 0,
         'Error': 0,
         'Rate Limited': 0,
-        'Timeout': 0
+        'Timeout': 0,
+        'Unavailable': 0
     }
     
     print(f"\nFetching Zacks, TipRanks, and Barchart ratings...")
-    print(f"Estimated time: {len(df) * 8 / 60:.1f} minutes (with improved delays)\n")
+    if concurrency > 1:
+        print(f"Running {concurrency} workers across providers (paced per host by the rate limiter)\n")
+    else:
+        print(f"Estimated time: {len(df) * 3 / 60:.1f} minutes (paced per host by the rate limiter)\n")
     
-    # Process each ticker
+    # Rows with a ticker, in file order
+    rows = []
     for idx, row in df.iterrows():
         ticker = str(row[ticker_column]).strip()
-        
-        if not ticker or ticker == 'nan':
-            continue
-        
+        if ticker and ticker != 'nan':
+            rows.append((idx, ticker))
+    
+    # Every finished job is journaled straight away so a crashed run can --resume
+    journal = CheckpointJournal(journal_file, resume=resume)
+    
+    # Process each ticker; with concurrency > 1 later rows are fetched while earlier ones are written
+    for idx, ticker, results in iter_row_results(rows, concurrency, per_host, journal, {**carried, **completed}):
         print(f"[{idx+1}/{len(df)}] {ticker:<8}...", end='', flush=True)
         
-        # Fetch Zacks rating
-        zacks_result = get_zacks_rating(ticker)
+        zacks_result = results['zacks']
         df.at[idx, 'Zacks_Rank'] = zacks_result['Zacks_Rank']
         df.at[idx, 'Zacks_Rating'] = zacks_result['Zacks_Rating']
         
         # Store fetch note internally for reporting
         fetch_notes[ticker] = zacks_result['Note']
+        zacks_status = record_zacks_stats(stats, zacks_result)
         
-        # Update Zacks stats
-        if zacks_result['Note'] == 'Found':
-            stats[zacks_result['Zacks_Rating']] += 1
-            zacks_status = f"Z:{zacks_result['Zacks_Rank']}"
-        elif zacks_result['Note'] == 'Stock found but not rated':
-            stats['Not Rated'] += 1
-            zacks_status = "Z:NR"
-        elif 'Error' in zacks_result['Zacks_Rating']:
-            stats['Error'] += 1
-            zacks_status = "Z:Err"
-        else:
-            stats['Not Found'] += 1
-            zacks_status = "Z:NF"
-        
-        # Short delay between requests
-        time.sleep(1)
-        
-        # Fetch TipRanks rating (includes its own random delay)
-        tipranks_result = get_tipranks_rating(ticker)
+        tipranks_result = results['tipranks']
         df.at[idx, 'TipRanks_Score'] = tipranks_result['TipRanks_Score']
         df.at[idx, 'TipRanks_Rating'] = tipranks_result['TipRanks_Rating']
         
         # Store TipRanks fetch note internally for reporting
         tipranks_notes[ticker] = tipranks_result['Note']
+        tipranks_status = record_tipranks_stats(tipranks_stats, tipranks_result)
         
-        # Update TipRanks stats
-        if tipranks_result['Note'] == 'Found':
-            tipranks_stats[tipranks_result['TipRanks_Rating']] += 1
-            tipranks_status = f"T:{tipranks_result['TipRanks_Score']}"
-        elif tipranks_result['Note'] == 'Stock found but no Smart Score':
-            tipranks_stats['Not Rated'] += 1
-            tipranks_status = "T:NR"
-        elif tipranks_result['Note'] == 'Foreign ticker':
-            tipranks_stats['Foreign/OTC'] += 1
-            tipranks_status = "T:Foreign"
-        elif tipranks_result['Note'] == 'Site blocking automated requests':
-            tipranks_stats['Blocked'] += 1
-            tipranks_status = "T:Block"
-        elif tipranks_result['Note'] == 'Too many requests':
-            tipranks_stats['Rate Limited'] += 1
-            tipranks_status = "T:RateLimit"
-        elif tipranks_result['Note'] == 'Request timeout':
-            tipranks_stats['Timeout'] += 1
-            tipranks_status = "T:Timeout"
-        elif 'Error' in tipranks_result['TipRanks_Rating']:
-            tipranks_stats['Error'] += 1
-            tipranks_status = "T:Err"
-        else:
-            tipranks_stats['Not Found'] += 1
-            tipranks_status = "T:NF"
+        barchart_result = results['barchart']
+        df.at[idx, 'Barchart_Rating'] = barchart_result['Barchart_Rating']
         
-        # Short delay before Barchart
-        time.sleep(1)
+        # Carried-over values keep the time they were fetched, so each provider ages on its own clock;
+        # the row is only as fresh as its oldest value
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        for name, column in PROVIDER_UPDATED_COLUMNS.items():
+            carried_at = last_updated.get((ticker, name))
+            df.at[idx, column] = carried_at if carried_at and (ticker, name) not in completed else now
+        df.at[idx, 'Last_Updated'] = min(df.at[idx, column] for column in PROVIDER_UPDATED_COLUMNS.values())
         
-        # Fetch Barchart rating (includes its own random delay)
-        barchart_result = get_barchart_rating(ticker)
-        df.at[idx, 'Barchart_Rating'] = barchart_result['Barchart_Rating']
-        df.at[idx, 'Last_Updated'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        df.at[idx, 'Retry_Providers'] = ' '.join(name for name in PROVIDERS if needs_retry(results[name]))
         
         # Store Barchart fetch note internally for reporting
         barchart_notes[ticker] = barchart_result['Note']
-        
-        # Update Barchart stats
-        if barchart_result['Note'] == 'Found':
-            barchart_stats[barchart_result['Barchart_Rating']] += 1
-            barchart_status = f"B:{barchart_result['Barchart_Rating'][:3]}"
-        elif barchart_result['Note'] == 'Stock found but no rating':
-            barchart_stats['Not Rated'] += 1
-            barchart_status = "B:NR"
-        elif barchart_result['Note'] == 'Too many requests':
-            barchart_stats['Rate Limited'] += 1
-            barchart_status = "B:RateLimit"
-        elif barchart_result['Note'] == 'Request timeout':
-            barchart_stats['Timeout'] += 1
-            barchart_status = "B:Timeout"
-        elif 'Error' in barchart_result['Barchart_Rating']:
-            barchart_stats['Error'] += 1
-            barchart_status = "B:Err"
-        else:
-            barchart_stats['Not Found'] += 1
-            barchart_status = "B:NF"
+        barchart_status = record_barchart_stats(barchart_stats, barchart_result)
         
         print(f" {zacks_status} | {tipranks_status} | {barchart_status}")
         
-        # If we hit rate limiting, add extra delay
+        # Rate-limited responses already slowed the host's token bucket down
         rate_limited = any(result['Note'] in ['Too many requests', 'Site blocking automated requests'] 
                           for result in [tipranks_result, barchart_result])
         
         if rate_limited:
-            print(f"  ⚠️  Rate limited - adding 10 second delay...")
-            time.sleep(10)
-        else:
-            # Normal delay between requests (1-3 seconds)
-            import random
-            time.sleep(random.uniform(1, 3))
+            print(f"  ⚠️  Rate limited - backing off requests to that host...")
+    
+    journal.close()
     
     # Save results
-    output_file = csv_file.replace('.csv', '_zacks_tipranks_barchart_complete.csv')
     df.to_csv(output_file, index=False, sep=delimiter)
     print(f"\n✅ Saved to: {output_file}")
+    print(f"   Checkpoint journal: {journal_file} (rerun with --resume to retry failed or rate-limited jobs)")
     
     # Display comprehensive results
     print("\n" + "="*120)
@@ -822,11 +1114,29 @@ def process_csv_file(csv_file):
             print(f"    {row[ticker_column]} - Zacks: {row['Zacks_Rating']}, TipRanks: {row['TipRanks_Score']}/10, Barchart: {row['Barchart_Rating']}")
 
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: python zacks_excel_updater.py <csv_file>")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description='Add Zacks, TipRanks and Barchart ratings to a CSV of tickers')
+    parser.add_argument('csv_file', help='CSV file with a symbol/ticker column')
+    parser.add_argument('--concurrency', type=int, default=1,
+                        help='worker threads fetching (ticker, provider) jobs in parallel (default: 1, sequential)')
+    parser.add_argument('--per-host', type=int, default=None,
+                        help='max jobs in flight per provider host (default: concurrency split across providers)')
+    parser.add_argument('--resume', action='store_true',
+                        help='reuse results from the checkpoint journal of a previous run, retrying only failed or rate-limited jobs')
+    parser.add_argument('--incremental', action='store_true',
+                        help='reuse values from the existing enriched output that are still fresh, refetching only stale or errored ones')
+    parser.add_argument('--max-age', type=float, default=None,
+                        help='hours before a value counts as stale in --incremental mode (default: per-provider policy)')
+    parser.add_argument('--rps', type=float, default=None,
+                        help='requests per second allowed per provider host, overriding the rate limiter defaults')
+    args = parser.parse_args()
+    
+    if args.rps:
+        for host in PROVIDER_HOSTS.values():
+            host_limiter.configure(host, rate=args.rps)
     
-    process_csv_file(sys.argv[1])
+    max_age = timedelta(hours=args.max_age) if args.max_age else None
+    process_csv_file(args.csv_file, concurrency=args.concurrency, per_host=args.per_host, resume=args.resume,
+                     incremental=args.incremental, max_age=max_age)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()